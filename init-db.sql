@@ -0,0 +1,34 @@
+-- Privacy layer schema for the local Postgres container (docker-compose)
+-- Keep in sync with init_database() in src/core/privacy_layer/privacy_manager.py
+
+CREATE TABLE IF NOT EXISTS consents (
+    consent_id VARCHAR(16) PRIMARY KEY,
+    patient_id VARCHAR(50) NOT NULL,
+    organization_id VARCHAR(50) NOT NULL,
+    purpose VARCHAR(100) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    granted_date TIMESTAMP NOT NULL,
+    expiry_date TIMESTAMP,
+    scope JSONB NOT NULL,
+    metadata JSONB,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_consents_patient_org ON consents (patient_id, organization_id, granted_date DESC);
+CREATE INDEX IF NOT EXISTS idx_consents_status ON consents (status);
+
+CREATE TABLE IF NOT EXISTS audit_logs (
+    log_id VARCHAR(16) PRIMARY KEY,
+    timestamp TIMESTAMP NOT NULL,
+    user_id VARCHAR(50) NOT NULL,
+    action VARCHAR(50) NOT NULL,
+    resource_type VARCHAR(50) NOT NULL,
+    resource_id VARCHAR(100) NOT NULL,
+    patient_id VARCHAR(50) NOT NULL,
+    access_level VARCHAR(20) NOT NULL,
+    ip_address VARCHAR(45),
+    success BOOLEAN NOT NULL,
+    details JSONB
+);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_patient ON audit_logs (patient_id);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_timestamp ON audit_logs (timestamp);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_user ON audit_logs (user_id);
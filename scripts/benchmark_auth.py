@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark token verification: the previous per-request HS256 jwt.decode
+against AuthManager with the verified-token cache, for HS256, RS256 and
+ES256 (JWKS) tokens
+Usage: python scripts/benchmark_auth.py [--requests 20000] [--tokens 50]
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+from src.api.auth import AuthManager, VerifiedTokenCache
+
+SECRET = "benchmark-secret-key-for-hs256-tokens"
+
+
+def legacy_verify(token: str):
+    """Pre-cache gateway path: full decode on every request"""
+    return jwt.decode(token, SECRET, algorithms=["HS256"])
+
+
+def private_pem(key) -> str:
+    return key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    ).decode()
+
+
+def write_jwks(path: str, keys):
+    """keys: [(kid, algorithm, private key)]"""
+    entries = []
+    for kid, algorithm, key in keys:
+        to_jwk = jwt.algorithms.RSAAlgorithm.to_jwk if algorithm == 'RS256' else jwt.algorithms.ECAlgorithm.to_jwk
+        jwk = json.loads(to_jwk(key.public_key()))
+        jwk.update({'kid': kid, 'alg': algorithm, 'use': 'sig'})
+        entries.append(jwk)
+    with open(path, 'w') as f:
+        json.dump({'keys': entries}, f)
+
+
+def timed(verify, tokens, requests: int) -> float:
+    """Seconds per verification, cycling through the tokens"""
+    start = time.perf_counter()
+    for i in range(requests):
+        verify(tokens[i % len(tokens)])
+    return (time.perf_counter() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JWT verification micro-benchmark")
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--tokens', type=int, default=50, help="distinct tokens (clients) in the request mix")
+    args = parser.parse_args()
+    
+    rsa_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    ec_key = ec.generate_private_key(ec.SECP256R1())
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        jwks_path = os.path.join(tmp, 'jwks.json')
+        write_jwks(jwks_path, [('rsa-1', 'RS256', rsa_key), ('ec-1', 'ES256', ec_key)])
+        
+        managers = {
+            'HS256': AuthManager(secret_key=SECRET),
+            'RS256': AuthManager(algorithm='RS256', jwks_path=jwks_path, private_key=private_pem(rsa_key), key_id='rsa-1'),
+            'ES256': AuthManager(algorithm='ES256', jwks_path=jwks_path, private_key=private_pem(ec_key), key_id='ec-1'),
+        }
+        
+        print("=" * 80)
+        print(f"JWT VERIFICATION BENCHMARK ({args.requests} requests over {args.tokens} tokens)")
+        print("=" * 80)
+        print(f"{'algorithm':>10} {'path':>22} {'us/request':>11} {'speedup':>8}  match")
+        
+        mismatches = 0
+        hs256_tokens = [managers['HS256'].create_token(f"USER{i:04d}", "ORG001") for i in range(args.tokens)]
+        baseline = timed(legacy_verify, hs256_tokens, args.requests)
+        print(f"{'HS256':>10} {'jwt.decode (previous)':>22} {baseline * 1e6:>11.2f} {'1.0x':>8}")
+        
+        for algorithm, manager in managers.items():
+            tokens = [manager.create_token(f"USER{i:04d}", "ORG001") for i in range(args.tokens)]
+            
+            uncached = AuthManager(
+                secret_key=manager.secret_key,
+                algorithm=algorithm,
+                jwks_path=jwks_path if manager.jwks else None,
+                cache=VerifiedTokenCache(max_entries=0)
+            )
+            same = all(manager.verify_token(t) == uncached.verify_token(t) for t in tokens)
+            mismatches += not same
+            
+            for path, verifier in (('no cache', uncached), ('cached', manager)):
+                per_request = timed(verifier.verify_token, tokens, args.requests)
+                print(
+                    f"{algorithm:>10} {path:>22} {per_request * 1e6:>11.2f} "
+                    f"{baseline / per_request:>7.1f}x  {'yes' if same else 'NO'}"
+                )
+    
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Benchmark the single-pass field extraction engine against the previous
+per-pattern gateway functions, and check both return the same fields
+Usage: python scripts/benchmark_field_extraction.py [--sizes 10000,1000000,5000000] [--runs 5]
+"""
+
+import sys
+import os
+import time
+import argparse
+from typing import Dict, Any
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.core.ai_pipeline.field_extraction import extract_document_fields
+
+SAMPLE_DOCUMENT = """PRIOR AUTHORIZATION REQUEST
+
+Patient Name: Maria Gonzalez
+Patient ID: PT-2024-00981
+Date of Birth: 04/17/1968
+Phone: (555) 123-4567
+
+Insurance Company: Blue Cross Blue Shield
+Policy Number: BCBS-778812
+Group Number: GRP-4410
+Plan: PPO Gold
+Effective Date: 01/01/2024
+
+Diagnosis: Type two diabetes mellitus
+Procedure: Continuous glucose monitoring
+CPT Code: 95250
+Provider Name: Dr. Alan Whitfield
+"""
+
+FILLER = "Clinical notes: patient reports improved adherence to the treatment plan and no adverse events.\n"
+
+
+def legacy_extract_patient_info(text: str) -> Dict[str, Any]:
+    """Extract patient information from text using regex (pre-engine gateway version)"""
+    import re
+    
+    patient_info = {}
+    
+    # Patient Name patterns
+    name_patterns = [
+        r'Patient\s+Name[:\s]+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)',
+        r'Name[:\s]+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)',
+        r'Member\s+Name[:\s]+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)',
+        r'PATIENT[:\s]+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)',
+    ]
+    
+    for pattern in name_patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            # Clean up the name - remove newlines and extra spaces
+            name = match.group(1).strip()
+            name = re.sub(r'\s*\n.*$', '', name)  # Remove everything after newline
+            name = re.sub(r'\s+', ' ', name)  # Normalize spaces
+            patient_info['patient_name'] = name
+            break
+    
+    # Patient ID patterns
+    id_patterns = [
+        r'Patient\s+ID[:\s]+([A-Z0-9-]+)',
+        r'Member\s+ID[:\s]+([A-Z0-9-]+)',
+        r'ID[:\s]+([A-Z0-9]{3,})',
+    ]
+    
+    for pattern in id_patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            patient_info['patient_id'] = match.group(1).strip()
+            break
+    
+    # Date of Birth patterns
+    dob_patterns = [
+        r'Date\s+of\s+Birth[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
+        r'DOB[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
+        r'Birth\s+Date[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
+    ]
+    
+    for pattern in dob_patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            patient_info['date_of_birth'] = match.group(1).strip()
+            break
+    
+    # Phone patterns
+    phone_patterns = [
+        r'Phone[:\s]+(\(\d{3}\)\s*\d{3}-\d{4})',
+        r'Phone[:\s]+(\d{3}-\d{3}-\d{4})',
+        r'Tel[:\s]+(\(\d{3}\)\s*\d{3}-\d{4})',
+    ]
+    
+    for pattern in phone_patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            patient_info['phone'] = match.group(1).strip()
+            break
+    
+    return patient_info
+
+
+def legacy_extract_insurance_info(text: str) -> Dict[str, Any]:
+    """Extract insurance information from text using regex (pre-engine gateway version)"""
+    import re
+    
+    insurance_info = {}
+    
+    # Insurance Company patterns
+    company_patterns = [
+        r'Insurance\s+Company[:\s]+([A-Za-z\s&]+?)(?:\n|Policy|Group|Member)',
+        r'Insurance[:\s]+([A-Za-z\s&]+?)(?:\n|Policy|Group|Member)',
+        r'Carrier[:\s]+([A-Za-z\s&]+?)(?:\n|Policy|Group|Member)',
+        r'Payer[:\s]+([A-Za-z\s&]+?)(?:\n|Policy|Group|Member)',
+    ]
+    
+    for pattern in company_patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            # Clean up the company name
+            company = match.group(1).strip()
+            company = re.sub(r'\s*\n.*$', '', company)  # Remove everything after newline
+            company = re.sub(r'\s+', ' ', company)  # Normalize spaces
+            insurance_info['insurance_company'] = company
+            break
+    
+    # Policy Number patterns
+    policy_patterns = [
+        r'Policy\s+Number[:\s]+([A-Z0-9-]+)',
+        r'Policy[:\s]+([A-Z0-9-]+)',
+        r'Member\s+ID[:\s]+([A-Z0-9-]+)',
+    ]
+    
+    for pattern in policy_patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            insurance_info['policy_number'] = match.group(1).strip()
+            break
+    
+    # Group Number patterns
+    group_patterns = [
+        r'Group\s+Number[:\s]+([A-Z0-9-]+)',
+        r'Group[:\s]+([A-Z0-9-]+)',
+    ]
+    
+    for pattern in group_patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            insurance_info['group_number'] = match.group(1).strip()
+            break
+    
+    # Plan Type patterns
+    plan_patterns = [
+        r'Plan[:\s]+([A-Za-z\s]+?)(?:\n|Effective)',
+        r'Plan\s+Type[:\s]+([A-Za-z\s]+?)(?:\n|Effective)',
+    ]
+    
+    for pattern in plan_patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            insurance_info['plan_type'] = match.group(1).strip()
+            break
+    
+    return insurance_info
+
+
+def legacy_extract_clinical_info(text: str) -> Dict[str, Any]:
+    """Extract clinical information from text using regex (pre-engine gateway version)"""
+    import re
+    
+    clinical_info = {}
+    
+    # Diagnosis patterns
+    diagnosis_patterns = [
+        r'Diagnosis[:\s]+([A-Za-z\s,]+?)(?:\n|Procedure|CPT)',
+        r'ICD-10[:\s]+([A-Z0-9.]+)',
+        r'Diagnosis\s+Code[:\s]+([A-Z0-9.]+)',
+    ]
+    
+    for pattern in diagnosis_patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            clinical_info['diagnosis'] = match.group(1).strip()
+            break
+    
+    # Procedure patterns
+    procedure_patterns = [
+        r'Procedure[:\s]+([A-Za-z\s]+?)(?:\n|CPT)',
+        r'Service[:\s]+([A-Za-z\s]+?)(?:\n|CPT)',
+    ]
+    
+    for pattern in procedure_patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            clinical_info['procedure'] = match.group(1).strip()
+            break
+    
+    # CPT Code patterns
+    cpt_patterns = [
+        r'CPT\s+Code[:\s]+(\d{5})',
+        r'CPT[:\s]+(\d{5})',
+    ]
+    
+    for pattern in cpt_patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            clinical_info['cpt_code'] = match.group(1).strip()
+            break
+    
+    # Provider patterns
+    provider_patterns = [
+        r'Provider\s+Name[:\s]+(Dr\.\s+[A-Za-z\s]+)',
+        r'Physician[:\s]+(Dr\.\s+[A-Za-z\s]+)',
+    ]
+    
+    for pattern in provider_patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            # Clean up the provider name
+            provider = match.group(1).strip()
+            provider = re.sub(r'\s*\n.*$', '', provider)  # Remove everything after newline
+            provider = re.sub(r'\s+', ' ', provider)  # Normalize spaces
+            clinical_info['provider_name'] = provider
+            break
+    
+    return clinical_info
+
+
+def legacy_extract(text: str) -> Dict[str, Dict[str, Any]]:
+    return {
+        'patient': legacy_extract_patient_info(text),
+        'insurance': legacy_extract_insurance_info(text),
+        'clinical': legacy_extract_clinical_info(text)
+    }
+
+
+def build_text(size: int, fields_at_end: bool) -> str:
+    """Document of roughly `size` characters; fields first or after the filler"""
+    filler = FILLER * max(0, (size - len(SAMPLE_DOCUMENT)) // len(FILLER))
+    return filler + SAMPLE_DOCUMENT if fields_at_end else SAMPLE_DOCUMENT + filler
+
+
+def timed(func, text: str, runs: int) -> float:
+    """Best-of-runs seconds"""
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Field extraction micro-benchmark")
+    parser.add_argument('--sizes', default='2000,100000,1000000,5000000')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+    
+    print("=" * 80)
+    print("FIELD EXTRACTION BENCHMARK (legacy per-pattern vs single-pass engine)")
+    print("=" * 80)
+    print(f"{'chars':>10} {'layout':>12} {'legacy ms':>11} {'engine ms':>11} {'speedup':>8}  match")
+    
+    mismatches = 0
+    for size in (int(s) for s in args.sizes.split(',')):
+        for fields_at_end in (False, True):
+            text = build_text(size, fields_at_end)
+            same = legacy_extract(text) == extract_document_fields(text)
+            mismatches += not same
+            
+            legacy_time = timed(legacy_extract, text, args.runs)
+            engine_time = timed(extract_document_fields, text, args.runs)
+            layout = 'fields last' if fields_at_end else 'fields first'
+            print(
+                f"{len(text):>10} {layout:>12} {legacy_time * 1000:>11.2f} {engine_time * 1000:>11.2f} "
+                f"{legacy_time / engine_time:>7.1f}x  {'yes' if same else 'NO'}"
+            )
+    
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
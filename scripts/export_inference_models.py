@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Export BioBERT / LayoutLMv3 for CPU inference backends and check parity
+against the fp32 PyTorch model
+Usage: python scripts/export_inference_models.py <biobert|layoutlm> <torchscript|onnx|quantized>
+           [--output PATH] [--onnx-int8] [--sample-image PATH] [--model NAME]
+"""
+
+import sys
+import os
+import time
+import argparse
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import torch
+from PIL import Image
+from transformers import (
+    AutoTokenizer,
+    AutoModelForTokenClassification,
+    LayoutLMv3Processor,
+    LayoutLMv3ForTokenClassification
+)
+
+from src.core.ai_pipeline.inference_backends import (
+    build_backend, export_onnx, export_torchscript, parity_check, quantize_dynamic
+)
+
+SAMPLE_TEXTS = [
+    "Patient John Smith (MRN: 123456) was prescribed metformin 500mg for type 2 diabetes.",
+    "Member ID ABC-1234-5678, prior authorization AUTH-998877 approved for CPT 99213 on 03/14/2024.",
+]
+
+DEFAULT_MODELS = {
+    'biobert': 'dmis-lab/biobert-base-cased-v1.1',
+    'layoutlm': 'microsoft/layoutlmv3-base',
+}
+
+INPUT_NAMES = {
+    'biobert': ['input_ids', 'attention_mask', 'token_type_ids'],
+    'layoutlm': ['input_ids', 'bbox', 'attention_mask', 'pixel_values'],
+}
+
+
+def load_reference(kind, model_name, sample_image):
+    """fp32 model plus example inputs"""
+    if kind == 'biobert':
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForTokenClassification.from_pretrained(model_name)
+        inputs = tokenizer(SAMPLE_TEXTS, padding=True, truncation=True, return_tensors='pt')
+    else:
+        processor = LayoutLMv3Processor.from_pretrained(model_name)
+        model = LayoutLMv3ForTokenClassification.from_pretrained(model_name)
+        if sample_image:
+            image = Image.open(sample_image).convert('RGB')
+            inputs = processor(image, return_tensors='pt', truncation=True)
+        else:
+            image = Image.new('RGB', (1700, 2200), 'white')
+            words = SAMPLE_TEXTS[1].split()
+            boxes = [[50 + 60 * i, 100, 100 + 60 * i, 130] for i in range(len(words))]
+            processor = LayoutLMv3Processor.from_pretrained(model_name, apply_ocr=False)
+            inputs = processor(image, words, boxes=boxes, return_tensors='pt', truncation=True)
+    
+    model.eval()
+    return model, {k: v for k, v in inputs.items() if k in INPUT_NAMES[kind]}
+
+
+def benchmark(model, inputs, runs=10):
+    """Mean seconds per forward pass"""
+    with torch.no_grad():
+        model(**inputs)
+        start = time.perf_counter()
+        for _ in range(runs):
+            model(**inputs)
+    return (time.perf_counter() - start) / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export models for CPU inference backends")
+    parser.add_argument('kind', choices=['biobert', 'layoutlm'])
+    parser.add_argument('backend', choices=['torchscript', 'onnx', 'quantized'])
+    parser.add_argument('--model', help="HuggingFace model name (defaults to the pipeline's model)")
+    parser.add_argument('--output', help="Artifact path (default: models/<kind>.<ext>)")
+    parser.add_argument('--onnx-int8', action='store_true', help="Also int8-quantize the ONNX graph")
+    parser.add_argument('--sample-image', help="Document image for LayoutLM example inputs")
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--atol', type=float, default=1e-2)
+    args = parser.parse_args()
+    
+    model_name = args.model or DEFAULT_MODELS[args.kind]
+    extension = {'torchscript': 'pt', 'onnx': 'onnx', 'quantized': 'pt'}[args.backend]
+    output = args.output or f"models/{args.kind}.{extension}"
+    
+    print("=" * 80)
+    print(f"EXPORT {args.kind} ({model_name}) -> {args.backend}")
+    print("=" * 80)
+    
+    reference, inputs = load_reference(args.kind, model_name, args.sample_image)
+    
+    if args.backend == 'torchscript':
+        export_torchscript(reference, inputs, output)
+        candidate = build_backend(reference, 'torchscript', INPUT_NAMES[args.kind], output, args.threads)
+    elif args.backend == 'onnx':
+        output = export_onnx(reference, inputs, output, quantize=args.onnx_int8)
+        candidate = build_backend(reference, 'onnx', INPUT_NAMES[args.kind], output, args.threads)
+    else:
+        # Dynamic quantization happens at load time; nothing to ship but the check
+        candidate = quantize_dynamic(reference)
+        output = None
+    
+    report = parity_check(reference, candidate, inputs, atol=args.atol)
+    fp32_time = benchmark(reference, inputs)
+    backend_time = benchmark(candidate, inputs)
+    
+    print(f"Artifact:        {output or '(none - quantized at load time)'}")
+    print(f"Max abs diff:    {report['max_abs_diff']:.5f}")
+    print(f"Mean abs diff:   {report['mean_abs_diff']:.5f}")
+    print(f"Label agreement: {report['label_agreement']:.2%}")
+    print(f"fp32 latency:    {fp32_time * 1000:.1f} ms")
+    print(f"{args.backend} latency: {backend_time * 1000:.1f} ms ({fp32_time / backend_time:.2f}x)")
+    print(f"Parity:          {'PASSED' if report['passed'] else 'FAILED'}")
+    
+    if output:
+        print(f"\nSet {args.kind}_backend: '{args.backend}' and {args.kind}_artifact: '{output}'")
+    
+    sys.exit(0 if report['passed'] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -30,10 +30,33 @@ UPLOAD_RESPONSE=$(curl -s -X POST "http://localhost:8000/api/v1/documents/upload
 
 echo "$UPLOAD_RESPONSE" | python3 -m json.tool
 
-if echo "$UPLOAD_RESPONSE" | grep -q "success"; then
-    echo ""
-    echo "✅ Upload successful!"
-else
+DOCUMENT_ID=$(echo $UPLOAD_RESPONSE | python3 -c "import sys, json; print(json.load(sys.stdin)['data']['document_id'])" 2>/dev/null)
+
+if [ -z "$DOCUMENT_ID" ]; then
     echo ""
     echo "❌ Upload failed"
+    exit 1
 fi
+
+echo ""
+echo "✅ Upload accepted: $DOCUMENT_ID"
+echo ""
+
+# Poll processing status
+echo "3. Waiting for pipeline result..."
+for i in $(seq 1 60); do
+    STATUS_RESPONSE=$(curl -s "http://localhost:8000/api/v1/documents/$DOCUMENT_ID/status" \
+      -H "Authorization: Bearer $TOKEN")
+    STATUS=$(echo $STATUS_RESPONSE | python3 -c "import sys, json; print((json.load(sys.stdin).get('data') or {}).get('status', ''))" 2>/dev/null)
+    
+    if [ "$STATUS" != "queued" ] && [ "$STATUS" != "processing" ]; then
+        echo "$STATUS_RESPONSE" | python3 -m json.tool
+        echo ""
+        echo "Final status: $STATUS"
+        exit 0
+    fi
+    sleep 2
+done
+
+echo "❌ Timed out waiting for processing"
+exit 1
@@ -0,0 +1,225 @@
+"""
+Authentication for the API
+A JWT is verified once; its claims are then kept in a bounded LRU keyed
+by the token's SHA-256 until the token expires (or max_ttl_seconds, so
+key removal still takes effect), and repeat requests skip the signature
+check. HS256 tokens use the shared secret; RS256/ES256 tokens are checked
+against a locally loaded JWKS by their kid, and the JWKS file is re-read
+when it changes or a token names an unknown kid, so keys can rotate
+without a restart or a secret shared between gateway pods.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Tuple
+
+import jwt
+from fastapi import HTTPException
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+SYMMETRIC_ALGORITHMS = ('HS256',)
+ASYMMETRIC_ALGORITHMS = ('RS256', 'ES256')
+
+
+class VerifiedTokenCache:
+    """LRU of verified token claims, keyed by token digest"""
+    
+    def __init__(self, max_entries: int = 10000, max_ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.max_ttl_seconds = max_ttl_seconds
+        self._entries: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+    
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode('utf-8')).digest()
+    
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return dict(entry[1])
+    
+    def put(self, token: str, payload: Dict[str, Any]):
+        expires = time.time() + self.max_ttl_seconds
+        if isinstance(payload.get('exp'), (int, float)):
+            expires = min(expires, payload['exp'])
+        
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (expires, dict(payload))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class JWKSKeySet:
+    """Public keys by kid from a local JWKS file"""
+    
+    def __init__(self, path: str, min_reload_seconds: float = 30.0):
+        self.path = path
+        self.min_reload_seconds = min_reload_seconds
+        self._keys: Dict[str, jwt.PyJWK] = {}
+        self._mtime = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._load()
+    
+    def _load(self):
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path) as f:
+            jwks = json.load(f)
+        
+        keys = {}
+        for jwk in jwks.get('keys', []):
+            if not jwk.get('kid') or jwk.get('use', 'sig') != 'sig':
+                continue
+            try:
+                keys[jwk['kid']] = jwt.PyJWK(jwk)
+            except jwt.PyJWTError as e:
+                logger.warning(f"Skipping JWKS key {jwk.get('kid')}: {e}")
+        
+        self._keys = keys
+        self._mtime = mtime
+        logger.info(f"Loaded {len(keys)} signing keys from {self.path}")
+    
+    def get(self, kid: str) -> Optional[jwt.PyJWK]:
+        """Key for kid; the file is re-read (throttled) when it changed or kid is unknown"""
+        now = time.monotonic()
+        since_check = now - self._checked
+        # Periodically, or sooner (at most once a second) for a kid we don't know
+        if since_check >= self.min_reload_seconds or (kid not in self._keys and since_check >= 1.0):
+            with self._lock:
+                self._checked = now
+                try:
+                    if os.stat(self.path).st_mtime != self._mtime:
+                        self._load()
+                except (OSError, ValueError) as e:
+                    logger.warning(f"JWKS reload failed, keeping current keys: {e}")
+        return self._keys.get(kid)
+
+
+class AuthManager:
+    """Authentication and authorization manager"""
+    
+    def __init__(
+        self,
+        secret_key: Optional[str] = None,
+        algorithm: str = "HS256",
+        jwks_path: Optional[str] = None,
+        private_key: Optional[str] = None,
+        key_id: Optional[str] = None,
+        cache: Optional[VerifiedTokenCache] = None
+    ):
+        if algorithm not in SYMMETRIC_ALGORITHMS + ASYMMETRIC_ALGORITHMS:
+            raise ValueError(f"Unsupported JWT algorithm: {algorithm}")
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+        self.jwks = JWKSKeySet(jwks_path) if jwks_path else None
+        self.private_key = private_key
+        self.key_id = key_id
+        self.cache = cache if cache is not None else VerifiedTokenCache()
+        
+        # Accepted algorithms follow the configured keys, never the token header alone
+        self.accepted_algorithms = set()
+        if secret_key:
+            self.accepted_algorithms.update(SYMMETRIC_ALGORITHMS)
+        if self.jwks is not None:
+            self.accepted_algorithms.update(ASYMMETRIC_ALGORITHMS)
+    
+    @classmethod
+    def from_env(cls) -> 'AuthManager':
+        """JWT_SECRET_KEY, JWT_ALGORITHM, JWT_JWKS_PATH, JWT_PRIVATE_KEY_PATH, JWT_KEY_ID, JWT_CACHE_*"""
+        algorithm = os.getenv('JWT_ALGORITHM', 'HS256')
+        private_key = None
+        if os.getenv('JWT_PRIVATE_KEY_PATH'):
+            with open(os.environ['JWT_PRIVATE_KEY_PATH']) as f:
+                private_key = f.read()
+        
+        return cls(
+            # With RS256/ES256, HS256 tokens are only accepted if a secret is set explicitly
+            secret_key=os.getenv('JWT_SECRET_KEY') or ('your-secret-key-here' if algorithm == 'HS256' else None),
+            algorithm=algorithm,
+            jwks_path=os.getenv('JWT_JWKS_PATH') or None,
+            private_key=private_key,
+            key_id=os.getenv('JWT_KEY_ID') or None,
+            cache=VerifiedTokenCache(
+                max_entries=int(os.getenv('JWT_CACHE_SIZE', '10000')),
+                max_ttl_seconds=float(os.getenv('JWT_CACHE_MAX_SECONDS', '300'))
+            )
+        )
+    
+    def _verification_key(self, token: str) -> Tuple[Any, str]:
+        header = jwt.get_unverified_header(token)
+        algorithm = header.get('alg')
+        if algorithm not in self.accepted_algorithms:
+            raise jwt.InvalidAlgorithmError(f"Algorithm {algorithm} not accepted")
+        if algorithm in SYMMETRIC_ALGORITHMS:
+            return self.secret_key, algorithm
+        
+        jwk = self.jwks.get(header.get('kid') or '')
+        if jwk is None:
+            raise jwt.InvalidTokenError("Unknown key id")
+        if jwk.algorithm_name != algorithm:
+            raise jwt.InvalidAlgorithmError(f"Key {header.get('kid')} is not a {algorithm} key")
+        return jwk.key, algorithm
+    
+    def verify_token(self, token: str) -> Dict[str, Any]:
+        """Verify JWT token"""
+        payload = self.cache.get(token)
+        if payload is not None:
+            return payload
+        
+        try:
+            key, algorithm = self._verification_key(token)
+            payload = jwt.decode(token, key, algorithms=[algorithm])
+        except jwt.ExpiredSignatureError:
+            raise HTTPException(status_code=401, detail="Token expired")
+        except jwt.InvalidTokenError:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        
+        self.cache.put(token, payload)
+        return payload
+    
+    def create_token(self, user_id: str, organization_id: str, expires_delta: timedelta = None) -> str:
+        """Create JWT token"""
+        if expires_delta:
+            expire = datetime.utcnow() + expires_delta
+        else:
+            expire = datetime.utcnow() + timedelta(hours=24)
+        
+        payload = {
+            "sub": user_id,
+            "org_id": organization_id,
+            "exp": expire,
+            "iat": datetime.utcnow()
+        }
+        
+        if self.algorithm in ASYMMETRIC_ALGORITHMS:
+            if not self.private_key:
+                raise ValueError(f"{self.algorithm} tokens need a private key (JWT_PRIVATE_KEY_PATH)")
+            return jwt.encode(payload, self.private_key, algorithm=self.algorithm, headers={'kid': self.key_id})
+        
+        return jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
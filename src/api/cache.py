@@ -0,0 +1,262 @@
+"""
+Response Cache for the API
+Typed cache families (document status, FHIR conversions, patient document
+lists) on the gateway's async Redis pool. Each family has its own TTL and
+a shorter one for negative results (the loader found nothing); concurrent
+misses on a key share one load (single-flight), and hits, misses and
+loads are counted per family. A load overlapped by an invalidation of its
+key returns its value but does not store it.
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from redis import asyncio as aioredis
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Stored for negative results; never valid JSON, so it cannot collide with a value
+_NEGATIVE = '!none'
+
+# invalidate() bumps a version next to each shared key; a load only stores
+# its value if the version is still the one read before loading
+VERSIONED_SET_SCRIPT = """
+local current = redis.call('GET', KEYS[2]) or ''
+if current ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'PX', ARGV[3])
+return 1
+"""
+
+# Longer than any load, so a version cannot expire while one is in flight
+VERSION_TTL_MS = 600000
+
+
+def create_redis_pool(url: Optional[str] = None, max_connections: Optional[int] = None) -> aioredis.Redis:
+    """
+    Async client over a bounded pool (REDIS_URL, REDIS_MAX_CONNECTIONS)
+    Requests wait up to REDIS_POOL_TIMEOUT seconds for a free connection
+    instead of opening new ones past the limit
+    """
+    pool = aioredis.BlockingConnectionPool.from_url(
+        url or os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
+        max_connections=max_connections or int(os.getenv('REDIS_MAX_CONNECTIONS', '50')),
+        timeout=float(os.getenv('REDIS_POOL_TIMEOUT', '2')),
+        socket_connect_timeout=1,
+        socket_timeout=float(os.getenv('REDIS_SOCKET_TIMEOUT', '2')),
+        decode_responses=True
+    )
+    return aioredis.Redis(connection_pool=pool)
+
+
+async def close_redis_pool(client: aioredis.Redis):
+    await client.aclose()
+    await client.connection_pool.disconnect()
+
+
+def digest_key(value: Any) -> str:
+    """Stable key for a JSON-serialisable value"""
+    canonical = json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+@dataclass
+class CacheFamily:
+    """One kind of cached value"""
+    name: str
+    ttl_seconds: float
+    negative_ttl_seconds: float
+    shared: bool = True  # Redis (all workers) or this process only
+    max_local_entries: int = 10000
+
+
+CACHE_FAMILIES = {
+    # Job records already live in Redis; the per-process tier coalesces
+    # clients polling the same job and absorbs lookups of unknown ids
+    'document_status': CacheFamily('document_status', ttl_seconds=1, negative_ttl_seconds=5, shared=False),
+    'fhir_conversion': CacheFamily('fhir_conversion', ttl_seconds=3600, negative_ttl_seconds=60),
+    'patient_documents': CacheFamily('patient_documents', ttl_seconds=30, negative_ttl_seconds=10),
+}
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    negative_hits: int = 0
+    misses: int = 0
+    coalesced: int = 0  # misses answered by another request's load
+    loads: int = 0
+    load_errors: int = 0
+    redis_errors: int = 0
+    load_seconds: float = 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.negative_hits + self.misses
+        stats = asdict(self)
+        stats['load_seconds'] = round(self.load_seconds, 3)
+        stats['hit_ratio'] = round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+class ResponseCache:
+    """
+    get_or_load() per family and key; a loader returning None is cached as
+    a negative result. Shared families fall back to the process-local tier
+    while Redis is not configured
+    """
+    
+    def __init__(self, redis_client=None, families: Optional[Dict[str, CacheFamily]] = None, prefix: str = 'cache'):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.families = {**CACHE_FAMILIES, **(families or {})}
+        self._stats = {name: CacheStats() for name in self.families}
+        self._local: Dict[str, 'OrderedDict[str, Tuple[float, Any]]'] = {name: OrderedDict() for name in self.families}
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        # In-flight loads invalidated in this process; their result is not stored
+        self._stale: set = set()
+    
+    @property
+    def redis(self):
+        return self._redis
+    
+    @redis.setter
+    def redis(self, client):
+        self._redis = client
+        self._versioned_set = client.register_script(VERSIONED_SET_SCRIPT) if client is not None else None
+    
+    async def get_or_load(
+        self,
+        family: str,
+        key: str,
+        loader: Callable[[], Awaitable[Optional[Any]]]
+    ) -> Optional[Any]:
+        """Cached value, or the loader's result (stored) on a miss"""
+        fam = self.families[family]
+        stats = self._stats[family]
+        
+        found, value, version = await self._read(fam, key)
+        if found:
+            if value is None:
+                stats.negative_hits += 1
+            else:
+                stats.hits += 1
+            return value
+        stats.misses += 1
+        
+        flight_key = (family, key)
+        while flight_key in self._inflight:
+            pending = self._inflight[flight_key]
+            try:
+                value = await asyncio.shield(pending)
+                stats.coalesced += 1
+                return value
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The loading request went away; load it here instead
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[flight_key] = future
+        start = time.perf_counter()
+        stats.loads += 1
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            stats.load_errors += 1
+            future.set_exception(e)
+            future.exception()  # waiters re-raise it; don't log it as unretrieved
+            raise
+        finally:
+            stats.load_seconds += time.perf_counter() - start
+            self._inflight.pop(flight_key, None)
+            invalidated = flight_key in self._stale
+            self._stale.discard(flight_key)
+        
+        future.set_result(value)
+        # Invalidated while loading: the value may predate the change
+        if not invalidated:
+            await self._write(fam, key, value, version)
+        return value
+    
+    async def invalidate(self, family: str, key: str):
+        fam = self.families[family]
+        self._local[family].pop(key, None)
+        if (family, key) in self._inflight:
+            self._stale.add((family, key))
+        if fam.shared and self.redis is not None:
+            redis_key = self._redis_key(fam, key)
+            try:
+                async with self.redis.pipeline(transaction=True) as pipe:
+                    pipe.delete(redis_key)
+                    pipe.incr(f"{redis_key}:version")
+                    pipe.pexpire(f"{redis_key}:version", VERSION_TTL_MS)
+                    await pipe.execute()
+            except Exception as e:
+                self._stats[family].redis_errors += 1
+                logger.warning(f"Cache invalidation failed for {family}:{key}: {e}")
+    
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-family counters and hit ratio"""
+        return {name: stats.to_dict() for name, stats in self._stats.items()}
+    
+    def _redis_key(self, fam: CacheFamily, key: str) -> str:
+        return f"{self.prefix}:{fam.name}:{key}"
+    
+    async def _read(self, fam: CacheFamily, key: str) -> Tuple[bool, Optional[Any], Optional[str]]:
+        """(found, value, version to hand back to _write)"""
+        if fam.shared and self.redis is not None:
+            redis_key = self._redis_key(fam, key)
+            try:
+                raw, version = await self.redis.mget(redis_key, f"{redis_key}:version")
+            except Exception as e:
+                self._stats[fam.name].redis_errors += 1
+                logger.warning(f"Cache read failed for {fam.name}:{key}: {e}")
+                return False, None, None
+            if raw is None:
+                return False, None, version or ''
+            return True, (None if raw == _NEGATIVE else json.loads(raw)), version
+        
+        entry = self._local[fam.name].get(key)
+        if entry is None:
+            return False, None, None
+        expires, value = entry
+        if expires <= time.monotonic():
+            del self._local[fam.name][key]
+            return False, None, None
+        return True, value, None
+    
+    async def _write(self, fam: CacheFamily, key: str, value: Optional[Any], version: Optional[str]):
+        ttl = fam.ttl_seconds if value is not None else fam.negative_ttl_seconds
+        if fam.shared and self.redis is not None:
+            if version is None:
+                # The read went to the local tier or failed; no version to check against
+                return
+            redis_key = self._redis_key(fam, key)
+            try:
+                raw = _NEGATIVE if value is None else json.dumps(value, default=str)
+                await self._versioned_set(
+                    keys=[redis_key, f"{redis_key}:version"], args=[version, raw, int(ttl * 1000)]
+                )
+            except Exception as e:
+                self._stats[fam.name].redis_errors += 1
+                logger.warning(f"Cache write failed for {fam.name}:{key}: {e}")
+            return
+        
+        local = self._local[fam.name]
+        local[key] = (time.monotonic() + ttl, value)
+        local.move_to_end(key)
+        while len(local) > fam.max_local_entries:
+            local.popitem(last=False)
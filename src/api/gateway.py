@@ -3,22 +3,32 @@ API Gateway for PayerHub Integration
 FastAPI-based gateway with rate limiting, authentication, and routing
 """
 
+import os
+import re
+import uuid
+import shutil
+import asyncio
 import logging
+import functools
+from contextlib import asynccontextmanager
 from typing import Dict, Any, List, Optional
-from datetime import datetime, timedelta
-import hashlib
-import jwt
+from datetime import datetime
+from pathlib import Path
 
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Header, Request, Form
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Request, Form
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, HTMLResponse
 from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
-import redis
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+
+from src.core.ai_pipeline.model_registry import model_registry
+from src.api.auth import AuthManager
+from src.api.cache import ResponseCache, create_redis_pool, close_redis_pool, digest_key
+from src.api.jobs import DocumentJobQueue, JobStore, JOB_QUEUED
+from src.api.rate_limiting import RateLimit, TokenBucketLimiter, client_address
+from src.api.uploads import UploadLimits, UploadSizeLimitMiddleware, store_upload
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -51,16 +61,57 @@ class FHIRResourceRequest(BaseModel):
     resource_data: Dict[str, Any]
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Redis pool, model warm-up and pipeline workers (defined below); on
+    shutdown the workers stop first, then the privacy manager and Redis close
+    """
+    await connect_redis()
+    try:
+        await warm_up_models()
+        job_queue.start()
+        try:
+            yield
+        finally:
+            # Stops the pipeline workers and closes the orchestrator
+            await job_queue.stop()
+    finally:
+        unloader = getattr(app.state, 'model_unloader', None)
+        if unloader is not None:
+            unloader.cancel()
+        await close_privacy_manager()
+        await disconnect_redis()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="PayerHub Integration API",
     description="Event-driven API for payer data integration",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="src/web"), name="static")
 
+# Initialize auth manager (JWT_* environment variables; see src/api/auth.py)
+auth_manager = AuthManager.from_env()
+
+
+def _token_organization(token: str) -> Optional[str]:
+    """Organization of a valid bearer token, else None"""
+    try:
+        return auth_manager.verify_token(token).get('org_id')
+    except HTTPException:
+        return None
+
+
+# Upload size limits: the token's tenant limit on the raw body before it is
+# parsed (and on the file itself in the handler)
+upload_limits = UploadLimits()
+app.add_middleware(UploadSizeLimitMiddleware, limits=upload_limits, tenant_of=_token_organization)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -70,111 +121,142 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Rate limiting
-limiter = Limiter(key_func=get_remote_address)
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-
 # Security
 security = HTTPBearer()
 
-# Redis for caching and rate limiting (optional)
-try:
-    redis_client = redis.Redis(
-        host='localhost',
-        port=6379,
-        db=0,
-        decode_responses=True,
-        socket_connect_timeout=1
-    )
-    redis_client.ping()
-    redis_available = True
-except:
-    redis_client = None
-    redis_available = False
-    logger.warning("Redis not available - rate limiting and caching disabled")
+# Redis (redis.asyncio pool) is connected at startup and shared by the rate
+# limiter, job store and response cache; each works in-process without it
+response_cache = ResponseCache()
 
 
-class AuthManager:
-    """Authentication and authorization manager"""
-    
-    def __init__(self, secret_key: str):
-        self.secret_key = secret_key
-        self.algorithm = "HS256"
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
+    """Dependency to get current authenticated user"""
+    token = credentials.credentials
+    return auth_manager.verify_token(token)
+
+
+# Rate limiting: per-client limits on each route plus a per-user limit on the
+# expensive endpoints, all checked in one Redis call (local buckets if Redis is down)
+rate_limiter = TokenBucketLimiter(
+    max_lease=int(os.getenv('RATE_LIMIT_MAX_LEASE', '20')),
+    lease_seconds=float(os.getenv('RATE_LIMIT_LEASE_SECONDS', '1')),
+    enabled=os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+)
+USER_RATE_LIMIT = RateLimit.parse(f"{os.getenv('RATE_LIMIT_PER_HOUR', '100')}/hour")
+
+
+def rate_limited(route: str, limit: str, per_user: bool = False):
+    """Dependency enforcing limit per client on the route (and USER_RATE_LIMIT per user)"""
+    route_limit = RateLimit.parse(limit)
     
-    def verify_token(self, token: str) -> Dict[str, Any]:
-        """Verify JWT token"""
-        try:
-            payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
-            return payload
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token expired")
-        except jwt.InvalidTokenError:
-            raise HTTPException(status_code=401, detail="Invalid token")
+    async def check(request: Request, current_user: Dict = Depends(get_current_user)):
+        limits = [(f"route:{route}:{client_address(request)}", route_limit)]
+        if per_user:
+            limits.append((f"user:{current_user['sub']}", USER_RATE_LIMIT))
+        await rate_limiter.check(limits)
     
-    def create_token(self, user_id: str, organization_id: str, expires_delta: timedelta = None) -> str:
-        """Create JWT token"""
-        if expires_delta:
-            expire = datetime.utcnow() + expires_delta
-        else:
-            expire = datetime.utcnow() + timedelta(hours=24)
-        
-        payload = {
-            "sub": user_id,
-            "org_id": organization_id,
-            "exp": expire,
-            "iat": datetime.utcnow()
-        }
-        
-        return jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
+    return check
 
 
-# Initialize auth manager
-auth_manager = AuthManager(secret_key="your-secret-key-here")  # Use environment variable in production
+# Shared components (built once per process instead of per request)
+@functools.lru_cache(maxsize=None)
+def get_fhir_mapper():
+    from src.core.fhir_mapper.mapper import FHIRMapper
+    return FHIRMapper({'fhir_base_url': 'https://fhir.payerhub.com'})
 
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
-    """Dependency to get current authenticated user"""
-    token = credentials.credentials
-    return auth_manager.verify_token(token)
+@functools.lru_cache(maxsize=None)
+def get_privacy_manager():
+    from src.core.privacy_layer.privacy_manager import PrivacyManager
+    return PrivacyManager({
+        'db_host': 'localhost',
+        'db_name': 'payerhub',
+        'db_user': 'payerhub_user',
+        'db_password': 'secure_password',
+        'consent_cache_redis_url': os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
+        'consent_cache_ttl_seconds': float(os.getenv('CONSENT_CACHE_TTL_SECONDS', '60'))
+    })
+
 
+@functools.lru_cache(maxsize=None)
+def get_orchestrator():
+    from src.orchestrator import PayerHubOrchestrator
+    return PayerHubOrchestrator()
 
-class RateLimiter:
-    """Custom rate limiter with Redis"""
+
+# Uploads are stored under UPLOAD_DIR/{document_id}/ and processed by the job queue
+UPLOAD_DIR = os.getenv('UPLOAD_DIR', '/tmp/payerhub')
+
+async def _job_changed(record: Dict[str, Any]):
+    """Drop cached views of a job record that was just written"""
+    await response_cache.invalidate('document_status', record['document_id'])
+    if record.get('patient_id') and record.get('organization_id'):
+        await response_cache.invalidate('patient_documents', f"{record['organization_id']}:{record['patient_id']}")
+
+
+job_queue = DocumentJobQueue(
+    get_orchestrator,
+    JobStore(on_change=_job_changed),
+    workers=int(os.getenv('JOB_WORKERS', '2')),
+    max_queued=int(os.getenv('JOB_QUEUE_SIZE', '100')),
+    keep_files=os.getenv('JOB_KEEP_FILES', 'false').lower() == 'true'
+)
+
+
+def _safe_filename(filename: Optional[str]) -> str:
+    """Client file name reduced to a plain, path-free name"""
+    name = re.sub(r'[^A-Za-z0-9._-]', '_', Path(filename or '').name).lstrip('.')
+    return name[:255] or 'upload'
+
+
+async def _unload_idle_models(max_idle_seconds: float):
+    """Periodically release models nobody has used for a while"""
+    while True:
+        await asyncio.sleep(max(60.0, max_idle_seconds / 4))
+        unloaded = model_registry.unload_idle(max_idle_seconds)
+        if unloaded:
+            logger.info(f"Unloaded idle models: {unloaded}")
+
+
+async def connect_redis():
+    """Open the async Redis pool and hand it to the components that use it"""
+    client = create_redis_pool()
+    try:
+        await client.ping()
+    except Exception as e:
+        logger.warning(f"Redis not available ({e}) - rate limits, job state and cache are per process")
+        await close_redis_pool(client)
+        client = None
     
-    def __init__(self, redis_client):
-        self.redis = redis_client
+    app.state.redis = client
+    rate_limiter.bind_redis(client)
+    job_queue.store.redis = client
+    response_cache.redis = client
+
+
+async def warm_up_models():
+    """Load registered models before traffic arrives (MODEL_WARMUP=true)"""
+    if os.getenv('MODEL_WARMUP', 'false').lower() == 'true':
+        loaded = await asyncio.get_running_loop().run_in_executor(None, model_registry.warm_up)
+        logger.info(f"Warmed up models: {loaded}")
     
-    def check_rate_limit(self, user_id: str, limit: int = 100, window: int = 3600) -> bool:
-        """Check if user has exceeded rate limit"""
-        if not self.redis:
-            # Redis not available, allow all requests
-            return True
-            
-        try:
-            key = f"rate_limit:{user_id}"
-            
-            # Get current count
-            count = self.redis.get(key)
-            
-            if count is None:
-                # First request in window
-                self.redis.setex(key, window, 1)
-                return True
-            
-            count = int(count)
-            if count >= limit:
-                return False
-            
-            # Increment counter
-            self.redis.incr(key)
-            return True
-        except:
-            # Redis error, allow request
-            return True
-
-
-rate_limiter = RateLimiter(redis_client)
+    max_idle = float(os.getenv('MODEL_IDLE_UNLOAD_SECONDS', '0'))
+    if max_idle > 0:
+        app.state.model_unloader = asyncio.ensure_future(_unload_idle_models(max_idle))
+
+
+async def close_privacy_manager():
+    """Release the privacy database pool"""
+    if get_privacy_manager.cache_info().currsize:
+        await run_in_threadpool(get_privacy_manager().close)
+
+
+async def disconnect_redis():
+    """Close the Redis pool"""
+    client = getattr(app.state, 'redis', None)
+    if client is not None:
+        await close_redis_pool(client)
+        app.state.redis = None
 
 
 # API Endpoints
@@ -211,8 +293,9 @@ async def health_check():
     
     # Check Redis
     try:
+        redis_client = getattr(app.state, 'redis', None)
         if redis_client:
-            redis_client.ping()
+            await redis_client.ping()
             health_status["redis"] = "healthy"
         else:
             health_status["redis"] = "not configured"
@@ -222,196 +305,30 @@ async def health_check():
     return health_status
 
 
-def extract_patient_info(text: str) -> Dict[str, Any]:
-    """Extract patient information from text using regex"""
-    import re
-    
-    patient_info = {}
-    
-    # Patient Name patterns
-    name_patterns = [
-        r'Patient\s+Name[:\s]+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)',
-        r'Name[:\s]+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)',
-        r'Member\s+Name[:\s]+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)',
-        r'PATIENT[:\s]+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)',
-    ]
-    
-    for pattern in name_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            # Clean up the name - remove newlines and extra spaces
-            name = match.group(1).strip()
-            name = re.sub(r'\s*\n.*$', '', name)  # Remove everything after newline
-            name = re.sub(r'\s+', ' ', name)  # Normalize spaces
-            patient_info['patient_name'] = name
-            break
-    
-    # Patient ID patterns
-    id_patterns = [
-        r'Patient\s+ID[:\s]+([A-Z0-9-]+)',
-        r'Member\s+ID[:\s]+([A-Z0-9-]+)',
-        r'ID[:\s]+([A-Z0-9]{3,})',
-    ]
-    
-    for pattern in id_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            patient_info['patient_id'] = match.group(1).strip()
-            break
-    
-    # Date of Birth patterns
-    dob_patterns = [
-        r'Date\s+of\s+Birth[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-        r'DOB[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-        r'Birth\s+Date[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-    ]
-    
-    for pattern in dob_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            patient_info['date_of_birth'] = match.group(1).strip()
-            break
-    
-    # Phone patterns
-    phone_patterns = [
-        r'Phone[:\s]+(\(\d{3}\)\s*\d{3}-\d{4})',
-        r'Phone[:\s]+(\d{3}-\d{3}-\d{4})',
-        r'Tel[:\s]+(\(\d{3}\)\s*\d{3}-\d{4})',
-    ]
-    
-    for pattern in phone_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            patient_info['phone'] = match.group(1).strip()
-            break
-    
-    return patient_info
+@app.get("/health/metrics", tags=["Health"])
+async def health_metrics():
+    """Model registry state: loaded models, memory footprint and usage"""
+    return model_registry.stats()
 
 
-def extract_insurance_info(text: str) -> Dict[str, Any]:
-    """Extract insurance information from text using regex"""
-    import re
-    
-    insurance_info = {}
-    
-    # Insurance Company patterns
-    company_patterns = [
-        r'Insurance\s+Company[:\s]+([A-Za-z\s&]+?)(?:\n|Policy|Group|Member)',
-        r'Insurance[:\s]+([A-Za-z\s&]+?)(?:\n|Policy|Group|Member)',
-        r'Carrier[:\s]+([A-Za-z\s&]+?)(?:\n|Policy|Group|Member)',
-        r'Payer[:\s]+([A-Za-z\s&]+?)(?:\n|Policy|Group|Member)',
-    ]
-    
-    for pattern in company_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            # Clean up the company name
-            company = match.group(1).strip()
-            company = re.sub(r'\s*\n.*$', '', company)  # Remove everything after newline
-            company = re.sub(r'\s+', ' ', company)  # Normalize spaces
-            insurance_info['insurance_company'] = company
-            break
-    
-    # Policy Number patterns
-    policy_patterns = [
-        r'Policy\s+Number[:\s]+([A-Z0-9-]+)',
-        r'Policy[:\s]+([A-Z0-9-]+)',
-        r'Member\s+ID[:\s]+([A-Z0-9-]+)',
-    ]
-    
-    for pattern in policy_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            insurance_info['policy_number'] = match.group(1).strip()
-            break
-    
-    # Group Number patterns
-    group_patterns = [
-        r'Group\s+Number[:\s]+([A-Z0-9-]+)',
-        r'Group[:\s]+([A-Z0-9-]+)',
-    ]
-    
-    for pattern in group_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            insurance_info['group_number'] = match.group(1).strip()
-            break
-    
-    # Plan Type patterns
-    plan_patterns = [
-        r'Plan[:\s]+([A-Za-z\s]+?)(?:\n|Effective)',
-        r'Plan\s+Type[:\s]+([A-Za-z\s]+?)(?:\n|Effective)',
-    ]
-    
-    for pattern in plan_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            insurance_info['plan_type'] = match.group(1).strip()
-            break
-    
-    return insurance_info
+@app.get("/health/database", tags=["Health"])
+async def health_database():
+    """Connection pool metrics of the privacy database"""
+    from src.core.privacy_layer.db import pool_stats
+    return pool_stats()
 
 
-def extract_clinical_info(text: str) -> Dict[str, Any]:
-    """Extract clinical information from text using regex"""
-    import re
-    
-    clinical_info = {}
-    
-    # Diagnosis patterns
-    diagnosis_patterns = [
-        r'Diagnosis[:\s]+([A-Za-z\s,]+?)(?:\n|Procedure|CPT)',
-        r'ICD-10[:\s]+([A-Z0-9.]+)',
-        r'Diagnosis\s+Code[:\s]+([A-Z0-9.]+)',
-    ]
-    
-    for pattern in diagnosis_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            clinical_info['diagnosis'] = match.group(1).strip()
-            break
-    
-    # Procedure patterns
-    procedure_patterns = [
-        r'Procedure[:\s]+([A-Za-z\s]+?)(?:\n|CPT)',
-        r'Service[:\s]+([A-Za-z\s]+?)(?:\n|CPT)',
-    ]
-    
-    for pattern in procedure_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            clinical_info['procedure'] = match.group(1).strip()
-            break
-    
-    # CPT Code patterns
-    cpt_patterns = [
-        r'CPT\s+Code[:\s]+(\d{5})',
-        r'CPT[:\s]+(\d{5})',
-    ]
-    
-    for pattern in cpt_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            clinical_info['cpt_code'] = match.group(1).strip()
-            break
-    
-    # Provider patterns
-    provider_patterns = [
-        r'Provider\s+Name[:\s]+(Dr\.\s+[A-Za-z\s]+)',
-        r'Physician[:\s]+(Dr\.\s+[A-Za-z\s]+)',
-    ]
-    
-    for pattern in provider_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            # Clean up the provider name
-            provider = match.group(1).strip()
-            provider = re.sub(r'\s*\n.*$', '', provider)  # Remove everything after newline
-            provider = re.sub(r'\s+', ' ', provider)  # Normalize spaces
-            clinical_info['provider_name'] = provider
-            break
-    
-    return clinical_info
+@app.get("/health/consent-cache", tags=["Health"])
+async def health_consent_cache():
+    """Consent decision cache hit ratio and invalidations"""
+    from src.core.privacy_layer.consent_cache import consent_cache_stats
+    return consent_cache_stats()
+
+
+@app.get("/health/cache", tags=["Health"])
+async def health_cache():
+    """Response cache hit ratios per key family"""
+    return response_cache.stats()
 
 
 @app.post("/api/v1/auth/token", response_model=APIResponse, tags=["Authentication"])
@@ -429,8 +346,13 @@ async def create_auth_token(user_id: str, organization_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/v1/documents/upload", response_model=APIResponse, tags=["Documents"])
-@limiter.limit("10/minute")
+@app.post(
+    "/api/v1/documents/upload",
+    response_model=APIResponse,
+    status_code=202,
+    tags=["Documents"],
+    dependencies=[Depends(rate_limited("upload", "10/minute", per_user=True))]
+)
 async def upload_document(
     request: Request,
     file: UploadFile = File(...),
@@ -441,108 +363,70 @@ async def upload_document(
 ):
     """
     Upload document for processing
+    The file is stored and queued; poll /api/v1/documents/{document_id}/status
+    for the pipeline result
     """
+    # The job belongs to the token's organization; the form field may not name another one
+    if organization_id != current_user.get('org_id'):
+        raise HTTPException(status_code=403, detail="organization_id does not match the authenticated organization")
+    
+    document_id = f"DOC-{uuid.uuid4()}"
+    document_dir = Path(UPLOAD_DIR) / document_id
+    
     try:
-        import json
-        import os
-        
-        # Check rate limit
-        if not rate_limiter.check_rate_limit(current_user['sub']):
-            raise HTTPException(status_code=429, detail="Rate limit exceeded")
-        
-        # Create temp directory if it doesn't exist
-        os.makedirs("/tmp/payerhub", exist_ok=True)
-        
-        # Save file temporarily
-        file_path = f"/tmp/payerhub/{file.filename}"
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        
-        # Read and extract data from the uploaded file
-        import uuid
-        import re
-        
-        document_id = f"DOC-{uuid.uuid4()}"
-        
-        # Extract text from file
-        extracted_text = ""
-        try:
-            # Try to read as text
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                extracted_text = f.read()
-        except:
-            extracted_text = "Unable to extract text from file"
-        
-        # Extract patient information using regex
-        patient_info = extract_patient_info(extracted_text)
-        insurance_info = extract_insurance_info(extracted_text)
-        clinical_info = extract_clinical_info(extracted_text)
-        
-        # Count entities found
-        entities_count = len([v for v in {**patient_info, **insurance_info, **clinical_info}.values() if v])
-        
-        # Calculate confidence based on how much data we extracted
-        confidence = min(0.95, 0.5 + (entities_count * 0.05))
-        
-        # Build response with extracted data
-        result = {
-            'correlation_id': f"CORR-{uuid.uuid4()}",
-            'document_id': document_id,
-            'status': 'completed',
-            'steps': {
-                'ocr': {
-                    'status': 'completed',
-                    'confidence': confidence,
-                    'document_type': document_type,
-                    'text_length': len(extracted_text),
-                    'file_name': file.filename
-                },
-                'entity_extraction': {
-                    'status': 'completed',
-                    'entities_count': entities_count,
-                    'patient_info': patient_info,
-                    'insurance_info': insurance_info,
-                    'clinical_info': clinical_info
-                },
-                'anomaly_detection': {
-                    'status': 'completed',
-                    'is_anomaly': False,
-                    'anomaly_type': None,
-                    'issues_count': 0
-                },
-                'fhir_conversion': {
-                    'status': 'completed',
-                    'resource_type': 'Claim',
-                    'resource_id': f"FHIR-{uuid.uuid4()}",
-                    'validation_status': 'valid'
-                },
-                'privacy_check': {
-                    'status': 'completed',
-                    'access_allowed': True,
-                    'access_level': 'full_access',
-                    'audit_log_id': f"AUDIT-{uuid.uuid4()}"
-                },
-                'hub_update': {
-                    'status': 'completed',
-                    'hub_record_id': f"HUB-{uuid.uuid4()}"
-                }
-            }
-        }
-        
-        return APIResponse(
-            success=True,
-            message="Document uploaded and processing started",
-            data=result
+        # Streamed to disk in chunks; hashed, sniffed and size-checked on the way
+        stored = await store_upload(
+            file,
+            document_dir / _safe_filename(file.filename),
+            max_bytes=upload_limits.for_tenant(current_user['org_id'])
         )
-        
+    except HTTPException:
+        shutil.rmtree(document_dir, ignore_errors=True)
+        raise
     except Exception as e:
+        shutil.rmtree(document_dir, ignore_errors=True)
         logger.error(f"Document upload failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        await file.close()
+    
+    queued = await job_queue.enqueue({
+        'document_id': document_id,
+        'file_path': stored.path,
+        'file_name': stored.file_name,
+        'size_bytes': stored.size_bytes,
+        'sha256': stored.sha256,
+        'mime_type': stored.mime_type,
+        'document_type': document_type,
+        'patient_id': patient_id,
+        'organization_id': current_user['org_id'],
+        'user_id': current_user['sub']
+    })
+    if not queued:
+        shutil.rmtree(document_dir, ignore_errors=True)
+        raise HTTPException(status_code=503, detail="Processing queue is full, retry later")
+    
+    return APIResponse(
+        success=True,
+        message="Document accepted for processing",
+        data={
+            'document_id': document_id,
+            'status': JOB_QUEUED,
+            'file_name': stored.file_name,
+            'size_bytes': stored.size_bytes,
+            'sha256': stored.sha256,
+            'mime_type': stored.mime_type,
+            'status_url': f"/api/v1/documents/{document_id}/status"
+        }
+    )
 
 
-@app.post("/api/v1/fhir/convert", response_model=APIResponse, tags=["FHIR"])
-@limiter.limit("20/minute")
+@app.post(
+    "/api/v1/fhir/convert",
+    response_model=APIResponse,
+    tags=["FHIR"],
+    dependencies=[Depends(rate_limited("fhir_convert", "20/minute", per_user=True))]
+)
 async def convert_to_fhir(
     request: Request,
     fhir_request: FHIRResourceRequest,
@@ -552,35 +436,48 @@ async def convert_to_fhir(
     Convert data to FHIR resource
     """
     try:
-        from src.fhir_mapper.mapper import FHIRMapper
-        
-        # Check rate limit
-        if not rate_limiter.check_rate_limit(current_user['sub']):
-            raise HTTPException(status_code=429, detail="Rate limit exceeded")
-        
-        # Initialize FHIR mapper
-        mapper = FHIRMapper({'fhir_base_url': 'https://fhir.payerhub.com'})
+        async def convert():
+            try:
+                result = await run_in_threadpool(get_fhir_mapper().convert_to_fhir, fhir_request.resource_data)
+            except ValueError as e:
+                # Unconvertible input (e.g. unsupported document type): cached as negative
+                logger.info(f"FHIR conversion rejected: {e}")
+                return None
+            return {
+                'resource_type': result.resource_type,
+                'resource_id': result.resource_id,
+                'validation_status': result.validation_status
+            }
         
-        # Convert to FHIR
-        result = mapper.convert_to_fhir(fhir_request.resource_data)
+        # Identical payloads from one organization convert to the same resource;
+        # resource ids are minted per conversion, so never shared across organizations
+        converted = await response_cache.get_or_load(
+            'fhir_conversion',
+            f"{current_user.get('org_id')}:{digest_key(fhir_request.resource_data)}",
+            convert
+        )
+        if converted is None:
+            raise HTTPException(status_code=422, detail="Data cannot be converted to a FHIR resource")
         
         return APIResponse(
             success=True,
             message="Data converted to FHIR successfully",
-            data={
-                'resource_type': result.resource_type,
-                'resource_id': result.resource_id,
-                'validation_status': result.validation_status
-            }
+            data=converted
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"FHIR conversion failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/v1/documents/{document_id}/status", response_model=APIResponse, tags=["Documents"])
-@limiter.limit("30/minute")
+@app.get(
+    "/api/v1/documents/{document_id}/status",
+    response_model=APIResponse,
+    tags=["Documents"],
+    dependencies=[Depends(rate_limited("document_status", "30/minute"))]
+)
 async def get_document_status(
     request: Request,
     document_id: str,
@@ -590,30 +487,22 @@ async def get_document_status(
     Get document processing status
     """
     try:
-        # Check cache first
-        if redis_client:
-            try:
-                cached_status = redis_client.get(f"document_status:{document_id}")
-                
-                if cached_status:
-                    import json
-                    status_data = json.loads(cached_status)
-                    
-                    return APIResponse(
-                        success=True,
-                        message="Document status retrieved",
-                        data=status_data
-                    )
-            except:
-                pass
+        status_data = await response_cache.get_or_load(
+            'document_status', document_id, lambda: job_queue.store.get(document_id)
+        )
         
-        # If not in cache, query database
-        # (Implementation depends on your database setup)
+        # Only the uploading organization can see a job
+        if not status_data or status_data.get('organization_id') != current_user.get('org_id'):
+            return APIResponse(
+                success=False,
+                message="Document not found",
+                data=None
+            )
         
         return APIResponse(
-            success=False,
-            message="Document not found",
-            data=None
+            success=True,
+            message="Document status retrieved",
+            data=status_data
         )
         
     except Exception as e:
@@ -621,8 +510,12 @@ async def get_document_status(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/v1/patients/{patient_id}/documents", response_model=APIResponse, tags=["Patients"])
-@limiter.limit("30/minute")
+@app.get(
+    "/api/v1/patients/{patient_id}/documents",
+    response_model=APIResponse,
+    tags=["Patients"],
+    dependencies=[Depends(rate_limited("patient_documents", "30/minute"))]
+)
 async def get_patient_documents(
     request: Request,
     patient_id: str,
@@ -632,17 +525,10 @@ async def get_patient_documents(
     Get all documents for a patient
     """
     try:
-        from src.privacy_layer.privacy_manager import PrivacyManager
+        # Check privacy/consent (first call opens the database pool, off the event loop)
+        privacy_manager = await run_in_threadpool(get_privacy_manager)
         
-        # Check privacy/consent
-        privacy_manager = PrivacyManager({
-            'db_host': 'localhost',
-            'db_name': 'payerhub',
-            'db_user': 'payerhub_user',
-            'db_password': 'secure_password'
-        })
-        
-        privacy_result = privacy_manager.check_access(
+        privacy_result = await privacy_manager.check_access_async(
             user_id=current_user['sub'],
             patient_id=patient_id,
             organization_id=current_user['org_id'],
@@ -656,16 +542,32 @@ async def get_patient_documents(
                 detail="Access denied: " + privacy_result.reason
             )
         
-        # Retrieve documents (implementation depends on database)
-        # For now, return placeholder
+        async def load_documents():
+            records = await job_queue.store.list_for_patient(patient_id, current_user['org_id'])
+            # An empty list is cached as negative, with the shorter TTL
+            return [
+                {
+                    'document_id': r['document_id'],
+                    'file_name': r.get('file_name'),
+                    'document_type': r.get('document_type'),
+                    'status': r.get('status'),
+                    'submitted_at': r.get('submitted_at'),
+                    'completed_at': r.get('completed_at')
+                }
+                for r in records
+            ] or None
+        
+        documents = await response_cache.get_or_load(
+            'patient_documents', f"{current_user['org_id']}:{patient_id}", load_documents
+        ) or []
         
         return APIResponse(
             success=True,
             message="Patient documents retrieved",
             data={
                 'patient_id': patient_id,
-                'document_count': 0,
-                'documents': []
+                'document_count': len(documents),
+                'documents': documents
             }
         )
         
@@ -676,8 +578,12 @@ async def get_patient_documents(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/v1/consent/create", response_model=APIResponse, tags=["Consent"])
-@limiter.limit("10/minute")
+@app.post(
+    "/api/v1/consent/create",
+    response_model=APIResponse,
+    tags=["Consent"],
+    dependencies=[Depends(rate_limited("consent_create", "10/minute"))]
+)
 async def create_consent(
     request: Request,
     patient_id: str,
@@ -690,16 +596,10 @@ async def create_consent(
     Create patient consent record
     """
     try:
-        from src.privacy_layer.privacy_manager import PrivacyManager
+        privacy_manager = await run_in_threadpool(get_privacy_manager)
         
-        privacy_manager = PrivacyManager({
-            'db_host': 'localhost',
-            'db_name': 'payerhub',
-            'db_user': 'payerhub_user',
-            'db_password': 'secure_password'
-        })
-        
-        consent = privacy_manager.create_consent(
+        consent = await run_in_threadpool(
+            privacy_manager.create_consent,
             patient_id=patient_id,
             organization_id=organization_id,
             purpose=purpose,
@@ -730,7 +630,8 @@ async def http_exception_handler(request: Request, exc: HTTPException):
             "error": exc.detail,
             "status_code": exc.status_code,
             "timestamp": datetime.now().isoformat()
-        }
+        },
+        headers=getattr(exc, 'headers', None)
     )
 
 
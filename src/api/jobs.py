@@ -0,0 +1,231 @@
+"""
+Document Job Queue for the API
+Uploads are stored, recorded as a job and queued; a bounded pool of
+asyncio workers runs each job through PayerHubOrchestrator. Job state is
+kept in Redis (document_status:{document_id}, indexed per patient) via
+the gateway's async client, so any API worker can serve the status
+endpoint; without Redis it falls back to process memory.
+"""
+
+import json
+import shutil
+import asyncio
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Job states; the final state is the pipeline's own result status
+# (completed, failed, manual_review_required, access_denied)
+JOB_QUEUED = 'queued'
+JOB_PROCESSING = 'processing'
+
+
+class JobStore:
+    """
+    Job records keyed by document_id (redis_client is a redis.asyncio client)
+    on_change is awaited with each record written, e.g. to invalidate caches
+    """
+    
+    def __init__(
+        self,
+        redis_client=None,
+        ttl_seconds: int = 7 * 24 * 3600,
+        on_change: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+    ):
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.on_change = on_change
+        self._local: Dict[str, Dict[str, Any]] = {}
+    
+    @staticmethod
+    def _key(document_id: str) -> str:
+        return f"document_status:{document_id}"
+    
+    @staticmethod
+    def _patient_key(organization_id: str, patient_id: str) -> str:
+        return f"patient_documents:{organization_id}:{patient_id}"
+    
+    async def get(self, document_id: str) -> Optional[Dict[str, Any]]:
+        if self.redis:
+            try:
+                raw = await self.redis.get(self._key(document_id))
+                return json.loads(raw) if raw else None
+            except Exception as e:
+                logger.warning(f"Job store read failed for {document_id}: {e}")
+        return self._local.get(document_id)
+    
+    async def put(self, document_id: str, record: Dict[str, Any]):
+        record['updated_at'] = datetime.now().isoformat()
+        stored = False
+        if self.redis:
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.setex(self._key(document_id), self.ttl_seconds, json.dumps(record, default=str))
+                    if record.get('patient_id') and record.get('organization_id'):
+                        index = self._patient_key(record['organization_id'], record['patient_id'])
+                        pipe.sadd(index, document_id)
+                        pipe.expire(index, self.ttl_seconds)
+                    await pipe.execute()
+                stored = True
+            except Exception as e:
+                logger.warning(f"Job store write failed for {document_id}: {e}")
+        if not stored:
+            self._local[document_id] = record
+        
+        if self.on_change is not None:
+            await self.on_change(record)
+    
+    async def update(self, document_id: str, **fields) -> Dict[str, Any]:
+        record = await self.get(document_id) or {'document_id': document_id}
+        record.update(fields)
+        await self.put(document_id, record)
+        return record
+    
+    async def list_for_patient(self, patient_id: str, organization_id: str) -> List[Dict[str, Any]]:
+        """Job records of one patient's documents uploaded by an organization, oldest first"""
+        records = []
+        if self.redis:
+            try:
+                index = self._patient_key(organization_id, patient_id)
+                document_ids = sorted(await self.redis.smembers(index))
+                raw_records = await self.redis.mget([self._key(i) for i in document_ids]) if document_ids else []
+                # Records expire before a refreshed index does; drop what is gone
+                expired = [i for i, raw in zip(document_ids, raw_records) if raw is None]
+                if expired:
+                    await self.redis.srem(index, *expired)
+                records = [json.loads(raw) for raw in raw_records if raw]
+            except Exception as e:
+                logger.warning(f"Job store patient lookup failed for {patient_id}: {e}")
+        
+        records += [
+            r for r in self._local.values()
+            if r.get('patient_id') == patient_id and r.get('organization_id') == organization_id
+        ]
+        return sorted(records, key=lambda r: r.get('submitted_at') or '')
+
+
+class DocumentJobQueue:
+    """
+    Bounded queue + fixed number of workers running the real pipeline
+    enqueue() never blocks: a full queue is reported to the caller (503)
+    instead of piling up uploads in memory
+    """
+    
+    def __init__(
+        self,
+        orchestrator_factory: Callable[[], Any],
+        store: JobStore,
+        workers: int = 2,
+        max_queued: int = 100,
+        keep_files: bool = False
+    ):
+        self.orchestrator_factory = orchestrator_factory
+        self.store = store
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.keep_files = keep_files
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._orchestrator = None
+        self._orchestrator_lock: Optional[asyncio.Lock] = None
+    
+    def start(self):
+        """Start the workers (call from the running event loop)"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._orchestrator_lock = asyncio.Lock()
+        self._tasks = [
+            asyncio.ensure_future(self._worker(i)) for i in range(self.workers)
+        ]
+        logger.info(f"Document job queue started with {self.workers} workers")
+    
+    async def stop(self):
+        """Cancel the workers and release the orchestrator"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        
+        if self._orchestrator is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._orchestrator.close)
+            self._orchestrator = None
+    
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+    
+    async def enqueue(self, job: Dict[str, Any]) -> bool:
+        """Record and queue a job; False when the queue is full"""
+        if self._queue is None:
+            self.start()
+        if self._queue.full():
+            return False
+        
+        # Recorded before it is queued, so a worker's updates always land on top
+        await self.store.put(job['document_id'], {
+            'document_id': job['document_id'],
+            'status': JOB_QUEUED,
+            'file_name': job['file_name'],
+            'size_bytes': job.get('size_bytes'),
+            'sha256': job.get('sha256'),
+            'mime_type': job.get('mime_type'),
+            'document_type': job['document_type'],
+            'patient_id': job['patient_id'],
+            'organization_id': job['organization_id'],
+            'submitted_at': datetime.now().isoformat(),
+            'steps': {}
+        })
+        
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            # Filled up by concurrent uploads while the record was written
+            await self.store.update(job['document_id'], status='failed', error='Processing queue is full')
+            return False
+        return True
+    
+    async def _get_orchestrator(self):
+        # Built on first job, off the event loop: it loads models and connects to Kafka/Postgres
+        async with self._orchestrator_lock:
+            if self._orchestrator is None:
+                self._orchestrator = await asyncio.get_running_loop().run_in_executor(
+                    None, self.orchestrator_factory
+                )
+        return self._orchestrator
+    
+    async def _worker(self, worker_id: int):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            except Exception as e:
+                logger.error(f"Job {job['document_id']} failed: {e}")
+                await self.store.update(job['document_id'], status='failed', error=str(e))
+            finally:
+                self._queue.task_done()
+    
+    async def _run(self, job: Dict[str, Any]):
+        document_id = job['document_id']
+        await self.store.update(document_id, status=JOB_PROCESSING, started_at=datetime.now().isoformat())
+        logger.info(f"Processing job {document_id}")
+        
+        try:
+            orchestrator = await self._get_orchestrator()
+            result = await orchestrator.process_document(
+                file_path=job['file_path'],
+                document_type=job['document_type'],
+                patient_id=job['patient_id'],
+                organization_id=job['organization_id'],
+                user_id=job['user_id'],
+                document_id=document_id
+            )
+            await self.store.update(document_id, completed_at=datetime.now().isoformat(), **result)
+        finally:
+            if not self.keep_files:
+                shutil.rmtree(Path(job['file_path']).parent, ignore_errors=True)
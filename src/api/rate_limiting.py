@@ -0,0 +1,277 @@
+"""
+Rate Limiting for the API
+Limits are token buckets kept in Redis. One Lua script (run by EVALSHA)
+refills, checks and debits every bucket that applies to a request in a
+single atomic round-trip. Each process leases tokens in small chunks and
+spends them locally, so most requests under load never reach Redis.
+When Redis is unreachable, the same limits are enforced per process by
+local buckets instead of letting everything through.
+"""
+
+import re
+import time
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# KEYS: one hash per bucket ({tokens, ts})
+# ARGV: capacity, refill rate (tokens/s), tokens wanted, unused tokens returned - per key
+# Returns {seconds to wait (string), tokens granted per key}; either every
+# bucket grants at least one token or none is debited
+TOKEN_BUCKET_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local levels = {}
+local wait = 0
+
+for i, key in ipairs(KEYS) do
+    local base = (i - 1) * 4
+    local capacity = tonumber(ARGV[base + 1])
+    local rate = tonumber(ARGV[base + 2])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local level = tonumber(state[1])
+    if level == nil then
+        level = capacity
+    else
+        level = level + math.max(0, now - (tonumber(state[2]) or now)) * rate
+    end
+    level = math.min(capacity, level + tonumber(ARGV[base + 4]))
+    levels[i] = level
+    if level < 1 then
+        wait = math.max(wait, (1 - level) / rate)
+    end
+end
+
+local result = {tostring(wait)}
+for i, key in ipairs(KEYS) do
+    local base = (i - 1) * 4
+    local capacity = tonumber(ARGV[base + 1])
+    local rate = tonumber(ARGV[base + 2])
+    local granted = 0
+    if wait == 0 then
+        granted = math.min(tonumber(ARGV[base + 3]), math.floor(levels[i]))
+    end
+    redis.call('HSET', key, 'tokens', tostring(levels[i] - granted), 'ts', tostring(now))
+    redis.call('PEXPIRE', key, math.ceil(capacity / rate * 1000) + 1000)
+    result[i + 1] = granted
+end
+return result
+"""
+
+_PERIOD_SECONDS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+_LIMIT_SPEC = re.compile(r'^\s*(\d+)\s*/\s*(second|minute|hour|day)s?\s*$')
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """capacity requests, refilled evenly over period_seconds"""
+    capacity: int
+    period_seconds: float
+    
+    @classmethod
+    def parse(cls, spec: str) -> 'RateLimit':
+        """'10/minute', '100/hour', ..."""
+        match = _LIMIT_SPEC.match(spec)
+        if not match or int(match.group(1)) < 1:
+            raise ValueError(f"Invalid rate limit: {spec!r}")
+        return cls(int(match.group(1)), float(_PERIOD_SECONDS[match.group(2)]))
+    
+    @property
+    def rate(self) -> float:
+        """Tokens refilled per second"""
+        return self.capacity / self.period_seconds
+
+
+class LocalTokenBucket:
+    """In-process token bucket (used while Redis is unreachable)"""
+    
+    def __init__(self, limit: RateLimit):
+        self.limit = limit
+        self.tokens = float(limit.capacity)
+        self.updated = time.monotonic()
+    
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available (0 when one is)"""
+        # now may predate a bucket created during the same request
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(self.limit.capacity, self.tokens + elapsed * self.limit.rate)
+        self.updated = max(self.updated, now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.limit.rate
+    
+    def take(self):
+        self.tokens -= 1
+
+
+@dataclass
+class _Lease:
+    """Tokens already debited in Redis, spendable by this process until expires"""
+    tokens: int
+    expires: float
+
+
+@dataclass
+class RateLimitDecision:
+    allowed: bool
+    retry_after: float = 0.0
+    source: str = 'redis'  # 'lease', 'redis' or 'local'
+
+
+class TokenBucketLimiter:
+    """
+    Distributed token-bucket limiter with local leases and local fallback
+    Leased tokens are debited in Redis before they are spent, so the limits
+    are never exceeded across processes; tokens left in an expired lease are
+    handed back on the next Redis call for that bucket. A lease is at most
+    lease_fraction of the bucket (capped at max_lease), so small limits are
+    checked against Redis on every request
+    """
+    
+    def __init__(
+        self,
+        redis_client=None,
+        prefix: str = 'ratelimit',
+        lease_fraction: float = 0.05,
+        max_lease: int = 20,
+        lease_seconds: float = 1.0,
+        redis_retry_seconds: float = 5.0,
+        max_keys: int = 10000,
+        enabled: bool = True
+    ):
+        self.prefix = prefix
+        self.lease_fraction = lease_fraction
+        self.max_lease = max(1, max_lease)
+        self.lease_seconds = lease_seconds
+        self.redis_retry_seconds = redis_retry_seconds
+        self.max_keys = max_keys
+        self.enabled = enabled
+        self._redis_down_until = 0.0
+        self._leases: 'OrderedDict[str, _Lease]' = OrderedDict()
+        self._local: 'OrderedDict[str, LocalTokenBucket]' = OrderedDict()
+        # Bucket combinations Redis refused, until they can have refilled
+        self._refused: 'OrderedDict[Tuple[str, ...], float]' = OrderedDict()
+        self.bind_redis(redis_client)
+    
+    def bind_redis(self, redis_client):
+        """Keep the shared buckets in redis_client (a redis.asyncio client); None for local buckets only"""
+        self.redis = redis_client
+        self._script = redis_client.register_script(TOKEN_BUCKET_SCRIPT) if redis_client is not None else None
+    
+    def lease_size(self, limit: RateLimit) -> int:
+        return max(1, min(self.max_lease, int(limit.capacity * self.lease_fraction)))
+    
+    async def acquire(self, limits: List[Tuple[str, RateLimit]]) -> RateLimitDecision:
+        """Take one token from every (bucket key, limit); all or nothing"""
+        if not self.enabled or not limits:
+            return RateLimitDecision(True, source='lease')
+        
+        now = time.monotonic()
+        spent: List[_Lease] = []
+        remote: List[Tuple[str, RateLimit]] = []
+        for key, limit in limits:
+            lease = self._leases.get(key)
+            if lease is not None and lease.tokens > 0 and lease.expires > now:
+                lease.tokens -= 1
+                spent.append(lease)
+            else:
+                remote.append((key, limit))
+        
+        if not remote:
+            return RateLimitDecision(True, source='lease')
+        
+        decision = None
+        refused_until = self._refused.get(tuple(key for key, _ in remote), 0.0)
+        if refused_until > now:
+            # Refused moments ago and not refilled yet: no need to ask Redis again
+            decision = RateLimitDecision(False, retry_after=refused_until - now, source='lease')
+        elif self._script is not None and now >= self._redis_down_until:
+            decision = await self._acquire_redis(remote)
+        if decision is None:
+            decision = self._acquire_local(remote, now)
+        
+        if not decision.allowed:
+            # Request refused: the lease tokens taken above were not used
+            for lease in spent:
+                lease.tokens += 1
+        return decision
+    
+    async def check(self, limits: List[Tuple[str, RateLimit]]):
+        """acquire(), raising HTTPException 429 with Retry-After when refused"""
+        decision = await self.acquire(limits)
+        if not decision.allowed:
+            retry_after = max(1, int(decision.retry_after + 0.999))
+            raise HTTPException(
+                status_code=429,
+                detail="Rate limit exceeded",
+                headers={'Retry-After': str(retry_after)}
+            )
+    
+    async def _acquire_redis(self, remote: List[Tuple[str, RateLimit]]) -> Optional[RateLimitDecision]:
+        """One EVALSHA for all buckets; None when Redis failed"""
+        keys, args = [], []
+        for key, limit in remote:
+            # Leftover tokens of an expired lease go back to the shared bucket
+            old = self._leases.pop(key, None)
+            keys.append(f"{self.prefix}:{key}")
+            args.extend([limit.capacity, limit.rate, self.lease_size(limit), old.tokens if old else 0])
+        
+        try:
+            reply = await self._script(keys=keys, args=args)
+        except Exception as e:
+            self._redis_down_until = time.monotonic() + self.redis_retry_seconds
+            logger.warning(f"Rate limiter falling back to local buckets: {e}")
+            return None
+        
+        wait = float(reply[0])
+        if wait > 0:
+            self._refused[tuple(key for key, _ in remote)] = time.monotonic() + wait
+            while len(self._refused) > self.max_keys:
+                self._refused.popitem(last=False)
+            return RateLimitDecision(False, retry_after=wait, source='redis')
+        
+        expires = time.monotonic() + self.lease_seconds
+        for (key, _), granted in zip(remote, reply[1:]):
+            # One token pays for this request, the rest is leased
+            self._add_lease(key, int(granted) - 1, expires)
+        return RateLimitDecision(True, source='redis')
+    
+    def _add_lease(self, key: str, tokens: int, expires: float):
+        lease = self._leases.get(key)
+        if lease is not None:
+            # A concurrent request leased tokens for the same bucket meanwhile
+            lease.tokens += tokens
+            lease.expires = max(lease.expires, expires)
+        else:
+            self._leases[key] = _Lease(tokens, expires)
+        self._leases.move_to_end(key)
+        while len(self._leases) > self.max_keys:
+            self._leases.popitem(last=False)
+    
+    def _acquire_local(self, remote: List[Tuple[str, RateLimit]], now: float) -> RateLimitDecision:
+        buckets = []
+        for key, limit in remote:
+            bucket = self._local.get(key)
+            if bucket is None or bucket.limit != limit:
+                bucket = self._local[key] = LocalTokenBucket(limit)
+            self._local.move_to_end(key)
+            buckets.append(bucket)
+        while len(self._local) > self.max_keys:
+            self._local.popitem(last=False)
+        
+        wait = max(bucket.wait_time(now) for bucket in buckets)
+        if wait > 0:
+            return RateLimitDecision(False, retry_after=wait, source='local')
+        for bucket in buckets:
+            bucket.take()
+        return RateLimitDecision(True, source='local')
+
+
+def client_address(request: Request) -> str:
+    """Client IP of the connection"""
+    return request.client.host if request.client else 'unknown'
@@ -0,0 +1,224 @@
+"""
+Streaming Upload Ingestion
+Upload bodies are copied to storage in fixed-size chunks; the SHA-256 and
+the MIME sniff are computed on the same pass and the tenant's size limit
+is enforced as bytes arrive, so memory per upload stays constant whatever
+the file size. The stored file is handed to OCR by path.
+"""
+
+import os
+import hashlib
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Room for multipart boundaries and the form fields around the file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Leading bytes -> MIME type
+MAGIC_NUMBERS = [
+    (b'%PDF-', 'application/pdf'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'II*\x00', 'image/tiff'),
+    (b'MM\x00*', 'image/tiff'),
+]
+
+# MIME types each accepted extension may contain
+EXTENSION_MIME_TYPES = {
+    '.pdf': {'application/pdf'},
+    '.jpg': {'image/jpeg'},
+    '.jpeg': {'image/jpeg'},
+    '.png': {'image/png'},
+    '.tiff': {'image/tiff'},
+    '.txt': {'text/plain'},
+}
+
+
+def sniff_mime_type(head: bytes) -> str:
+    """MIME type from the first bytes of a file"""
+    for magic, mime_type in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return mime_type
+    if b'\x00' in head:
+        return 'application/octet-stream'
+    try:
+        head.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # Only a multi-byte character cut off at the end of the sample is allowed
+        if e.start < len(head) - 3:
+            return 'application/octet-stream'
+    return 'text/plain'
+
+
+class UploadLimits:
+    """
+    Per-tenant maximum upload size
+    Defaults to MAX_UPLOAD_SIZE_MB; TENANT_UPLOAD_LIMITS_MB overrides it per
+    organization as "ORG1=200,ORG2=10"
+    """
+    
+    def __init__(self, default_mb: Optional[float] = None, tenant_limits_mb: Optional[str] = None):
+        default_mb = default_mb if default_mb is not None else float(os.getenv('MAX_UPLOAD_SIZE_MB', '50'))
+        self.default_bytes = int(default_mb * 1024 * 1024)
+        self.tenant_bytes: Dict[str, int] = {}
+        
+        spec = tenant_limits_mb if tenant_limits_mb is not None else os.getenv('TENANT_UPLOAD_LIMITS_MB', '')
+        for item in filter(None, (part.strip() for part in spec.split(','))):
+            org_id, _, mb = item.partition('=')
+            self.tenant_bytes[org_id.strip()] = int(float(mb) * 1024 * 1024)
+    
+    def for_tenant(self, organization_id: Optional[str]) -> int:
+        return self.tenant_bytes.get(organization_id, self.default_bytes)
+
+
+@dataclass
+class StoredUpload:
+    """An upload written to storage"""
+    path: str
+    file_name: str
+    size_bytes: int
+    sha256: str
+    mime_type: str
+
+
+async def store_upload(
+    file: UploadFile,
+    destination: Path,
+    max_bytes: int,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> StoredUpload:
+    """
+    Copy an upload to destination chunk by chunk
+    Raises HTTPException 413 as soon as max_bytes is passed and 415 when
+    the content does not match the file extension; nothing is left on disk
+    in either case
+    """
+    allowed = EXTENSION_MIME_TYPES.get(destination.suffix.lower())
+    if allowed is None:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Unsupported file type '{destination.suffix}'. Supported: {', '.join(sorted(EXTENSION_MIME_TYPES))}"
+        )
+    
+    partial = destination.with_name(destination.name + '.partial')
+    digest = hashlib.sha256()
+    size = 0
+    mime_type = None
+    
+    await run_in_threadpool(destination.parent.mkdir, parents=True, exist_ok=True)
+    try:
+        with open(partial, 'wb') as f:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File exceeds the {max_bytes // (1024 * 1024)} MB upload limit"
+                    )
+                
+                if mime_type is None:
+                    mime_type = sniff_mime_type(chunk[:2048])
+                    if mime_type not in allowed:
+                        raise HTTPException(
+                            status_code=415,
+                            detail=f"File content ({mime_type}) does not match extension '{destination.suffix}'"
+                        )
+                
+                digest.update(chunk)
+                await run_in_threadpool(f.write, chunk)
+        
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty file")
+        
+        await run_in_threadpool(os.replace, partial, destination)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    
+    return StoredUpload(
+        path=str(destination),
+        file_name=destination.name,
+        size_bytes=size,
+        sha256=digest.hexdigest(),
+        mime_type=mime_type
+    )
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI middleware rejecting upload bodies over the tenant's limit before they are parsed
+    The tenant comes from the bearer token (tenant_of maps a token to an
+    organization id, None if invalid; such requests get the default limit).
+    A declared Content-Length over the limit is refused up front; chunked
+    bodies are counted as they stream in and cut off at the limit
+    """
+    
+    def __init__(
+        self,
+        app,
+        limits: UploadLimits,
+        tenant_of: Optional[Callable[[str], Optional[str]]] = None,
+        path_prefix: str = '/api/v1/documents/upload',
+        overhead_bytes: int = MULTIPART_OVERHEAD_BYTES
+    ):
+        self.app = app
+        self.limits = limits
+        self.tenant_of = tenant_of
+        self.path_prefix = path_prefix
+        self.overhead_bytes = overhead_bytes
+    
+    def max_bytes(self, headers: Dict[bytes, bytes]) -> int:
+        """Body limit for the request's tenant"""
+        tenant = None
+        scheme, _, token = headers.get(b'authorization', b'').decode('latin-1').partition(' ')
+        if self.tenant_of is not None and scheme.lower() == 'bearer' and token:
+            tenant = self.tenant_of(token.strip())
+        return self.limits.for_tenant(tenant) + self.overhead_bytes
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not scope['path'].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+        
+        headers = dict(scope.get('headers') or [])
+        max_bytes = self.max_bytes(headers)
+        declared = headers.get(b'content-length')
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            await self._reject(send)
+            return
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > max_bytes:
+                    raise HTTPException(status_code=413, detail="Request body too large")
+            return message
+        
+        await self.app(scope, limited_receive, send)
+    
+    async def _reject(self, send):
+        body = b'{"error": "Request body too large", "status_code": 413}'
+        await send({
+            'type': 'http.response.start',
+            'status': 413,
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+        })
+        await send({'type': 'http.response.body', 'body': body})
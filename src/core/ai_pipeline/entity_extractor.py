@@ -10,14 +10,11 @@ from datetime import datetime
 from dataclasses import dataclass
 import re
 
-import spacy
-from transformers import (
-    AutoTokenizer, 
-    AutoModelForTokenClassification,
-    pipeline
-)
+import functools
 import torch
-from scispacy.linking import EntityLinker
+
+from src.core.ai_pipeline.model_registry import model_registry, load_biobert, load_spacy, load_scispacy
+from src.core.ai_pipeline.field_extraction import field_extractor
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -56,30 +53,22 @@ class EntityExtractor:
         self.config = config
         self.device = torch.device('cuda' if config.get('use_gpu', False) else 'cpu')
         
-        # Load BioBERT for biomedical NER
+        # Models are loaded on first use and shared through the model registry
         self.biobert_model = config.get('biobert_model', 'dmis-lab/biobert-base-cased-v1.1')
-        self.tokenizer = AutoTokenizer.from_pretrained(self.biobert_model)
-        self.model = AutoModelForTokenClassification.from_pretrained(self.biobert_model)
-        self.model.to(self.device)
-        
-        # Load spaCy for general NER
-        self.nlp = spacy.load("en_core_web_sm")
-        
-        # Load scispacy for medical entity linking
-        try:
-            self.sci_nlp = spacy.load("en_core_sci_md")
-            self.sci_nlp.add_pipe("scispacy_linker", config={"resolve_abbreviations": True})
-        except Exception as e:
-            logger.warning(f"SciSpacy not available: {e}")
-            self.sci_nlp = None
-        
-        # Initialize HuggingFace NER pipeline
-        self.ner_pipeline = pipeline(
-            "ner",
-            model=self.biobert_model,
-            tokenizer=self.tokenizer,
-            device=0 if config.get('use_gpu', False) else -1,
-            aggregation_strategy="simple"
+        # Inference backend: pytorch | quantized | torchscript | onnx (see inference_backends)
+        self.biobert_backend = config.get('biobert_backend', 'pytorch')
+        self.biobert_key = model_registry.register(
+            f"biobert:{self.biobert_model}@{self.device}:{self.biobert_backend}",
+            functools.partial(
+                load_biobert, self.biobert_model, str(self.device), self.biobert_backend,
+                config.get('biobert_artifact'), config.get('inference_threads')
+            )
+        )
+        self.spacy_key = model_registry.register(
+            "spacy:en_core_web_sm", functools.partial(load_spacy, "en_core_web_sm")
+        )
+        self.scispacy_key = model_registry.register(
+            "scispacy:en_core_sci_md", functools.partial(load_scispacy, "en_core_sci_md")
         )
         
         # Regex patterns for specific entities
@@ -87,6 +76,26 @@ class EntityExtractor:
         
         logger.info("Entity Extractor initialized")
     
+    @property
+    def tokenizer(self):
+        return model_registry.get(self.biobert_key)[0]
+    
+    @property
+    def model(self):
+        return model_registry.get(self.biobert_key)[1]
+    
+    @property
+    def ner_pipeline(self):
+        return model_registry.get(self.biobert_key)[2]
+    
+    @property
+    def nlp(self):
+        return model_registry.get(self.spacy_key)
+    
+    @property
+    def sci_nlp(self):
+        return model_registry.get(self.scispacy_key)
+    
     def _compile_patterns(self) -> Dict[str, re.Pattern]:
         """Compile regex patterns for entity extraction"""
         return {
@@ -131,25 +140,26 @@ class EntityExtractor:
         Extract entities using spaCy
         """
         try:
-            doc = self.nlp(text)
-            
-            entities = []
-            for ent in doc.ents:
-                entity = Entity(
-                    text=ent.text,
-                    type=ent.label_,
-                    start=ent.start_char,
-                    end=ent.end_char,
-                    confidence=1.0  # spaCy doesn't provide confidence
-                )
-                entities.append(entity)
-            
-            return entities
-            
+            return self._spacy_entities(self.nlp(text))
         except Exception as e:
             logger.error(f"spaCy extraction failed: {e}")
             return []
     
+    def _spacy_entities(self, doc) -> List[Entity]:
+        """Convert a spaCy doc into entities"""
+        entities = []
+        for ent in doc.ents:
+            entity = Entity(
+                text=ent.text,
+                type=ent.label_,
+                start=ent.start_char,
+                end=ent.end_char,
+                confidence=1.0  # spaCy doesn't provide confidence
+            )
+            entities.append(entity)
+        
+        return entities
+    
     def extract_medical_entities_scispacy(self, text: str) -> List[Entity]:
         """
         Extract and link medical entities using SciSpacy
@@ -158,30 +168,31 @@ class EntityExtractor:
             return []
         
         try:
-            doc = self.sci_nlp(text)
-            
-            entities = []
-            for ent in doc.ents:
-                # Get linked entity codes (UMLS CUI)
-                linked_entities = ent._.kb_ents if hasattr(ent._, 'kb_ents') else []
-                normalized_code = linked_entities[0][0] if linked_entities else None
-                
-                entity = Entity(
-                    text=ent.text,
-                    type=ent.label_,
-                    start=ent.start_char,
-                    end=ent.end_char,
-                    confidence=1.0,
-                    normalized_code=normalized_code
-                )
-                entities.append(entity)
-            
-            return entities
-            
+            return self._scispacy_entities(self.sci_nlp(text))
         except Exception as e:
             logger.error(f"SciSpacy extraction failed: {e}")
             return []
     
+    def _scispacy_entities(self, doc) -> List[Entity]:
+        """Convert a SciSpacy doc into entities with linked codes"""
+        entities = []
+        for ent in doc.ents:
+            # Get linked entity codes (UMLS CUI)
+            linked_entities = ent._.kb_ents if hasattr(ent._, 'kb_ents') else []
+            normalized_code = linked_entities[0][0] if linked_entities else None
+            
+            entity = Entity(
+                text=ent.text,
+                type=ent.label_,
+                start=ent.start_char,
+                end=ent.end_char,
+                confidence=1.0,
+                normalized_code=normalized_code
+            )
+            entities.append(entity)
+        
+        return entities
+    
     def extract_regex_patterns(self, text: str) -> Dict[str, List[str]]:
         """
         Extract entities using regex patterns
@@ -346,9 +357,88 @@ class EntityExtractor:
         spacy_entities = self.extract_entities_spacy(text)
         scispacy_entities = self.extract_medical_entities_scispacy(text)
         
-        # Combine all entities
-        all_entities = biobert_entities + spacy_entities + scispacy_entities
+        return self._build_result(text, biobert_entities + spacy_entities + scispacy_entities)
+    
+    def extract_all_batch(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None
+    ) -> Tuple[List[ExtractionResult], Dict[str, Any]]:
+        """
+        Perform entity extraction for many documents at once
+        BioBERT runs over length-sorted texts in batches (so each batch pads
+        to a similar length) and spaCy/SciSpacy use nlp.pipe. Returns results
+        in input order plus BioBERT batch utilisation stats.
+        """
+        logger.info(f"Starting batched entity extraction for {len(texts)} documents")
+        batch_size = batch_size or self.config.get('ner_batch_size', 16)
+        
+        biobert_entities, stats = self.extract_entities_biobert_batch(texts, batch_size)
+        
+        try:
+            spacy_entities = [self._spacy_entities(doc) for doc in self.nlp.pipe(texts, batch_size=batch_size)]
+        except Exception as e:
+            logger.error(f"spaCy extraction failed: {e}")
+            spacy_entities = [[] for _ in texts]
+        
+        scispacy_entities = [[] for _ in texts]
+        if self.sci_nlp:
+            try:
+                scispacy_entities = [
+                    self._scispacy_entities(doc)
+                    for doc in self.sci_nlp.pipe(texts, batch_size=batch_size)
+                ]
+            except Exception as e:
+                logger.error(f"SciSpacy extraction failed: {e}")
+        
+        results = [
+            self._build_result(text, biobert_entities[i] + spacy_entities[i] + scispacy_entities[i])
+            for i, text in enumerate(texts)
+        ]
+        return results, stats
+    
+    def extract_entities_biobert_batch(
+        self,
+        texts: List[str],
+        batch_size: int
+    ) -> Tuple[List[List[Entity]], Dict[str, Any]]:
+        """
+        Run the BioBERT NER pipeline over many texts in padded batches
+        """
+        entities: List[List[Entity]] = [[] for _ in texts]
+        lengths = [len(self.tokenizer(text, truncation=True)['input_ids']) for text in texts]
+        order = sorted(range(len(texts)), key=lambda i: lengths[i])
+        
+        stats = {'batches': 0, 'batch_size': batch_size, 'sequences': len(texts), 'tokens': 0, 'padded_tokens': 0}
+        for start in range(0, len(order), batch_size):
+            batch_lengths = [lengths[i] for i in order[start:start + batch_size]]
+            stats['batches'] += 1
+            stats['tokens'] += sum(batch_lengths)
+            stats['padded_tokens'] += max(batch_lengths) * len(batch_lengths)
+        stats['padding_waste'] = (
+            1 - stats['tokens'] / stats['padded_tokens'] if stats['padded_tokens'] else 0.0
+        )
+        
+        try:
+            outputs = self.ner_pipeline([texts[i] for i in order], batch_size=batch_size)
+            for idx, results in zip(order, outputs):
+                entities[idx] = [
+                    Entity(
+                        text=result['word'],
+                        type=result['entity_group'],
+                        start=result['start'],
+                        end=result['end'],
+                        confidence=result['score']
+                    )
+                    for result in results
+                ]
+        except Exception as e:
+            logger.error(f"BioBERT batch extraction failed: {e}")
         
+        return entities, stats
+    
+    def _build_result(self, text: str, all_entities: List[Entity]) -> ExtractionResult:
+        """Combine model entities with regex matches into an ExtractionResult"""
         # Deduplicate entities
         unique_entities = self._deduplicate_entities(all_entities)
         
@@ -361,6 +451,12 @@ class EntityExtractor:
         clinical_info = self.extract_clinical_info(text, unique_entities, regex_matches)
         temporal_info = self.extract_temporal_info(text, unique_entities, regex_matches)
         
+        # Labelled fields (single pass) fill what the models and generic patterns left out
+        labelled = field_extractor.extract(text)
+        for info, group in ((patient_info, 'patient'), (insurance_info, 'insurance'), (clinical_info, 'clinical')):
+            for name, value in labelled[group].items():
+                info.setdefault(name, value)
+        
         return ExtractionResult(
             entities=unique_entities,
             patient_info=patient_info,
@@ -0,0 +1,226 @@
+"""
+Declarative Field Extraction for document text
+Labelled fields ("Patient Name:", "Policy Number:", ...) that the
+EntityExtractor adds to its patient, insurance and clinical info.
+Fields are declared as prioritised regex patterns. All patterns are
+compiled once; a single keyword scan over the text finds the positions
+where any pattern can start, and only the patterns for that keyword are
+tried there (anchored). Results match running each field's patterns in
+priority order with re.search, in one pass instead of one per pattern.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple, Iterable, Iterator
+
+
+# Leading literal of a pattern ("Patient\s+Name..." -> "Patient")
+_LEADING_LITERAL = re.compile(r'^[A-Za-z0-9-]+')
+_TRAILING_LINES = re.compile(r'\s*\n.*$')
+_WHITESPACE = re.compile(r'\s+')
+
+# Characters lowercased and scanned at a time
+SCAN_CHUNK_CHARS = 64 * 1024
+
+
+@dataclass
+class FieldRule:
+    """One output field: patterns in priority order, first capture group is the value"""
+    group: str
+    name: str
+    patterns: List[str]
+    clean: bool = False  # cut at the first newline and collapse whitespace
+    compiled: List[re.Pattern] = field(default_factory=list, repr=False)
+
+
+FIELD_RULES = [
+    # Patient
+    FieldRule('patient', 'patient_name', [
+        r'Patient\s+Name[:\s]+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)',
+        r'Name[:\s]+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)',
+        r'Member\s+Name[:\s]+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)',
+        r'PATIENT[:\s]+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)',
+    ], clean=True),
+    FieldRule('patient', 'patient_id', [
+        r'Patient\s+ID[:\s]+([A-Z0-9-]+)',
+        r'Member\s+ID[:\s]+([A-Z0-9-]+)',
+        r'ID[:\s]+([A-Z0-9]{3,})',
+    ]),
+    FieldRule('patient', 'date_of_birth', [
+        r'Date\s+of\s+Birth[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
+        r'DOB[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
+        r'Birth\s+Date[:\s]+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
+    ]),
+    FieldRule('patient', 'phone', [
+        r'Phone[:\s]+(\(\d{3}\)\s*\d{3}-\d{4})',
+        r'Phone[:\s]+(\d{3}-\d{3}-\d{4})',
+        r'Tel[:\s]+(\(\d{3}\)\s*\d{3}-\d{4})',
+    ]),
+    
+    # Insurance
+    FieldRule('insurance', 'insurance_company', [
+        r'Insurance\s+Company[:\s]+([A-Za-z\s&]+?)(?:\n|Policy|Group|Member)',
+        r'Insurance[:\s]+([A-Za-z\s&]+?)(?:\n|Policy|Group|Member)',
+        r'Carrier[:\s]+([A-Za-z\s&]+?)(?:\n|Policy|Group|Member)',
+        r'Payer[:\s]+([A-Za-z\s&]+?)(?:\n|Policy|Group|Member)',
+    ], clean=True),
+    FieldRule('insurance', 'policy_number', [
+        r'Policy\s+Number[:\s]+([A-Z0-9-]+)',
+        r'Policy[:\s]+([A-Z0-9-]+)',
+        r'Member\s+ID[:\s]+([A-Z0-9-]+)',
+    ]),
+    FieldRule('insurance', 'group_number', [
+        r'Group\s+Number[:\s]+([A-Z0-9-]+)',
+        r'Group[:\s]+([A-Z0-9-]+)',
+    ]),
+    FieldRule('insurance', 'plan_type', [
+        r'Plan[:\s]+([A-Za-z\s]+?)(?:\n|Effective)',
+        r'Plan\s+Type[:\s]+([A-Za-z\s]+?)(?:\n|Effective)',
+    ]),
+    
+    # Clinical
+    FieldRule('clinical', 'diagnosis', [
+        r'Diagnosis[:\s]+([A-Za-z\s,]+?)(?:\n|Procedure|CPT)',
+        r'ICD-10[:\s]+([A-Z0-9.]+)',
+        r'Diagnosis\s+Code[:\s]+([A-Z0-9.]+)',
+    ]),
+    FieldRule('clinical', 'procedure', [
+        r'Procedure[:\s]+([A-Za-z\s]+?)(?:\n|CPT)',
+        r'Service[:\s]+([A-Za-z\s]+?)(?:\n|CPT)',
+    ]),
+    FieldRule('clinical', 'cpt_code', [
+        r'CPT\s+Code[:\s]+(\d{5})',
+        r'CPT[:\s]+(\d{5})',
+    ]),
+    FieldRule('clinical', 'provider_name', [
+        r'Provider\s+Name[:\s]+(Dr\.\s+[A-Za-z\s]+)',
+        r'Physician[:\s]+(Dr\.\s+[A-Za-z\s]+)',
+    ], clean=True),
+]
+
+
+class FieldExtractor:
+    """
+    Single-pass multi-pattern extractor
+    Every pattern must start with a literal keyword and have no top-level
+    alternation (use separate patterns instead); the keywords form one
+    scanner regex, and each keyword maps to the (rule, priority, pattern)
+    candidates that start with it
+    """
+    
+    def __init__(self, rules: List[FieldRule], flags: int = re.IGNORECASE):
+        self.rules = rules
+        self.groups = list(dict.fromkeys(rule.group for rule in rules))
+        self._candidates: Dict[str, List[Tuple[int, int, re.Pattern]]] = {}
+        
+        for rule_idx, rule in enumerate(rules):
+            rule.compiled = [re.compile(pattern, flags) for pattern in rule.patterns]
+            for priority, (pattern, compiled) in enumerate(zip(rule.patterns, rule.compiled)):
+                keyword = self._keyword(pattern)
+                if not keyword:
+                    raise ValueError(f"Pattern for {rule.name} must start with a literal keyword: {pattern}")
+                self._candidates.setdefault(keyword, []).append((rule_idx, priority, compiled))
+        
+        # Longest keyword first, so each hit reports the longest keyword at that
+        # position; shorter keywords matching there are its prefixes
+        keywords = sorted(self._candidates, key=len, reverse=True)
+        alternation = '(' + '|'.join(re.escape(k) for k in keywords) + ')'
+        # ASCII text is lowercased and scanned case-sensitively, which lets the
+        # regex engine skip ahead on first characters; other text keeps the
+        # pattern flags so Unicode case folding matches exactly like re.search
+        self._scanner = re.compile(alternation)
+        self._scanner_folded = re.compile(alternation, flags)
+        self._keywords = keywords
+        # Candidates to try where a keyword was found: its own and its prefixes'
+        self._hit_candidates = {
+            keyword: [c for other in keywords if keyword.startswith(other) for c in self._candidates[other]]
+            for keyword in keywords
+        }
+        self._all_candidates = [c for keyword in keywords for c in self._candidates[keyword]]
+    
+    @staticmethod
+    def _keyword(pattern: str) -> str:
+        """Lowercased literal every match of the pattern starts with"""
+        literal = _LEADING_LITERAL.match(pattern)
+        if not literal:
+            return ''
+        keyword = literal.group(0)
+        # "Names?" only guarantees "Name"
+        if pattern[len(keyword):len(keyword) + 1] in ('?', '*', '{'):
+            keyword = keyword[:-1]
+        return keyword.lower()
+    
+    def _keyword_hits(self, text: str) -> Iterator[Tuple[int, str]]:
+        """
+        (position, longest keyword there) for every keyword occurrence, in order
+        ASCII text is lowercased a chunk at a time, so an early exit never pays
+        for lowercasing the whole document
+        """
+        if not text.isascii():
+            pos = 0
+            while True:
+                hit = self._scanner_folded.search(text, pos)
+                if hit is None:
+                    return
+                yield hit.start(), hit.group(1).lower()
+                # Keywords may overlap (e.g. "ID" inside "PAID"), so resume one character on
+                pos = hit.start() + 1
+        
+        overlap = len(self._keywords[0]) - 1
+        for chunk_start in range(0, len(text), SCAN_CHUNK_CHARS):
+            # Extend by the longest keyword so matches straddling the boundary are seen
+            haystack = text[chunk_start:chunk_start + SCAN_CHUNK_CHARS + overlap].lower()
+            pos = 0
+            while True:
+                hit = self._scanner.search(haystack, pos, SCAN_CHUNK_CHARS + overlap)
+                if hit is None or hit.start() >= SCAN_CHUNK_CHARS:
+                    break
+                yield chunk_start + hit.start(), hit.group(1)
+                pos = hit.start() + 1
+    
+    def extract(self, text: str, groups: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Return {group: {field: value}} for the requested groups (default: all)"""
+        wanted = set(groups) if groups is not None else set(self.groups)
+        rules = {i for i, rule in enumerate(self.rules) if rule.group in wanted}
+        
+        # rule index -> (priority, value) of the best match so far; scanning
+        # left to right, the first match at a priority is the leftmost one
+        best: Dict[int, Tuple[int, str]] = {}
+        settled = 0
+        
+        for start, keyword in self._keyword_hits(text):
+            # Unicode case folding can report a keyword lower() doesn't map back to
+            for rule_idx, priority, compiled in self._hit_candidates.get(keyword, self._all_candidates):
+                if rule_idx not in rules:
+                    continue
+                current = best.get(rule_idx)
+                if current is not None and current[0] <= priority:
+                    continue
+                match = compiled.match(text, start)
+                if match:
+                    best[rule_idx] = (priority, match.group(1))
+                    settled += priority == 0
+            
+            # Every field already has its top-priority match
+            if settled == len(rules):
+                break
+        
+        results: Dict[str, Dict[str, Any]] = {group: {} for group in self.groups if group in wanted}
+        for rule_idx in sorted(best):
+            rule = self.rules[rule_idx]
+            value = best[rule_idx][1].strip()
+            if rule.clean:
+                value = _TRAILING_LINES.sub('', value)  # Remove everything after newline
+                value = _WHITESPACE.sub(' ', value)  # Normalize spaces
+            results[rule.group][rule.name] = value
+        
+        return results
+
+
+# Compiled once at import
+field_extractor = FieldExtractor(FIELD_RULES)
+
+
+def extract_document_fields(text: str) -> Dict[str, Dict[str, Any]]:
+    """Patient, insurance and clinical fields from document text in one pass"""
+    return field_extractor.extract(text)
@@ -3,18 +3,129 @@ Enhanced OCR Processor for Handwritten Documents
 Uses advanced preprocessing and multiple OCR engines for better accuracy
 """
 
+import os
+import json
+import functools
 import logging
-from typing import Dict, Any, Tuple, List
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from typing import Dict, Any, Tuple, List, Optional, Callable
 from PIL import Image
 import cv2
 import numpy as np
-import pytesseract
 from dataclasses import dataclass
 
+from src.core.ai_pipeline.page_analysis import PageAnalysis
+from src.core.ai_pipeline.ocr_engines import get_ocr_engine
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Word confidence (0-100) below which handwriting words are dropped
+HANDWRITING_MIN_CONFIDENCE = 30
+
+# Tesseract page segmentation modes tried for handwriting
+ENSEMBLE_PSM_CONFIGS = [
+    '--psm 6',  # Assume uniform text block
+    '--psm 4',  # Assume single column of text
+    '--psm 11', # Sparse text
+    '--psm 12', # Sparse text with OSD
+]
+
+
+def _otsu(gray: np.ndarray) -> np.ndarray:
+    _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return thresh
+
+
+# Preprocessing techniques (grayscale in, binarised out), in legacy order
+PREPROCESSING_TECHNIQUES: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    # Technique 1: Adaptive Thresholding
+    'adaptive_threshold': lambda gray: cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
+    ),
+    # Technique 2: Otsu's Thresholding
+    'otsu_threshold': _otsu,
+    # Technique 3: Denoising + Thresholding
+    'denoised_otsu': lambda gray: _otsu(cv2.fastNlMeansDenoising(gray, h=10)),
+    # Technique 4: Morphological operations
+    'morphological': lambda gray: _otsu(
+        cv2.morphologyEx(gray, cv2.MORPH_CLOSE, np.ones((2, 2), np.uint8))
+    ),
+    # Technique 5: Contrast enhancement
+    'contrast_enhanced': lambda gray: _otsu(
+        cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(gray)
+    ),
+    # Technique 6: Original with slight blur
+    'gaussian_blur': lambda gray: _otsu(cv2.GaussianBlur(gray, (3, 3), 0)),
+}
+
+
+class EnsembleWinStats:
+    """
+    Persistent win/trial counts per (technique, psm) candidate
+    Candidates are ranked by smoothed win rate so the ensemble tries the
+    historically best combinations first
+    """
+    
+    def __init__(self, path: str, save_every: int = 20):
+        self.path = Path(path)
+        self.save_every = save_every
+        self._lock = threading.Lock()
+        self._updates = 0
+        self._stats: Dict[str, Dict[str, int]] = {}
+        
+        if self.path.exists():
+            try:
+                self._stats = json.loads(self.path.read_text())
+            except Exception as e:
+                logger.error(f"Failed to load ensemble stats {self.path}: {e}")
+    
+    @staticmethod
+    def _key(technique: str, config: str) -> str:
+        return f"{technique}|{config}"
+    
+    def win_rate(self, technique: str, config: str) -> float:
+        entry = self._stats.get(self._key(technique, config), {})
+        # Laplace smoothing keeps untried candidates in the middle of the ranking
+        return (entry.get('wins', 0) + 1) / (entry.get('trials', 0) + 2)
+    
+    def ranked(self, candidates: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """Candidates ordered by win rate (stable for ties)"""
+        with self._lock:
+            return sorted(candidates, key=lambda c: -self.win_rate(*c))
+    
+    def record(self, tried: List[Tuple[str, str]], winner: Optional[Tuple[str, str]]):
+        """Count a trial for every tried candidate and a win for the best one"""
+        with self._lock:
+            for technique, config in tried:
+                entry = self._stats.setdefault(self._key(technique, config), {'wins': 0, 'trials': 0})
+                entry['trials'] += 1
+            if winner:
+                self._stats[self._key(*winner)]['wins'] += 1
+            
+            self._updates += 1
+            if self._updates >= self.save_every:
+                self._save()
+    
+    def flush(self):
+        with self._lock:
+            self._save()
+    
+    def _save(self):
+        """Persist stats atomically (lock held)"""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps(self._stats, indent=2, sort_keys=True))
+            tmp_path.replace(self.path)
+            self._updates = 0
+        except Exception as e:
+            logger.error(f"Failed to save ensemble stats {self.path}: {e}")
+
+
 @dataclass
 class HandwritingOCRResult:
     """Result from handwriting OCR"""
@@ -33,57 +144,63 @@ class HandwritingOCRProcessor:
     
     def __init__(self, config: Dict[str, Any] = None):
         self.config = config or {}
+        
+        # Adaptive ensemble: stop once a candidate is this confident (0-100)
+        self.early_exit_confidence = self.config.get('early_exit_confidence', 80)
+        # Candidates tried one by one before fanning out the rest
+        self.sequential_candidates = self.config.get('sequential_candidates', 2)
+        self.win_stats = EnsembleWinStats(
+            self.config.get('ensemble_stats_path', 'config/handwriting_ensemble_stats.json')
+        )
+        # One engine per process; tesserocr keeps an API per ensemble thread
+        self.engine = get_ocr_engine(self.config.get('ocr_engine', 'auto'))
+        # Tesseract runs outside the GIL (subprocess or tesserocr), so threads give real parallelism
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.config.get('ensemble_workers', os.cpu_count() or 1),
+            thread_name_prefix='handwriting-ocr'
+        )
+        
         logger.info("Handwriting OCR Processor initialized")
     
+    @staticmethod
+    def _to_gray(image: Image.Image) -> np.ndarray:
+        img_array = np.array(image)
+        if len(img_array.shape) == 3:
+            return cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+        return img_array
+    
     def preprocess_handwriting(self, image: Image.Image) -> List[Tuple[Image.Image, str]]:
         """
         Apply multiple preprocessing techniques for handwritten text
         Returns list of (preprocessed_image, technique_name) tuples
         """
-        img_array = np.array(image)
-        
-        # Convert to grayscale
-        if len(img_array.shape) == 3:
-            gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-        else:
-            gray = img_array
+        gray = self._to_gray(image)
         
-        preprocessed_images = []
+        return [
+            (Image.fromarray(technique(gray)), name)
+            for name, technique in PREPROCESSING_TECHNIQUES.items()
+        ]
+    
+    def _ocr_candidate(
+        self,
+        image: Image.Image,
+        technique: str,
+        config: str
+    ) -> Optional[Tuple[str, float, str, str, PageAnalysis]]:
+        """Run Tesseract once for one (variant, psm) candidate"""
+        try:
+            analysis = PageAnalysis.analyze(image, config=config, engine=self.engine)
+            
+            # Lower threshold for handwriting
+            text = analysis.text(HANDWRITING_MIN_CONFIDENCE)
+            if text:
+                confidence = analysis.confidence(HANDWRITING_MIN_CONFIDENCE) * 100.0
+                return text, confidence, technique, config, analysis
+            
+        except Exception as e:
+            logger.debug(f"OCR failed for {technique} with {config}: {e}")
         
-        # Technique 1: Adaptive Thresholding
-        adaptive_thresh = cv2.adaptiveThreshold(
-            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-            cv2.THRESH_BINARY, 11, 2
-        )
-        preprocessed_images.append((Image.fromarray(adaptive_thresh), "adaptive_threshold"))
-        
-        # Technique 2: Otsu's Thresholding
-        _, otsu_thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        preprocessed_images.append((Image.fromarray(otsu_thresh), "otsu_threshold"))
-        
-        # Technique 3: Denoising + Thresholding
-        denoised = cv2.fastNlMeansDenoising(gray, h=10)
-        _, denoised_thresh = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        preprocessed_images.append((Image.fromarray(denoised_thresh), "denoised_otsu"))
-        
-        # Technique 4: Morphological operations
-        kernel = np.ones((2, 2), np.uint8)
-        morph = cv2.morphologyEx(gray, cv2.MORPH_CLOSE, kernel)
-        _, morph_thresh = cv2.threshold(morph, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        preprocessed_images.append((Image.fromarray(morph_thresh), "morphological"))
-        
-        # Technique 5: Contrast enhancement
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        enhanced = clahe.apply(gray)
-        _, enhanced_thresh = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        preprocessed_images.append((Image.fromarray(enhanced_thresh), "contrast_enhanced"))
-        
-        # Technique 6: Original with slight blur
-        blurred = cv2.GaussianBlur(gray, (3, 3), 0)
-        _, blur_thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        preprocessed_images.append((Image.fromarray(blur_thresh), "gaussian_blur"))
-        
-        return preprocessed_images
+        return None
     
     def extract_text_ensemble(
         self, 
@@ -92,106 +209,127 @@ class HandwritingOCRProcessor:
         """
         Use ensemble approach: try multiple preprocessing techniques
         and combine results for best accuracy
+        Exhaustive (every variant x psm); see extract_text_adaptive
         """
         results = []
-        techniques_used = []
-        
-        # Try different Tesseract configurations for handwriting
-        configs = [
-            '--psm 6',  # Assume uniform text block
-            '--psm 4',  # Assume single column of text
-            '--psm 11', # Sparse text
-            '--psm 12', # Sparse text with OSD
-        ]
         
         for image, technique in preprocessed_images:
-            for config in configs:
-                try:
-                    # Extract text with confidence
-                    data = pytesseract.image_to_data(
-                        image,
-                        output_type=pytesseract.Output.DICT,
-                        config=config
-                    )
-                    
-                    text_parts = []
-                    confidences = []
-                    
-                    for i, conf in enumerate(data['conf']):
-                        if conf > 30:  # Lower threshold for handwriting
-                            text = data['text'][i].strip()
-                            if text:
-                                text_parts.append(text)
-                                confidences.append(conf)
-                    
-                    if text_parts:
-                        full_text = ' '.join(text_parts)
-                        avg_conf = np.mean(confidences) if confidences else 0
-                        results.append((full_text, avg_conf, technique, config))
-                        
-                except Exception as e:
-                    logger.debug(f"OCR failed for {technique} with {config}: {e}")
-                    continue
+            for config in ENSEMBLE_PSM_CONFIGS:
+                result = self._ocr_candidate(image, technique, config)
+                if result:
+                    results.append(result)
         
         if not results:
             return "", 0.0, []
         
         # Sort by confidence and get best result
         results.sort(key=lambda x: x[1], reverse=True)
-        best_text, best_conf, best_technique, best_config = results[0]
-        
-        techniques_used.append(f"{best_technique}_{best_config}")
+        best_text, best_conf, best_technique, best_config, _ = results[0]
         
-        return best_text, best_conf / 100.0, techniques_used
+        return best_text, best_conf / 100.0, [f"{best_technique}_{best_config}"]
     
-    def extract_lines(self, image: Image.Image) -> List[Dict[str, Any]]:
+    def extract_text_adaptive(
+        self,
+        image: Image.Image
+    ) -> Tuple[str, float, List[str], Optional[PageAnalysis]]:
         """
-        Extract individual lines from the document
-        Useful for line-by-line processing
+        Adaptive ensemble with early exit
+        - candidates (technique, psm) are ordered by historical win rate
+        - the top few run one by one; the search stops as soon as one
+          reaches early_exit_confidence
+        - the rest run in parallel; on early exit pending ones are cancelled and
+          running ones are left to finish in the background (their trials are
+          still counted)
+        - preprocessing variants are only computed when a candidate needs them
+        Also returns the winning candidate's PageAnalysis (lines, boxes)
         """
-        img_array = np.array(image)
+        gray = self._to_gray(image)
+        variants: Dict[str, Image.Image] = {}
+        variant_locks = {name: threading.Lock() for name in PREPROCESSING_TECHNIQUES}
+        
+        def variant(name: str) -> Image.Image:
+            with variant_locks[name]:
+                if name not in variants:
+                    variants[name] = Image.fromarray(PREPROCESSING_TECHNIQUES[name](gray))
+                return variants[name]
+        
+        def run(candidate: Tuple[str, str]):
+            return self._ocr_candidate(variant(candidate[0]), *candidate)
+        
+        candidates = self.win_stats.ranked([
+            (name, config) for name in PREPROCESSING_TECHNIQUES for config in ENSEMBLE_PSM_CONFIGS
+        ])
+        head = candidates[:self.sequential_candidates]
+        tail = candidates[self.sequential_candidates:]
+        
+        tried, results = [], []
+        
+        def done() -> bool:
+            return any(r[1] >= self.early_exit_confidence for r in results)
+        
+        for candidate in head:
+            tried.append(candidate)
+            result = run(candidate)
+            if result:
+                results.append(result)
+            if done():
+                break
         
-        if len(img_array.shape) == 3:
-            gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-        else:
-            gray = img_array
+        if tail and not done():
+            futures = {self.executor.submit(run, candidate): candidate for candidate in tail}
+            pending = set(futures)
+            while pending and not done():
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    tried.append(futures[future])
+                    if future.result():
+                        results.append(future.result())
+            
+            for future in pending:
+                if not future.cancel():
+                    # Already running: don't wait for it, count its trial when it ends
+                    future.add_done_callback(functools.partial(self._record_straggler, futures[future]))
         
-        # Apply thresholding
-        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        if not results:
+            self.win_stats.record(tried, None)
+            return "", 0.0, [], None
         
-        # Find contours (lines)
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        best_text, best_conf, best_technique, best_config, analysis = max(results, key=lambda x: x[1])
+        self.win_stats.record(tried, (best_technique, best_config))
         
-        lines = []
-        for i, contour in enumerate(contours):
-            x, y, w, h = cv2.boundingRect(contour)
-            
-            # Filter out noise (too small regions)
-            if w > 50 and h > 10:
-                # Extract line region
-                line_img = gray[y:y+h, x:x+w]
-                line_pil = Image.fromarray(line_img)
-                
-                # OCR on individual line
-                try:
-                    line_text = pytesseract.image_to_string(
-                        line_pil,
-                        config='--psm 7'  # Single line
-                    ).strip()
-                    
-                    if line_text:
-                        lines.append({
-                            'line_number': i + 1,
-                            'text': line_text,
-                            'bbox': {'x': int(x), 'y': int(y), 'width': int(w), 'height': int(h)}
-                        })
-                except Exception as e:
-                    logger.debug(f"Line OCR failed: {e}")
-        
-        # Sort lines by y-coordinate (top to bottom)
-        lines.sort(key=lambda l: l['bbox']['y'])
-        
-        return lines
+        logger.debug(
+            f"Adaptive ensemble tried {len(tried)}/{len(candidates)} candidates, "
+            f"computed {len(variants)} variants"
+        )
+        
+        return best_text, best_conf / 100.0, [f"{best_technique}_{best_config}"], analysis
+    
+    def _record_straggler(self, candidate: Tuple[str, str], future):
+        """Trial of a candidate still running when the ensemble exited early"""
+        self.win_stats.record([candidate], None)
+    
+    def extract_lines(
+        self,
+        image: Image.Image,
+        analysis: Optional[PageAnalysis] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Extract individual lines from the document
+        Useful for line-by-line processing
+        Lines come from Tesseract's own line grouping: reuse the ensemble's
+        PageAnalysis when given, otherwise run a single pass
+        """
+        if analysis is None:
+            try:
+                analysis = PageAnalysis.analyze(
+                    Image.fromarray(self._to_gray(image)), config='--psm 6', engine=self.engine
+                )
+            except Exception as e:
+                logger.debug(f"Line OCR failed: {e}")
+                return []
+        
+        # Sorted top to bottom
+        return analysis.line_dicts(HANDWRITING_MIN_CONFIDENCE)
     
     def extract_structured_fields(
         self, 
@@ -286,14 +424,11 @@ class HandwritingOCRProcessor:
             # Load image
             image = Image.open(image_path)
             
-            # Apply multiple preprocessing techniques
-            preprocessed_images = self.preprocess_handwriting(image)
-            
-            # Extract text using ensemble approach
-            text, confidence, techniques = self.extract_text_ensemble(preprocessed_images)
+            # Extract text using the adaptive ensemble (variants built on demand)
+            text, confidence, techniques, analysis = self.extract_text_adaptive(image)
             
-            # Extract individual lines
-            lines = self.extract_lines(image)
+            # Extract individual lines (from the same Tesseract pass)
+            lines = self.extract_lines(image, analysis)
             
             # Extract structured fields
             fields = self.extract_structured_fields(text, lines)
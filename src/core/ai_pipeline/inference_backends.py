@@ -0,0 +1,199 @@
+"""
+CPU Inference Backends for token-classification models (BioBERT, LayoutLMv3)
+- pytorch:     eager fp32 (default)
+- quantized:   dynamic int8 quantization of Linear layers (done at load time)
+- torchscript: traced graph exported offline
+- onnx:        ONNX Runtime with full graph optimizations, exported offline
+               (optionally int8-quantized)
+Offline export + parity check: scripts/export_inference_models.py
+"""
+
+import inspect
+import logging
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import torch
+from transformers.modeling_outputs import TokenClassifierOutput
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+BACKENDS = ('pytorch', 'quantized', 'torchscript', 'onnx')
+
+
+class CompiledTokenClassifier(torch.nn.Module):
+    """
+    Drop-in stand-in for a HuggingFace token-classification model whose
+    forward pass runs on a TorchScript module or an ONNX Runtime session
+    Keeps the original config so pipelines and label maps keep working
+    """
+    
+    def __init__(self, config, input_names: List[str], runner, backend: str):
+        super().__init__()
+        self.config = config
+        self.input_names = input_names
+        self.runner = runner
+        self.backend = backend
+    
+    def can_generate(self) -> bool:
+        return False
+    
+    @property
+    def device(self) -> torch.device:
+        return torch.device('cpu')
+    
+    def forward(self, **inputs) -> TokenClassifierOutput:
+        feed = {name: inputs[name] for name in self.input_names if name in inputs}
+        
+        if self.backend == 'onnx':
+            outputs = self.runner.run(['logits'], {k: v.cpu().numpy() for k, v in feed.items()})
+            return TokenClassifierOutput(logits=torch.from_numpy(outputs[0]))
+        
+        outputs = self.runner(**feed)
+        return TokenClassifierOutput(logits=outputs[0] if isinstance(outputs, (tuple, list)) else outputs)
+
+
+def quantize_dynamic(model: torch.nn.Module) -> torch.nn.Module:
+    """Dynamic int8 quantization of Linear layers (weights int8, activations fp32)"""
+    model.eval()
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def export_torchscript(model: torch.nn.Module, example_inputs: Dict[str, torch.Tensor], path: str):
+    """Trace a model with example inputs and save it"""
+    model.eval()
+    model.config.return_dict = False
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example_kwarg_inputs=dict(example_inputs), strict=False)
+    model.config.return_dict = True
+    
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    torch.jit.save(traced, path)
+    logger.info(f"Saved TorchScript model to {path}")
+
+
+def export_onnx(
+    model: torch.nn.Module,
+    example_inputs: Dict[str, torch.Tensor],
+    path: str,
+    quantize: bool = False,
+    opset: int = 14
+) -> str:
+    """Export a model to ONNX (dynamic batch/sequence axes), optionally int8-quantized"""
+    model.eval()
+    # ONNX inputs follow the forward() signature order, not the dict order
+    signature = list(inspect.signature(model.forward).parameters)
+    input_names = sorted(example_inputs, key=signature.index)
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names if name != 'pixel_values'}
+    if 'pixel_values' in input_names:
+        dynamic_axes['pixel_values'] = {0: 'batch'}
+    dynamic_axes['logits'] = {0: 'batch', 1: 'sequence'}
+    
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    model.config.return_dict = False
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            ({name: example_inputs[name] for name in input_names},),
+            path,
+            input_names=input_names,
+            output_names=['logits'],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset
+        )
+    model.config.return_dict = True
+    logger.info(f"Saved ONNX model to {path}")
+    
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic as ort_quantize_dynamic, QuantType
+        
+        fp32_path = path
+        path = str(Path(path).with_suffix('.int8.onnx'))
+        ort_quantize_dynamic(fp32_path, path, weight_type=QuantType.QInt8)
+        logger.info(f"Saved int8 ONNX model to {path}")
+    
+    return path
+
+
+def build_backend(
+    model: torch.nn.Module,
+    backend: str,
+    input_names: List[str],
+    artifact_path: Optional[str] = None,
+    threads: Optional[int] = None
+) -> torch.nn.Module:
+    """
+    Wrap a loaded fp32 model in the configured inference backend
+    Falls back to eager PyTorch (with an error) when an exported artifact
+    is missing, so a bad deploy degrades throughput rather than failing
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    
+    if threads:
+        torch.set_num_threads(threads)
+    
+    if backend == 'pytorch':
+        return model
+    
+    if backend == 'quantized':
+        return quantize_dynamic(model)
+    
+    if not artifact_path or not Path(artifact_path).exists():
+        logger.error(
+            f"No exported {backend} model at {artifact_path}; using eager PyTorch "
+            f"(run scripts/export_inference_models.py)"
+        )
+        return model
+    
+    if backend == 'torchscript':
+        runner = torch.jit.load(artifact_path, map_location='cpu')
+        runner.eval()
+        return CompiledTokenClassifier(model.config, input_names, runner, backend)
+    
+    if ort is None:
+        logger.error("onnxruntime is not installed; using eager PyTorch")
+        return model
+    
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        options.intra_op_num_threads = threads
+    session = ort.InferenceSession(artifact_path, options, providers=['CPUExecutionProvider'])
+    
+    return CompiledTokenClassifier(model.config, input_names, session, backend)
+
+
+def parity_check(
+    reference: torch.nn.Module,
+    candidate: torch.nn.Module,
+    example_inputs: Dict[str, torch.Tensor],
+    atol: float = 1e-2,
+    min_agreement: float = 0.99
+) -> Dict[str, Any]:
+    """
+    Compare a backend's logits against the fp32 reference on the same inputs
+    Int8 backends are judged mainly on label agreement, not exact logits
+    """
+    with torch.no_grad():
+        expected = reference(**example_inputs).logits
+        actual = candidate(**example_inputs).logits
+    
+    mask = example_inputs['attention_mask'].bool()
+    diff = (expected - actual).abs()[mask]
+    agreement = (expected.argmax(-1) == actual.argmax(-1))[mask].float().mean().item()
+    max_abs_diff = diff.max().item() if diff.numel() else 0.0
+    
+    return {
+        'max_abs_diff': max_abs_diff,
+        'mean_abs_diff': diff.mean().item() if diff.numel() else 0.0,
+        'label_agreement': agreement,
+        'passed': agreement >= min_agreement and (max_abs_diff <= atol or agreement == 1.0)
+    }
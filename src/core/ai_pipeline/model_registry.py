@@ -0,0 +1,280 @@
+"""
+Process-wide Model Registry
+Loads each model lazily on first use and shares one instance between
+all components in the process (OCR, NLP, handwriting)
+"""
+
+import gc
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Callable
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ModelEntry:
+    """A registered model and its load/usage statistics"""
+    key: str
+    loader: Callable[[], Any]
+    instance: Any = None
+    loaded: bool = False
+    load_seconds: float = 0.0
+    memory_bytes: int = 0
+    rss_delta_bytes: int = 0
+    loaded_at: Optional[float] = None
+    last_used: Optional[float] = None
+    hits: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+def _rss_bytes() -> int:
+    """Resident set size of this process (0 where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        return 0
+
+
+def _tensor_bytes(obj: Any, seen: Optional[set] = None) -> int:
+    """Parameter + buffer bytes of any torch modules inside a loaded model"""
+    seen = seen if seen is not None else set()
+    if obj is None or id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    
+    if isinstance(obj, (tuple, list)):
+        return sum(_tensor_bytes(item, seen) for item in obj)
+    
+    if hasattr(obj, 'parameters') and hasattr(obj, 'buffers'):
+        tensors = list(obj.parameters()) + list(obj.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    
+    # HuggingFace pipelines wrap a model
+    return _tensor_bytes(getattr(obj, 'model', None), seen)
+
+
+class ModelRegistry:
+    """
+    Lazy, thread-safe model cache
+    Components register a loader under a key (model name + device) and
+    fetch the shared instance with get(); the first get() loads it.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, ModelEntry] = {}
+    
+    def register(self, key: str, loader: Callable[[], Any]) -> str:
+        """Register a loader (first registration wins) and return the key"""
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = ModelEntry(key=key, loader=loader)
+        return key
+    
+    def get(self, key: str, loader: Optional[Callable[[], Any]] = None) -> Any:
+        """Return the shared instance, loading it on first use"""
+        entry = self._entries.get(key)
+        if entry is None:
+            if loader is None:
+                raise KeyError(f"Model not registered: {key}")
+            self.register(key, loader)
+            entry = self._entries[key]
+        
+        # Read once: unload() may clear entry.instance at any moment, but the
+        # caller keeps the instance it was handed
+        instance = entry.instance
+        if instance is None:
+            with entry.lock:
+                if entry.instance is None:
+                    self._load(entry)
+                instance = entry.instance
+        
+        entry.last_used = time.time()
+        entry.hits += 1
+        return instance
+    
+    def _load(self, entry: ModelEntry):
+        """Run the loader and record footprint (entry lock held)"""
+        logger.info(f"Loading model {entry.key}")
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        
+        entry.instance = entry.loader()
+        
+        entry.load_seconds = time.perf_counter() - start
+        entry.rss_delta_bytes = max(0, _rss_bytes() - rss_before)
+        entry.memory_bytes = _tensor_bytes(entry.instance) or entry.rss_delta_bytes
+        entry.loaded_at = time.time()
+        entry.loaded = True
+        
+        logger.info(
+            f"Loaded model {entry.key} in {entry.load_seconds:.1f}s "
+            f"({entry.memory_bytes / 1024 / 1024:.0f} MB)"
+        )
+    
+    def is_loaded(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return bool(entry and entry.loaded)
+    
+    def warm_up(self, keys: Optional[List[str]] = None) -> Dict[str, float]:
+        """Load registered models ahead of traffic; returns load seconds per key"""
+        loaded = {}
+        for key in keys or list(self._entries):
+            try:
+                self.get(key)
+                loaded[key] = self._entries[key].load_seconds
+            except Exception as e:
+                logger.error(f"Warm-up failed for {key}: {e}")
+        return loaded
+    
+    def unload(self, key: str) -> bool:
+        """Drop a loaded model; it is reloaded on next use"""
+        entry = self._entries.get(key)
+        if not entry or not entry.loaded:
+            return False
+        
+        with entry.lock:
+            entry.instance = None
+            entry.loaded = False
+            entry.memory_bytes = 0
+            entry.rss_delta_bytes = 0
+        
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+        
+        logger.info(f"Unloaded model {key}")
+        return True
+    
+    def unload_idle(self, max_idle_seconds: float) -> List[str]:
+        """Unload models not used within max_idle_seconds"""
+        cutoff = time.time() - max_idle_seconds
+        idle = [
+            key for key, entry in list(self._entries.items())
+            if entry.loaded and (entry.last_used or 0) < cutoff
+        ]
+        return [key for key in idle if self.unload(key)]
+    
+    def stats(self) -> Dict[str, Any]:
+        """Load state, footprint and usage per model"""
+        models = {
+            key: {
+                'loaded': entry.loaded,
+                'load_seconds': round(entry.load_seconds, 3),
+                'memory_bytes': entry.memory_bytes,
+                'rss_delta_bytes': entry.rss_delta_bytes,
+                'loaded_at': entry.loaded_at,
+                'last_used': entry.last_used,
+                'hits': entry.hits
+            }
+            for key, entry in list(self._entries.items())
+        }
+        return {
+            'models': models,
+            'loaded_count': sum(1 for m in models.values() if m['loaded']),
+            'total_memory_bytes': sum(m['memory_bytes'] for m in models.values()),
+            'process_rss_bytes': _rss_bytes()
+        }
+
+
+# One registry per process
+model_registry = ModelRegistry()
+
+
+# Loaders (imported lazily so the registry itself stays light)
+
+def load_layoutlm(
+    model_name: str,
+    device: str,
+    backend: str = 'pytorch',
+    artifact_path: Optional[str] = None,
+    threads: Optional[int] = None
+):
+    """LayoutLMv3 (processor, model) on the configured inference backend"""
+    from transformers import LayoutLMv3Processor, LayoutLMv3ForTokenClassification
+    from src.core.ai_pipeline.inference_backends import build_backend
+    
+    # Words and boxes come from our own Tesseract pass, not the processor's OCR
+    processor = LayoutLMv3Processor.from_pretrained(model_name, apply_ocr=False)
+    model = LayoutLMv3ForTokenClassification.from_pretrained(model_name)
+    model.to(device)
+    model.eval()
+    
+    model = build_backend(
+        model, backend, ['input_ids', 'bbox', 'attention_mask', 'pixel_values'],
+        artifact_path=artifact_path, threads=threads
+    )
+    return processor, model
+
+
+def load_biobert(
+    model_name: str,
+    device: str,
+    backend: str = 'pytorch',
+    artifact_path: Optional[str] = None,
+    threads: Optional[int] = None
+):
+    """BioBERT (tokenizer, model, ner pipeline) - one copy of the weights"""
+    import torch
+    from transformers import AutoTokenizer, AutoModelForTokenClassification, pipeline
+    from src.core.ai_pipeline.inference_backends import build_backend
+    
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForTokenClassification.from_pretrained(model_name)
+    model.to(device)
+    model.eval()
+    
+    model = build_backend(
+        model, backend, ['input_ids', 'attention_mask', 'token_type_ids'],
+        artifact_path=artifact_path, threads=threads
+    )
+    
+    ner_pipeline = pipeline(
+        "ner",
+        model=model,
+        tokenizer=tokenizer,
+        device=torch.device(device),
+        aggregation_strategy="simple"
+    )
+    return tokenizer, model, ner_pipeline
+
+
+def load_spacy(name: str):
+    """General spaCy pipeline"""
+    import spacy
+    return spacy.load(name)
+
+
+def load_scispacy(name: str):
+    """SciSpacy pipeline with the UMLS linker (None if unavailable)"""
+    import spacy
+    
+    try:
+        from scispacy.linking import EntityLinker  # registers the "scispacy_linker" factory
+        nlp = spacy.load(name)
+        nlp.add_pipe("scispacy_linker", config={"resolve_abbreviations": True})
+        return nlp
+    except Exception as e:
+        logger.warning(f"SciSpacy not available: {e}")
+        return None
+
+
+def load_trocr(model_name: str, device: str):
+    """TrOCR (processor, model)"""
+    from transformers import TrOCRProcessor, VisionEncoderDecoderModel
+    
+    processor = TrOCRProcessor.from_pretrained(model_name)
+    model = VisionEncoderDecoderModel.from_pretrained(model_name)
+    model.to(device)
+    model.eval()
+    return processor, model
@@ -0,0 +1,226 @@
+"""
+Content-addressed OCR Result Cache
+Maps SHA-256(file bytes) + OCR config + model version to a stored OCR result
+Two tiers: an in-process LRU and a shared disk or Redis tier
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Bump when OCR output changes for the same input and config
+OCR_PIPELINE_VERSION = 4
+
+
+class OCRResultCache:
+    """
+    Two-tier cache for OCR results (stored as JSON-serialisable dicts)
+    - memory: LRU bounded by entry count and total bytes, with TTL
+    - disk:   one JSON file per key, TTL from the write time (mtime), pruned
+              least recently read (atime) first to a byte budget
+    - redis:  SET EX with TTL (size is bounded by the server's maxmemory policy)
+    An entry promoted from the shared tier keeps its remaining TTL in memory
+    """
+    
+    def __init__(self, config: Dict[str, Any], redis_client=None):
+        self.config = config
+        self.ttl = config.get('ttl_seconds', 7 * 24 * 3600)
+        self.max_entries = config.get('memory_entries', 256)
+        self.max_bytes = config.get('memory_bytes', 64 * 1024 * 1024)
+        
+        self.backend = config.get('backend', 'disk')
+        self.disk_dir = Path(config.get('disk_dir', '/tmp/payerhub/ocr_cache'))
+        self.disk_max_bytes = config.get('disk_max_bytes', 2 * 1024 * 1024 * 1024)
+        self.redis = redis_client
+        if self.backend == 'redis' and self.redis is None:
+            import redis
+            self.redis = redis.Redis.from_url(
+                config.get('redis_url', 'redis://localhost:6379/0'), decode_responses=True
+            )
+        
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._memory_bytes = 0
+        self._puts_since_prune = 0
+        self.stats = {
+            'memory_hits': 0, 'shared_hits': 0, 'misses': 0,
+            'stores': 0, 'evictions': 0, 'errors': 0
+        }
+    
+    @staticmethod
+    def make_key(file_path: str, ocr_config: Dict[str, Any], model_version: str) -> str:
+        """Cache key from file content, OCR config and model version"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        
+        fingerprint = json.dumps(
+            {'config': ocr_config, 'model': model_version, 'pipeline': OCR_PIPELINE_VERSION},
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(f"{digest.hexdigest()}:{fingerprint}".encode('utf-8')).hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a result, promoting shared-tier hits into memory"""
+        now = time.time()
+        
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry:
+                expires_at, size, payload = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.stats['memory_hits'] += 1
+                    return json.loads(payload)
+                self._drop(key)
+        
+        shared = self._shared_get(key)
+        if shared is None:
+            with self._lock:
+                self.stats['misses'] += 1
+            return None
+        
+        payload, expires_at = shared
+        with self._lock:
+            self.stats['shared_hits'] += 1
+            self._remember(key, payload, expires_at)
+        return json.loads(payload)
+    
+    def put(self, key: str, value: Dict[str, Any]):
+        """Store a result in both tiers"""
+        payload = json.dumps(value, default=str)
+        
+        with self._lock:
+            self._remember(key, payload, time.time() + self.ttl)
+            self.stats['stores'] += 1
+        
+        self._shared_put(key, payload)
+    
+    def _remember(self, key: str, payload: str, expires_at: float):
+        """Insert into the memory LRU and evict down to its limits (lock held)"""
+        if key in self._memory:
+            self._drop(key)
+        
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+        
+        self._memory[key] = (expires_at, size, payload)
+        self._memory_bytes += size
+        
+        while len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes:
+            oldest = next(iter(self._memory))
+            self._drop(oldest)
+            self.stats['evictions'] += 1
+    
+    def _drop(self, key: str):
+        _, size, _ = self._memory.pop(key)
+        self._memory_bytes -= size
+    
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.json"
+    
+    def _shared_get(self, key: str) -> Optional[Tuple[str, float]]:
+        """(payload, expiry time) from the shared tier"""
+        try:
+            if self.backend == 'redis' and self.redis is not None:
+                pipe = self.redis.pipeline()
+                pipe.get(f"ocr_cache:{key}")
+                pipe.pttl(f"ocr_cache:{key}")
+                payload, ttl_ms = pipe.execute()
+                if payload is None:
+                    return None
+                return payload, time.time() + (ttl_ms / 1000 if ttl_ms >= 0 else self.ttl)
+            
+            if self.backend == 'disk':
+                path = self._disk_path(key)
+                if not path.exists():
+                    return None
+                now = time.time()
+                written = path.stat().st_mtime
+                if now - written > self.ttl:
+                    path.unlink(missing_ok=True)
+                    return None
+                # Mark as recently read for pruning; mtime stays the write time
+                os.utime(path, (now, written))
+                return path.read_text(), written + self.ttl
+        
+        except Exception as e:
+            logger.warning(f"OCR cache read failed: {e}")
+            with self._lock:
+                self.stats['errors'] += 1
+        
+        return None
+    
+    def _shared_put(self, key: str, payload: str):
+        try:
+            if self.backend == 'redis' and self.redis is not None:
+                self.redis.set(f"ocr_cache:{key}", payload, ex=self.ttl)
+            
+            elif self.backend == 'disk':
+                path = self._disk_path(key)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+                tmp_path.write_text(payload)
+                tmp_path.replace(path)
+                
+                self._puts_since_prune += 1
+                if self._puts_since_prune >= 100:
+                    self._puts_since_prune = 0
+                    self.prune_disk()
+        
+        except Exception as e:
+            logger.warning(f"OCR cache write failed: {e}")
+            with self._lock:
+                self.stats['errors'] += 1
+    
+    def prune_disk(self):
+        """Remove expired entries, then the least recently used until under budget"""
+        if not self.disk_dir.exists():
+            return
+        
+        now = time.time()
+        files = []
+        for path in self.disk_dir.glob('*/*.json'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > self.ttl:
+                path.unlink(missing_ok=True)
+            else:
+                files.append((max(stat.st_atime, stat.st_mtime), stat.st_size, path))
+        
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            with self._lock:
+                self.stats['evictions'] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and memory tier usage"""
+        with self._lock:
+            lookups = self.stats['memory_hits'] + self.stats['shared_hits'] + self.stats['misses']
+            hits = self.stats['memory_hits'] + self.stats['shared_hits']
+            return {
+                **self.stats,
+                'hit_ratio': hits / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'backend': self.backend
+            }
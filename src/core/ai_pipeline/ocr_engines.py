@@ -0,0 +1,153 @@
+"""
+OCR Engine Backends
+- pytesseract: forks a tesseract process per call (temp image + TSV parsing)
+- tesserocr:   persistent in-process libtesseract API, initialised once per
+               thread and reused; images are handed over in memory
+Both return the pytesseract image_to_data(output_type=DICT) shape so
+PageAnalysis can consume either. tesserocr is optional (pip install tesserocr).
+"""
+
+import re
+import logging
+import threading
+from typing import Dict, Any, List
+
+import pytesseract
+from PIL import Image
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+DATA_KEYS = ('level', 'block_num', 'par_num', 'line_num', 'word_num',
+             'left', 'top', 'width', 'height', 'conf', 'text')
+
+
+def parse_psm(config: str, default: int = 6) -> int:
+    """Page segmentation mode from a '--psm N' config string"""
+    match = re.search(r'--psm\s+(\d+)', config or '')
+    return int(match.group(1)) if match else default
+
+
+class OCREngine:
+    """Base class for OCR engines"""
+    
+    name = ''
+    
+    def image_to_data(self, image: Image.Image, config: str = '--psm 6') -> Dict[str, List[Any]]:
+        raise NotImplementedError
+
+
+class PytesseractEngine(OCREngine):
+    """Subprocess-per-call Tesseract (always available)"""
+    
+    name = 'pytesseract'
+    
+    def __init__(self, lang: str = 'eng'):
+        self.lang = lang
+    
+    def image_to_data(self, image: Image.Image, config: str = '--psm 6') -> Dict[str, List[Any]]:
+        return pytesseract.image_to_data(
+            image, lang=self.lang, config=config, output_type=pytesseract.Output.DICT
+        )
+
+
+class TesserocrEngine(OCREngine):
+    """
+    In-process libtesseract via tesserocr
+    PyTessBaseAPI is not thread-safe, so each thread (or pool worker) gets
+    its own API instance, created on first use and kept for its lifetime
+    """
+    
+    name = 'tesserocr'
+    
+    def __init__(self, lang: str = 'eng'):
+        if tesserocr is None:
+            raise ImportError("tesserocr is required for the in-process OCR engine")
+        self.lang = lang
+        self._local = threading.local()
+    
+    def _api(self):
+        api = getattr(self._local, 'api', None)
+        if api is None:
+            api = tesserocr.PyTessBaseAPI(lang=self.lang)
+            self._local.api = api
+            logger.debug(f"Initialised tesserocr API in {threading.current_thread().name}")
+        return api
+    
+    def image_to_data(self, image: Image.Image, config: str = '--psm 6') -> Dict[str, List[Any]]:
+        api = self._api()
+        api.SetPageSegMode(tesserocr.PSM(parse_psm(config)))
+        api.SetImage(image)
+        api.Recognize()
+        
+        data: Dict[str, List[Any]] = {key: [] for key in DATA_KEYS}
+        RIL = tesserocr.RIL
+        iterator = api.GetIterator()
+        if iterator is None:
+            return data
+        
+        block = par = line = word = 0
+        for item in tesserocr.iterate_level(iterator, RIL.WORD):
+            if item.IsAtBeginningOf(RIL.BLOCK):
+                block, par, line = block + 1, 0, 0
+            if item.IsAtBeginningOf(RIL.PARA):
+                par, line = par + 1, 0
+            if item.IsAtBeginningOf(RIL.TEXTLINE):
+                line, word = line + 1, 0
+            word += 1
+            
+            box = item.BoundingBox(RIL.WORD)
+            if box is None:
+                continue
+            x0, y0, x1, y1 = box
+            
+            data['level'].append(5)
+            data['block_num'].append(block)
+            data['par_num'].append(par)
+            data['line_num'].append(line)
+            data['word_num'].append(word)
+            data['left'].append(x0)
+            data['top'].append(y0)
+            data['width'].append(x1 - x0)
+            data['height'].append(y1 - y0)
+            data['conf'].append(item.Confidence(RIL.WORD))
+            data['text'].append(item.GetUTF8Text(RIL.WORD) or '')
+        
+        return data
+
+
+ENGINES = {
+    'pytesseract': PytesseractEngine,
+    'tesserocr': TesserocrEngine,
+}
+
+_engines: Dict[str, OCREngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_ocr_engine(name: str = 'auto', lang: str = 'eng') -> OCREngine:
+    """
+    Shared engine for this process
+    'auto' picks tesserocr when installed and falls back to pytesseract
+    """
+    if name == 'auto':
+        name = 'tesserocr' if tesserocr is not None else 'pytesseract'
+    if name not in ENGINES:
+        raise ValueError(f"Unknown OCR engine: {name}")
+    
+    key = f"{name}:{lang}"
+    with _engines_lock:
+        if key not in _engines:
+            try:
+                _engines[key] = ENGINES[name](lang=lang)
+            except ImportError as e:
+                logger.warning(f"{e}; falling back to pytesseract")
+                _engines[key] = PytesseractEngine(lang=lang)
+            logger.info(f"OCR engine: {_engines[key].name}")
+        return _engines[key]
@@ -5,25 +5,42 @@ Uses Tesseract OCR and LayoutLM for advanced document understanding
 """
 
 import os
-import io
+import time
+import functools
 import logging
-from typing import Dict, Any, List, Optional, Tuple
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple, Iterator, Callable, Set
 from datetime import datetime
 from pathlib import Path
 
-import pytesseract
 from PIL import Image
 import pdf2image
-import cv2
 import numpy as np
-from transformers import LayoutLMv3Processor, LayoutLMv3ForTokenClassification
 import torch
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import boto3
 
+from src.core.ai_pipeline.ocr_cache import OCRResultCache
+from src.core.ai_pipeline.page_analysis import PageAnalysis
+from src.core.ai_pipeline.ocr_engines import get_ocr_engine
+from src.core.ai_pipeline.image_preprocessing import ImagePreprocessor
+from src.core.ai_pipeline.pdf_text_layer import read_text_layer, render_page
+from src.core.ai_pipeline.model_registry import model_registry, load_layoutlm
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Config keys that change OCR output and so are part of the cache key (with
+# model_version and the preprocessing options); tuning knobs such as worker
+# counts, batch sizes and cache settings are left out so they keep the cache
+CACHE_KEY_CONFIG = (
+    'ocr_engine', 'pdf_dpi', 'pdf_text_layer', 'text_layer_min_words', 'text_layer_render_dpi',
+    'layoutlm_backend', 'layoutlm_artifact', 'layoutlm_max_length', 'layoutlm_stride'
+)
+
 
 @dataclass
 class OCRResult:
@@ -34,6 +51,25 @@ class OCRResult:
     document_type: str
     metadata: Dict[str, Any]
     processing_time: float
+    # (image, words, boxes) pages awaiting LayoutLM when field extraction is deferred
+    layout_inputs: Optional[List[Tuple[Image.Image, List[str], List[List[int]]]]] = field(default=None, repr=False)
+
+
+@dataclass
+class OCRPageResult:
+    """Page-level OCR event emitted while a PDF is streamed"""
+    page_number: int
+    total_pages: int
+    text: str
+    confidence: float
+    structured_fields: Dict[str, Any]
+    processing_time: float
+    # Per-stage seconds for the page (preprocess, ocr, layoutlm)
+    timings: Dict[str, float] = field(default_factory=dict)
+    # Preprocessing chain, per-step seconds, noise/skew metrics and skipped steps
+    preprocessing: Dict[str, Any] = field(default_factory=dict)
+    # (image, words, boxes) kept only for the LayoutLM page when field extraction is deferred
+    layout_input: Optional[Tuple[Image.Image, List[str], List[List[int]]]] = field(default=None, repr=False)
 
 
 class OCRProcessor:
@@ -42,125 +78,231 @@ class OCRProcessor:
     Combines Tesseract OCR with LayoutLM for document understanding
     """
     
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], redis_client=None):
         self.config = config
         self.model_name = config.get('layoutlm_model', 'microsoft/layoutlmv3-base')
         self.use_gpu = config.get('use_gpu', torch.cuda.is_available())
         
-        # Initialize LayoutLM
+        # LayoutLM is loaded on first use and shared through the model registry
         self.device = torch.device('cuda' if self.use_gpu else 'cpu')
-        self.processor = LayoutLMv3Processor.from_pretrained(self.model_name)
-        self.model = LayoutLMv3ForTokenClassification.from_pretrained(self.model_name)
-        self.model.to(self.device)
+        # Inference backend: pytorch | quantized | torchscript | onnx (see inference_backends)
+        self.layoutlm_backend = config.get('layoutlm_backend', 'pytorch')
+        self.layoutlm_key = model_registry.register(
+            f"layoutlm:{self.model_name}@{self.device}:{self.layoutlm_backend}",
+            functools.partial(
+                load_layoutlm, self.model_name, str(self.device), self.layoutlm_backend,
+                config.get('layoutlm_artifact'), config.get('inference_threads')
+            )
+        )
         
         # S3 client for document storage
         self.s3_client = boto3.client('s3') if config.get('use_s3') else None
         self.s3_bucket = config.get('s3_bucket')
         
+        # Content-addressed result cache (duplicate faxes skip the whole pipeline)
+        cache_config = config.get('cache', {})
+        self.cache = (
+            OCRResultCache(cache_config, redis_client=redis_client)
+            if cache_config.get('enabled', True) else None
+        )
+        self.model_version = f"{self.model_name}@{config.get('model_revision', 'main')}"
+        
+        # Page-parallel OCR ('auto' = one worker per core, 0/1 = sequential)
+        page_workers = config.get('page_workers', 0)
+        self.page_workers = (os.cpu_count() or 1) if page_workers == 'auto' else int(page_workers)
+        
+        # 'auto' = in-process tesserocr when installed, else pytesseract
+        self.ocr_engine = config.get('ocr_engine', 'auto')
+        
+        # Preprocessing chains per document type plus noise/skew thresholds
+        self.preprocessing = config.get('preprocessing', {})
+        self.preprocessor = ImagePreprocessor(self.preprocessing)
+        
+        # Digital PDFs: read the embedded text layer instead of OCRing the page
+        self.use_text_layer = config.get('pdf_text_layer', True)
+        
         logger.info(f"OCR Processor initialized with model: {self.model_name}")
     
-    def preprocess_image(self, image: Image.Image) -> Image.Image:
+    @property
+    def processor(self):
+        return model_registry.get(self.layoutlm_key)[0]
+    
+    @property
+    def model(self):
+        return model_registry.get(self.layoutlm_key)[1]
+    
+    @staticmethod
+    def preprocess_image(
+        image: Image.Image,
+        document_type: Optional[str] = None,
+        preprocessing: Optional[Dict[str, Any]] = None
+    ) -> Image.Image:
         """
         Preprocess image for better OCR results
         - Convert to grayscale
+        - Deskew / denoise only when the page needs it
         - Apply adaptive thresholding
-        - Denoise
+        See image_preprocessing.ImagePreprocessor for the chains
         """
-        # Convert PIL Image to OpenCV format
-        img_array = np.array(image)
-        
-        # Convert to grayscale if needed
-        if len(img_array.shape) == 3:
-            gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-        else:
-            gray = img_array
-        
-        # Denoise
-        denoised = cv2.fastNlMeansDenoising(gray)
-        
-        # Adaptive thresholding
-        thresh = cv2.adaptiveThreshold(
-            denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-            cv2.THRESH_BINARY, 11, 2
-        )
-        
-        # Convert back to PIL Image
-        return Image.fromarray(thresh)
+        return ImagePreprocessor(preprocessing).run(image, document_type).image
     
-    def extract_text_tesseract(self, image: Image.Image) -> Tuple[str, float]:
+    @staticmethod
+    def extract_text_tesseract(image: Image.Image, engine: str = 'auto') -> Tuple[str, float]:
         """
         Extract text using Tesseract OCR
         Returns text and confidence score
         """
+        analysis = OCRProcessor.analyze_page(image, engine)
+        return analysis.text(), analysis.confidence()
+    
+    @staticmethod
+    def analyze_page(image: Image.Image, engine: str = 'auto') -> PageAnalysis:
+        """
+        One Tesseract pass: words, boxes, lines and confidences
+        Text, LayoutLM inputs and line data are all read from the result
+        """
         try:
-            # Get detailed OCR data
-            data = pytesseract.image_to_data(
-                image, 
-                output_type=pytesseract.Output.DICT,
-                config='--psm 6'  # Assume uniform text block
+            return PageAnalysis.analyze(
+                image,
+                config='--psm 6',  # Assume uniform text block
+                engine=get_ocr_engine(engine)
             )
-            
-            # Extract text and calculate average confidence
-            text_parts = []
-            confidences = []
-            
-            for i, conf in enumerate(data['conf']):
-                if conf > 0:  # Valid confidence
-                    text_parts.append(data['text'][i])
-                    confidences.append(conf)
-            
-            full_text = ' '.join(text_parts)
-            avg_confidence = np.mean(confidences) if confidences else 0.0
-            
-            return full_text, avg_confidence / 100.0  # Normalize to 0-1
-            
         except Exception as e:
             logger.error(f"Tesseract OCR failed: {e}")
-            return "", 0.0
+            return PageAnalysis(width=image.size[0], height=image.size[1])
     
     def extract_structured_fields_layoutlm(
         self, 
         image: Image.Image, 
-        text: str
+        words: List[str],
+        boxes: List[List[int]]
     ) -> Dict[str, Any]:
         """
         Use LayoutLM to extract structured fields from document
         Identifies key-value pairs like patient name, insurance ID, dates, etc.
+        Words and boxes come from Tesseract, so LayoutLM does not re-OCR the page
         """
-        try:
-            # Prepare inputs for LayoutLM
-            encoding = self.processor(
-                image, 
-                return_tensors="pt",
-                padding="max_length",
-                truncation=True
-            )
-            
-            # Move to device
-            encoding = {k: v.to(self.device) for k, v in encoding.items()}
-            
-            # Get predictions
-            with torch.no_grad():
-                outputs = self.model(**encoding)
-                predictions = outputs.logits.argmax(-1).squeeze().tolist()
+        fields, _ = self.extract_structured_fields_layoutlm_batch([(image, words, boxes)])
+        return fields[0]
+    
+    def extract_structured_fields_layoutlm_batch(
+        self,
+        pages: List[Tuple[Image.Image, List[str], List[List[int]]]],
+        batch_size: Optional[int] = None
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Run LayoutLM over many pages (possibly from different documents)
+        - pages longer than layoutlm_max_length are split into overlapping
+          windows (layoutlm_stride tokens of overlap) instead of truncated
+        - windows are sorted by length and padded only to the longest
+          window in their batch
+        - token predictions are mapped back to Tesseract words via word_ids
+        Returns per-page fields in input order plus batch utilisation stats.
+        """
+        batch_size = batch_size or self.config.get('layoutlm_batch_size', 8)
+        max_length = self.config.get('layoutlm_max_length', 512)
+        stride = self.config.get('layoutlm_stride', 128)
+        fields: List[Dict[str, Any]] = [{} for _ in pages]
+        stats = {'batches': 0, 'batch_size': batch_size, 'sequences': 0, 'tokens': 0, 'padded_tokens': 0}
+        
+        # Encode without padding so each window keeps its real length
+        windows = []  # (page_idx, input_ids, attention_mask, bbox, pixel_values, word_ids)
+        for idx, (image, words, boxes) in enumerate(pages):
+            if not words:
+                continue
+            try:
+                encoding = self.processor(
+                    image.convert('RGB'),
+                    words,
+                    boxes=boxes,
+                    truncation=True,
+                    max_length=max_length,
+                    stride=stride,
+                    return_overflowing_tokens=True
+                )
+                for w in range(len(encoding['input_ids'])):
+                    windows.append((
+                        idx,
+                        encoding['input_ids'][w],
+                        encoding['attention_mask'][w],
+                        encoding['bbox'][w],
+                        encoding['pixel_values'][w],
+                        encoding.word_ids(w)
+                    ))
+            except Exception as e:
+                logger.error(f"LayoutLM encoding failed for page {idx}: {e}")
+        
+        # Best prediction per (page, word): the window where the word is most central
+        word_labels: Dict[int, Dict[int, Tuple[int, int]]] = {}
+        order = sorted(range(len(windows)), key=lambda i: len(windows[i][1]))
+        
+        for start in range(0, len(order), batch_size):
+            batch_windows = [windows[i] for i in order[start:start + batch_size]]
+            lengths = [len(w[1]) for w in batch_windows]
             
-            # Map predictions to field names
-            # This would be customized based on your fine-tuned model
-            structured_fields = self._map_predictions_to_fields(predictions, text)
+            try:
+                batch = self._collate_layout_batch(batch_windows)
+                with torch.no_grad():
+                    outputs = self.model(**batch)
+                    predictions = outputs.logits.argmax(-1).tolist()
+            except Exception as e:
+                logger.error(f"LayoutLM extraction failed: {e}")
+                continue
             
-            return structured_fields
+            for row, (page_idx, _, _, _, _, word_ids) in enumerate(batch_windows):
+                labels = word_labels.setdefault(page_idx, {})
+                seen = set()
+                for pos, word_id in enumerate(word_ids):
+                    # Label each word by its first sub-token
+                    if word_id is None or word_id in seen:
+                        continue
+                    seen.add(word_id)
+                    centrality = min(pos, lengths[row] - 1 - pos)
+                    if word_id not in labels or centrality > labels[word_id][0]:
+                        labels[word_id] = (centrality, predictions[row][pos])
             
-        except Exception as e:
-            logger.error(f"LayoutLM extraction failed: {e}")
-            return {}
+            stats['batches'] += 1
+            stats['sequences'] += len(batch_windows)
+            stats['tokens'] += sum(lengths)
+            stats['padded_tokens'] += max(lengths) * len(batch_windows)
+        
+        for page_idx, labels in word_labels.items():
+            fields[page_idx] = self._map_predictions_to_fields(
+                {word_id: label for word_id, (_, label) in labels.items()}, pages[page_idx][1]
+            )
+        
+        stats['padding_waste'] = (
+            1 - stats['tokens'] / stats['padded_tokens'] if stats['padded_tokens'] else 0.0
+        )
+        return fields, stats
+    
+    def _collate_layout_batch(self, windows: List[Tuple]) -> Dict[str, torch.Tensor]:
+        """Pad LayoutLM windows to the longest one in the batch and stack them"""
+        max_len = max(len(w[1]) for w in windows)
+        pad_id = self.processor.tokenizer.pad_token_id
+        
+        batch = {'input_ids': [], 'attention_mask': [], 'bbox': [], 'pixel_values': []}
+        for _, input_ids, attention_mask, bbox, pixel_values, _ in windows:
+            pad = max_len - len(input_ids)
+            batch['input_ids'].append(list(input_ids) + [pad_id] * pad)
+            batch['attention_mask'].append(list(attention_mask) + [0] * pad)
+            batch['bbox'].append([list(b) for b in bbox] + [[0, 0, 0, 0]] * pad)
+            batch['pixel_values'].append(torch.as_tensor(np.asarray(pixel_values)))
+        
+        return {
+            'input_ids': torch.tensor(batch['input_ids']).to(self.device),
+            'attention_mask': torch.tensor(batch['attention_mask']).to(self.device),
+            'bbox': torch.tensor(batch['bbox']).to(self.device),
+            'pixel_values': torch.stack(batch['pixel_values']).to(self.device)
+        }
     
     def _map_predictions_to_fields(
         self, 
-        predictions: List[int], 
-        text: str
+        word_predictions: Dict[int, int], 
+        words: List[str]
     ) -> Dict[str, Any]:
         """
-        Map LayoutLM predictions to healthcare document fields
+        Map LayoutLM word-level predictions to healthcare document fields
         """
         # Label mapping (customize based on your fine-tuned model)
         label_map = {
@@ -182,19 +324,17 @@ class OCRProcessor:
         current_label = None
         current_text = []
         
-        # Simple extraction logic (enhance based on your needs)
-        tokens = text.split()
-        for idx, pred in enumerate(predictions[:len(tokens)]):
-            label = label_map.get(pred, 'O')
+        # Consecutive words with the same label form one field value
+        for idx, word in enumerate(words):
+            label = label_map.get(word_predictions.get(idx, 0), 'O')
             
-            if label != 'O':
-                if label != current_label:
-                    if current_label and current_text:
-                        fields[current_label] = ' '.join(current_text)
-                    current_label = label
-                    current_text = [tokens[idx]]
-                else:
-                    current_text.append(tokens[idx])
+            if label != current_label:
+                if current_label and current_text:
+                    fields[current_label] = ' '.join(current_text)
+                current_label = label if label != 'O' else None
+                current_text = [word] if current_label else []
+            elif current_label:
+                current_text.append(word)
         
         # Add last field
         if current_label and current_text:
@@ -221,39 +361,200 @@ class OCRProcessor:
         else:
             return 'UNKNOWN'
     
-    def process_pdf(self, pdf_path: str) -> OCRResult:
+    def render_pdf_pages(
+        self,
+        pdf_path: str,
+        skip: Optional[Set[int]] = None
+    ) -> Iterator[Tuple[int, int, Image.Image]]:
+        """
+        Rasterise a PDF a small window of pages at a time
+        Yields (page_index, total_pages, image); only `pdf_page_window` pages
+        are held in memory at once, whatever the page count. Page indexes in
+        skip are not rendered.
+        """
+        dpi = self.config.get('pdf_dpi', 300)
+        window = max(1, self.config.get('pdf_page_window', 1))
+        total_pages = pdf2image.pdfinfo_from_path(pdf_path)['Pages']
+        skip = skip or set()
+        
+        first_page = 1
+        while first_page <= total_pages:
+            if first_page - 1 in skip:
+                first_page += 1
+                continue
+            # Contiguous run of wanted pages, at most `window` long
+            last_page = first_page
+            while last_page < min(first_page + window - 1, total_pages) and last_page not in skip:
+                last_page += 1
+            
+            images = pdf2image.convert_from_path(
+                pdf_path, dpi=dpi, first_page=first_page, last_page=last_page
+            )
+            for offset, image in enumerate(images):
+                yield first_page - 1 + offset, total_pages, image
+            del images
+            first_page = last_page + 1
+    
+    def _text_layer_page(self, pdf_path: str, idx: int, analysis: PageAnalysis, seconds: float) -> Tuple:
+        """ocr_page-shaped result for a page read from the PDF text layer"""
+        timings = {'text_layer': seconds}
+        layout_input = None
+        if idx == 0:
+            start = time.perf_counter()
+            image = render_page(pdf_path, idx, self.config.get('text_layer_render_dpi', 100))
+            timings['render'] = time.perf_counter() - start
+            layout_input = (image, *analysis.layout_inputs())
+        return idx, layout_input, analysis.text(), analysis.confidence(), timings, {'source': 'text_layer'}
+    
+    def _ocr_pages(self, pdf_path: str, document_type: Optional[str] = None) -> Iterator[Tuple[int, Tuple]]:
+        """
+        Text + confidence for every page, in page order
+        Pages with a native text layer are parsed directly; only image-only
+        pages are rasterised and OCRed. Yields (total_pages, ocr_page(...) result).
+        """
+        text_pages, total_pages = {}, 0
+        if self.use_text_layer:
+            total_pages, text_pages = read_text_layer(pdf_path, self.config.get('text_layer_min_words', 10))
+        
+        if not text_pages:
+            yield from self._ocr_rendered_pages(pdf_path, document_type)
+            return
+        
+        logger.info(f"Using text layer for {len(text_pages)}/{total_pages} pages of {pdf_path}")
+        rendered = self._ocr_rendered_pages(pdf_path, document_type, skip=set(text_pages))
+        try:
+            for idx in range(total_pages):
+                if idx in text_pages:
+                    yield total_pages, self._text_layer_page(pdf_path, idx, *text_pages[idx])
+                else:
+                    yield next(rendered)
+        finally:
+            rendered.close()
+    
+    def _ocr_rendered_pages(
+        self,
+        pdf_path: str,
+        document_type: Optional[str] = None,
+        skip: Optional[Set[int]] = None
+    ) -> Iterator[Tuple[int, Tuple]]:
+        """
+        Rasterise + preprocess + Tesseract pages (except skip), in page order
+        With page_workers > 1 pages are fanned out to the warm page pool;
+        at most page_max_in_flight rendered pages are outstanding at a time
+        so memory stays bounded. Yields (total_pages, ocr_page(...) result).
+        """
+        if self.page_workers <= 1:
+            for idx, total_pages, image in self.render_pdf_pages(pdf_path, skip):
+                yield total_pages, ocr_page(
+                    idx, image, idx == 0, self.ocr_engine, self.preprocessing, document_type
+                )
+            return
+        
+        pool = get_page_pool(self.page_workers)
+        max_in_flight = self.config.get('page_max_in_flight', self.page_workers * 2)
+        pending = deque()
+        
+        try:
+            for idx, total_pages, image in self.render_pdf_pages(pdf_path, skip):
+                future = pool.submit(
+                    ocr_page, idx, image, idx == 0, self.ocr_engine, self.preprocessing, document_type
+                )
+                pending.append((total_pages, future))
+                if len(pending) >= max_in_flight:
+                    total, future = pending.popleft()
+                    yield total, future.result()
+            
+            while pending:
+                total, future = pending.popleft()
+                yield total, future.result()
+        finally:
+            for _, future in pending:
+                future.cancel()
+    
+    def stream_pdf(
+        self,
+        pdf_path: str,
+        defer_layout: bool = False,
+        document_type: Optional[str] = None
+    ) -> Iterator[OCRPageResult]:
+        """
+        OCR a PDF page by page as pages are read or rasterised
+        Each page is yielded as soon as it (and every page before it) is done
+        """
+        for total_pages, page in self._ocr_pages(pdf_path, document_type):
+            idx, page_layout, text, confidence, timings, preprocessing = page
+            logger.info(f"Processed page {idx + 1}/{total_pages}")
+            
+            # Extract structured fields (only from first page typically)
+            fields, layout_input = {}, None
+            if idx == 0:
+                if defer_layout:
+                    layout_input = page_layout
+                else:
+                    layout_start = time.perf_counter()
+                    fields = self.extract_structured_fields_layoutlm(*page_layout)
+                    timings['layoutlm'] = time.perf_counter() - layout_start
+            
+            yield OCRPageResult(
+                page_number=idx + 1,
+                total_pages=total_pages,
+                text=text,
+                confidence=confidence,
+                structured_fields=fields,
+                processing_time=sum(timings.values()),
+                timings=timings,
+                layout_input=layout_input,
+                preprocessing=preprocessing
+            )
+    
+    def process_pdf(
+        self,
+        pdf_path: str,
+        defer_layout: bool = False,
+        document_type: Optional[str] = None,
+        on_page: Optional[Callable[[OCRPageResult], None]] = None
+    ) -> OCRResult:
         """
         Process PDF document through OCR pipeline
+        Pages are streamed (see stream_pdf) so memory stays flat for long
+        packets; on_page receives each page result as it completes.
+        With defer_layout the LayoutLM page is returned in layout_inputs
+        instead of being run, so callers can batch it across documents.
+        document_type (when the caller knows it) selects the preprocessing chain
         """
         start_time = datetime.now()
         
+        cache_key, cached = self._cache_lookup(pdf_path, start_time, document_type)
+        if cached:
+            return cached
+        
         try:
-            # Convert PDF to images
-            images = pdf2image.convert_from_path(pdf_path, dpi=300)
-            
             all_text = []
             all_fields = {}
+            layout_inputs = []
             total_confidence = 0.0
+            num_pages = 0
+            page_timings = []
             
-            for idx, image in enumerate(images):
-                logger.info(f"Processing page {idx + 1}/{len(images)}")
-                
-                # Preprocess
-                preprocessed = self.preprocess_image(image)
+            for page in self.stream_pdf(pdf_path, defer_layout=defer_layout, document_type=document_type):
+                all_text.append(page.text)
+                total_confidence += page.confidence
+                all_fields.update(page.structured_fields)
+                if page.layout_input:
+                    layout_inputs.append(page.layout_input)
+                num_pages += 1
+                page_timings.append({
+                    'page': page.page_number,
+                    **page.timings,
+                    'preprocessing': page.preprocessing
+                })
                 
-                # Extract text
-                text, confidence = self.extract_text_tesseract(preprocessed)
-                all_text.append(text)
-                total_confidence += confidence
-                
-                # Extract structured fields (only from first page typically)
-                if idx == 0:
-                    fields = self.extract_structured_fields_layoutlm(preprocessed, text)
-                    all_fields.update(fields)
+                if on_page:
+                    on_page(page)
             
             # Combine results
             full_text = '\n\n'.join(all_text)
-            avg_confidence = total_confidence / len(images)
+            avg_confidence = total_confidence / num_pages if num_pages else 0.0
             
             # Detect document type
             doc_type = self.detect_document_type(full_text)
@@ -264,63 +565,172 @@ class OCRProcessor:
             
             processing_time = (datetime.now() - start_time).total_seconds()
             
-            return OCRResult(
+            result = OCRResult(
                 text=full_text,
                 confidence=avg_confidence,
                 structured_fields=all_fields,
                 document_type=doc_type,
                 metadata={
-                    'num_pages': len(images),
+                    'num_pages': num_pages,
+                    'page_workers': max(1, self.page_workers),
+                    'text_layer_pages': sum(1 for t in page_timings if 'text_layer' in t),
+                    'page_timings': page_timings,
                     'source_file': pdf_path,
-                    'processed_at': datetime.now().isoformat()
+                    'processed_at': datetime.now().isoformat(),
+                    'cache_key': cache_key
                 },
-                processing_time=processing_time
+                processing_time=processing_time,
+                layout_inputs=layout_inputs if defer_layout else None
             )
             
+            if not defer_layout:
+                self.cache_result(result)
+            
+            return result
+            
         except Exception as e:
             logger.error(f"PDF processing failed: {e}")
             raise
     
-    def process_image(self, image_path: str) -> OCRResult:
+    def process_image(
+        self,
+        image_path: str,
+        defer_layout: bool = False,
+        document_type: Optional[str] = None
+    ) -> OCRResult:
         """
         Process image file through OCR pipeline
         """
         start_time = datetime.now()
         
+        cache_key, cached = self._cache_lookup(image_path, start_time, document_type)
+        if cached:
+            return cached
+        
         try:
             # Load image
             image = Image.open(image_path)
             
             # Preprocess
-            preprocessed = self.preprocess_image(image)
+            prep = self.preprocessor.run(image, document_type)
+            preprocessed = prep.image
             
-            # Extract text
-            text, confidence = self.extract_text_tesseract(preprocessed)
+            # Extract text, confidence and LayoutLM words/boxes from one Tesseract pass
+            analysis = self.analyze_page(preprocessed, self.ocr_engine)
+            text, confidence = analysis.text(), analysis.confidence()
+            words, boxes = analysis.layout_inputs()
             
             # Extract structured fields
-            fields = self.extract_structured_fields_layoutlm(preprocessed, text)
+            fields = {} if defer_layout else self.extract_structured_fields_layoutlm(preprocessed, words, boxes)
             
             # Detect document type
             doc_type = self.detect_document_type(text)
             
             processing_time = (datetime.now() - start_time).total_seconds()
             
-            return OCRResult(
+            result = OCRResult(
                 text=text,
                 confidence=confidence,
                 structured_fields=fields,
                 document_type=doc_type,
                 metadata={
                     'source_file': image_path,
-                    'processed_at': datetime.now().isoformat()
+                    'preprocessing': prep.to_dict(),
+                    'processed_at': datetime.now().isoformat(),
+                    'cache_key': cache_key
                 },
-                processing_time=processing_time
+                processing_time=processing_time,
+                layout_inputs=[(preprocessed, words, boxes)] if defer_layout else None
             )
             
+            if not defer_layout:
+                self.cache_result(result)
+            
+            return result
+            
         except Exception as e:
             logger.error(f"Image processing failed: {e}")
             raise
     
+    def process_text_file(self, text_path: str) -> OCRResult:
+        """
+        Plain-text documents need no OCR: the text is taken as-is (confidence 1.0)
+        """
+        start_time = datetime.now()
+        
+        with open(text_path, 'r', encoding='utf-8', errors='ignore') as f:
+            text = f.read()
+        
+        return OCRResult(
+            text=text,
+            confidence=1.0,
+            structured_fields={},
+            document_type=self.detect_document_type(text),
+            metadata={
+                'source_file': text_path,
+                'processed_at': datetime.now().isoformat()
+            },
+            processing_time=(datetime.now() - start_time).total_seconds()
+        )
+    
+    def _cache_lookup(
+        self,
+        file_path: str,
+        start_time: datetime,
+        document_type: Optional[str] = None
+    ) -> Tuple[Optional[str], Optional[OCRResult]]:
+        """Return (cache_key, cached result or None) for a document"""
+        if self.cache is None:
+            return None, None
+        
+        try:
+            ocr_config = {k: self.config.get(k) for k in CACHE_KEY_CONFIG}
+            ocr_config['preprocessing_chain'] = self.preprocessor.chain_for(document_type)
+            ocr_config['preprocessing_options'] = self.preprocessor.options
+            cache_key = self.cache.make_key(file_path, ocr_config, self.model_version)
+        except OSError as e:
+            logger.warning(f"OCR cache key failed for {file_path}: {e}")
+            return None, None
+        
+        entry = self.cache.get(cache_key)
+        if entry is None:
+            return cache_key, None
+        
+        metadata = dict(entry['metadata'])
+        metadata.update({
+            'source_file': file_path,
+            'cache_hit': True,
+            'cached_processing_time': entry['processing_time']
+        })
+        
+        logger.info(f"OCR cache hit for {file_path}")
+        return cache_key, OCRResult(
+            text=entry['text'],
+            confidence=entry['confidence'],
+            structured_fields=entry['structured_fields'],
+            document_type=entry['document_type'],
+            metadata=metadata,
+            processing_time=(datetime.now() - start_time).total_seconds()
+        )
+    
+    def cache_result(self, result: OCRResult):
+        """
+        Store a completed result under its cache key
+        Deferred results are stored by the caller once LayoutLM fields are filled in
+        """
+        cache_key = result.metadata.get('cache_key')
+        if self.cache is None or not cache_key or result.layout_inputs:
+            return
+        
+        self.cache.put(cache_key, {
+            'text': result.text,
+            'confidence': result.confidence,
+            'structured_fields': result.structured_fields,
+            'document_type': result.document_type,
+            'metadata': result.metadata,
+            'processing_time': result.processing_time
+        })
+    
     def _store_in_s3(
         self, 
         file_path: str, 
@@ -349,6 +759,58 @@ class OCRProcessor:
             logger.error(f"S3 storage failed: {e}")
 
 
+# Page-parallel OCR: one warm pool per process, reused across documents
+_page_pool: Optional[ProcessPoolExecutor] = None
+_page_pool_lock = threading.Lock()
+
+
+def get_page_pool(workers: int) -> ProcessPoolExecutor:
+    """Return the shared page pool, creating it on first use"""
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is None:
+            _page_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            logger.info(f"Started OCR page pool with {workers} workers")
+        return _page_pool
+
+
+def shutdown_page_pool():
+    """Stop the shared page pool (if one was started)"""
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is not None:
+            _page_pool.shutdown(wait=True)
+            _page_pool = None
+
+
+def ocr_page(
+    idx: int,
+    image: Image.Image,
+    keep_layout: bool,
+    engine: str = 'auto',
+    preprocessing: Optional[Dict[str, Any]] = None,
+    document_type: Optional[str] = None
+) -> Tuple[int, Optional[Tuple[Image.Image, List[str], List[List[int]]]], str, float, Dict[str, float], Dict[str, Any]]:
+    """
+    Preprocess and OCR one page (runs in-process or in a page pool worker)
+    The LayoutLM input (preprocessed image, words, boxes) is only sent back
+    when asked for. The OCR engine is created once per worker and reused
+    """
+    start = time.perf_counter()
+    prep = ImagePreprocessor(preprocessing).run(image, document_type)
+    preprocessed = prep.image
+    preprocessed_at = time.perf_counter()
+    analysis = OCRProcessor.analyze_page(preprocessed, engine)
+    done = time.perf_counter()
+    
+    timings = {'preprocess': preprocessed_at - start, 'ocr': done - preprocessed_at}
+    layout_input = (preprocessed, *analysis.layout_inputs()) if keep_layout else None
+    return idx, layout_input, analysis.text(), analysis.confidence(), timings, prep.to_dict()
+
+
 # Example usage
 if __name__ == "__main__":
     config = {
@@ -0,0 +1,162 @@
+"""
+Page Analysis from a single Tesseract pass
+One image_to_data call yields words, boxes, confidences and line grouping;
+text assembly, line extraction, LayoutLM input and field extraction all
+read from it instead of re-running Tesseract
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Tuple, Optional
+
+from PIL import Image
+
+from src.core.ai_pipeline.ocr_engines import OCREngine, get_ocr_engine
+
+
+@dataclass
+class OCRWord:
+    """One recognised word with its pixel box"""
+    text: str
+    confidence: float  # Tesseract scale, 0-100
+    left: int
+    top: int
+    width: int
+    height: int
+    line_key: Tuple[int, int, int]  # (block, paragraph, line)
+
+
+@dataclass
+class OCRLine:
+    """Words sharing a Tesseract (block, paragraph, line)"""
+    words: List[OCRWord]
+    
+    @property
+    def text(self) -> str:
+        return ' '.join(w.text for w in self.words)
+    
+    @property
+    def confidence(self) -> float:
+        return sum(w.confidence for w in self.words) / len(self.words) / 100.0 if self.words else 0.0
+    
+    @property
+    def bbox(self) -> Dict[str, int]:
+        x0 = min(w.left for w in self.words)
+        y0 = min(w.top for w in self.words)
+        x1 = max(w.left + w.width for w in self.words)
+        y1 = max(w.top + w.height for w in self.words)
+        return {'x': x0, 'y': y0, 'width': x1 - x0, 'height': y1 - y0}
+
+
+@dataclass
+class PageAnalysis:
+    """Words, lines and confidences of one page"""
+    width: int
+    height: int
+    words: List[OCRWord] = field(default_factory=list)
+    config: str = '--psm 6'
+    
+    @classmethod
+    def analyze(
+        cls,
+        image: Image.Image,
+        config: str = '--psm 6',
+        engine: Optional[OCREngine] = None
+    ) -> 'PageAnalysis':
+        """Run Tesseract once and keep everything it reports"""
+        engine = engine or get_ocr_engine()
+        data = engine.image_to_data(image, config=config)
+        return cls.from_tesseract_data(data, image.size, config)
+    
+    @classmethod
+    def from_tesseract_data(
+        cls,
+        data: Dict[str, List[Any]],
+        size: Tuple[int, int],
+        config: str = '--psm 6'
+    ) -> 'PageAnalysis':
+        """Build from an image_to_data(output_type=DICT) result"""
+        words = []
+        for i, conf in enumerate(data['conf']):
+            text = str(data['text'][i]).strip()
+            if float(conf) <= 0 or not text:
+                continue
+            words.append(OCRWord(
+                text=text,
+                confidence=float(conf),
+                left=int(data['left'][i]),
+                top=int(data['top'][i]),
+                width=int(data['width'][i]),
+                height=int(data['height'][i]),
+                line_key=(data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            ))
+        return cls(width=size[0], height=size[1], words=words, config=config)
+    
+    @classmethod
+    def from_text_layer(
+        cls,
+        words: List[Tuple],
+        width: float,
+        height: float
+    ) -> 'PageAnalysis':
+        """Build from PDF text-layer words (x0, y0, x1, y1, text, block, line, word); exact, so confidence 100"""
+        analysis_words = [
+            OCRWord(
+                text=str(text).strip(),
+                confidence=100.0,
+                left=int(x0),
+                top=int(y0),
+                width=max(1, int(x1 - x0)),
+                height=max(1, int(y1 - y0)),
+                line_key=(block, 0, line)
+            )
+            for x0, y0, x1, y1, text, block, line, *_ in words
+            if str(text).strip()
+        ]
+        return cls(width=int(width), height=int(height), words=analysis_words, config='text_layer')
+    
+    def filtered(self, min_confidence: float = 0.0) -> List[OCRWord]:
+        return [w for w in self.words if w.confidence > min_confidence]
+    
+    def lines(self, min_confidence: float = 0.0) -> List[OCRLine]:
+        """Lines in reading order (top to bottom)"""
+        grouped: Dict[Tuple[int, int, int], List[OCRWord]] = {}
+        for word in self.filtered(min_confidence):
+            grouped.setdefault(word.line_key, []).append(word)
+        
+        lines = [OCRLine(words=words) for words in grouped.values()]
+        lines.sort(key=lambda l: l.bbox['y'])
+        return lines
+    
+    def text(self, min_confidence: float = 0.0) -> str:
+        """Page text, one output line per Tesseract line"""
+        return '\n'.join(line.text for line in self.lines(min_confidence))
+    
+    def confidence(self, min_confidence: float = 0.0) -> float:
+        """Mean word confidence, 0-1"""
+        words = self.filtered(min_confidence)
+        return sum(w.confidence for w in words) / len(words) / 100.0 if words else 0.0
+    
+    def layout_inputs(self) -> Tuple[List[str], List[List[int]]]:
+        """Words and boxes on LayoutLM's 0-1000 page grid"""
+        boxes = [
+            [
+                max(0, min(1000, int(1000 * w.left / self.width))),
+                max(0, min(1000, int(1000 * w.top / self.height))),
+                max(0, min(1000, int(1000 * (w.left + w.width) / self.width))),
+                max(0, min(1000, int(1000 * (w.top + w.height) / self.height)))
+            ]
+            for w in self.words
+        ]
+        return [w.text for w in self.words], boxes
+    
+    def line_dicts(self, min_confidence: float = 0.0) -> List[Dict[str, Any]]:
+        """Lines in the {'line_number', 'text', 'confidence', 'bbox'} shape used by handwriting results"""
+        return [
+            {
+                'line_number': idx + 1,
+                'text': line.text,
+                'confidence': line.confidence,
+                'bbox': line.bbox
+            }
+            for idx, line in enumerate(self.lines(min_confidence))
+        ]
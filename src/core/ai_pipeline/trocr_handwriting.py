@@ -4,14 +4,16 @@ Uses Microsoft's Transformer-based OCR for superior handwriting accuracy
 """
 
 import logging
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Tuple, Optional
 from PIL import Image
 import torch
-from transformers import TrOCRProcessor, VisionEncoderDecoderModel
 from dataclasses import dataclass
+import functools
 import cv2
 import numpy as np
 
+from src.core.ai_pipeline.model_registry import model_registry, load_trocr
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -36,17 +38,30 @@ class TrOCRHandwritingProcessor:
         self.config = config or {}
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         
-        # Initialize TrOCR model
-        model_name = self.config.get('model', 'microsoft/trocr-large-handwritten')
-        logger.info(f"Loading TrOCR model: {model_name}")
+        # TrOCR is loaded on first use and shared through the model registry
+        self.model_name = self.config.get('model', 'microsoft/trocr-large-handwritten')
+        self.trocr_key = model_registry.register(
+            f"trocr:{self.model_name}@{self.device}",
+            functools.partial(load_trocr, self.model_name, str(self.device))
+        )
         
-        self.processor = TrOCRProcessor.from_pretrained(model_name)
-        self.model = VisionEncoderDecoderModel.from_pretrained(model_name)
-        self.model.to(self.device)
-        self.model.eval()
+        # Batched decoding
+        self.batch_size = self.config.get('batch_size', 16)
+        self.num_beams = self.config.get('num_beams', 4)
+        self.max_length = self.config.get('max_length', 256)
+        # Lines narrower than this width/height ratio (a few characters) decode greedily
+        self.greedy_max_aspect = self.config.get('greedy_max_aspect', 6.0)
         
         logger.info(f"TrOCR initialized on {self.device}")
     
+    @property
+    def processor(self):
+        return model_registry.get(self.trocr_key)[0]
+    
+    @property
+    def model(self):
+        return model_registry.get(self.trocr_key)[1]
+    
     def preprocess_image(self, image: Image.Image) -> Image.Image:
         """
         Preprocess image for TrOCR
@@ -113,35 +128,84 @@ class TrOCRHandwritingProcessor:
         Recognize text from image using TrOCR
         Returns (text, confidence)
         """
-        try:
-            # Preprocess
-            image = self.preprocess_image(image)
-            
-            # Prepare input
-            pixel_values = self.processor(image, return_tensors="pt").pixel_values
-            pixel_values = pixel_values.to(self.device)
-            
-            # Generate text
-            with torch.no_grad():
-                generated_ids = self.model.generate(
-                    pixel_values,
-                    max_length=256,
-                    num_beams=4,
-                    early_stopping=True
-                )
-            
-            # Decode
-            text = self.processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
-            
-            # Calculate confidence (simplified - based on generation probability)
-            # In production, you'd want to use the actual logits
-            confidence = 0.85 if len(text) > 0 else 0.0
-            
-            return text.strip(), confidence
-            
-        except Exception as e:
-            logger.error(f"TrOCR recognition failed: {e}")
-            return "", 0.0
+        return self.recognize_batch([image])[0]
+    
+    def recognize_batch(
+        self,
+        images: List[Image.Image],
+        batch_size: Optional[int] = None,
+        num_beams: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Recognize many line images with batched encoder/decoder runs
+        Short lines (aspect ratio below greedy_max_aspect) take a greedy
+        fast path; the rest use beam search. Returns (text, confidence)
+        per image, in input order.
+        """
+        batch_size = batch_size or self.batch_size
+        num_beams = num_beams or self.num_beams
+        results: List[Tuple[str, float]] = [("", 0.0)] * len(images)
+        
+        greedy, beam = [], []
+        for idx, image in enumerate(images):
+            width, height = image.size
+            (greedy if width < self.greedy_max_aspect * max(height, 1) else beam).append(idx)
+        
+        for indices, beams in ((greedy, 1), (beam, num_beams)):
+            for start in range(0, len(indices), batch_size):
+                chunk = indices[start:start + batch_size]
+                try:
+                    decoded = self._generate([images[i] for i in chunk], beams)
+                except Exception as e:
+                    logger.error(f"TrOCR recognition failed: {e}")
+                    continue
+                for i, result in zip(chunk, decoded):
+                    results[i] = result
+        
+        return results
+    
+    def _generate(self, images: List[Image.Image], num_beams: int) -> List[Tuple[str, float]]:
+        """
+        One generate() call for a batch of line images
+        Confidence is the geometric mean token probability of the output
+        """
+        # Preprocess; the image processor resizes every crop to the same size
+        images = [self.preprocess_image(image) for image in images]
+        pixel_values = self.processor(images, return_tensors="pt").pixel_values
+        pixel_values = pixel_values.to(self.device)
+        
+        # Generate text
+        with torch.no_grad():
+            outputs = self.model.generate(
+                pixel_values,
+                max_length=self.max_length,
+                num_beams=num_beams,
+                early_stopping=num_beams > 1,
+                return_dict_in_generate=True,
+                output_scores=True
+            )
+        
+        if num_beams > 1:
+            # Length-normalised sequence log-probability
+            log_probs = outputs.sequences_scores
+        else:
+            token_scores = self.model.compute_transition_scores(
+                outputs.sequences, outputs.scores, normalize_logits=True
+            )
+            # Ignore padding emitted after a sequence finished; its score can be
+            # -inf (e.g. pad banned by no_repeat_ngram_size) and -inf * 0 is NaN
+            generated = outputs.sequences[:, -token_scores.shape[1]:]
+            mask = generated != self.processor.tokenizer.pad_token_id
+            log_probs = token_scores.masked_fill(~mask, 0.0).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+        
+        # Decode
+        texts = self.processor.batch_decode(outputs.sequences, skip_special_tokens=True)
+        confidences = torch.exp(log_probs).tolist()
+        
+        return [
+            (text.strip(), float(conf) if text.strip() else 0.0)
+            for text, conf in zip(texts, confidences)
+        ]
     
     def process_line_by_line(self, image: Image.Image) -> List[Dict[str, Any]]:
         """
@@ -150,11 +214,11 @@ class TrOCRHandwritingProcessor:
         # Extract lines
         line_images = self.extract_text_lines(image)
         
+        # Recognize all lines in batches
+        recognized = self.recognize_batch([line_img for line_img, _ in line_images])
+        
         results = []
-        for idx, (line_img, bbox) in enumerate(line_images):
-            # Recognize text in line
-            text, confidence = self.recognize_text(line_img)
-            
+        for idx, ((_, bbox), (text, confidence)) in enumerate(zip(line_images, recognized)):
             if text:
                 results.append({
                     'line_number': idx + 1,
@@ -275,7 +339,7 @@ class TrOCRHandwritingProcessor:
                 confidence=avg_confidence,
                 lines=lines,
                 extracted_fields=fields,
-                model_used='microsoft/trocr-large-handwritten'
+                model_used=self.model_name
             )
             
         except Exception as e:
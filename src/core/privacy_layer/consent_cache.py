@@ -0,0 +1,263 @@
+"""
+Consent Decision Cache for the Privacy Layer
+check_consent decisions are cached per (patient, organization, purpose,
+scope) for a short TTL, never past the consent's expiry_date. Creating,
+revoking or expiring a consent drops every decision for that patient and
+organization, here and - through a Redis pub/sub channel - in every other
+process. While the channel is unreachable the cache is bypassed, since
+invalidations from other processes could be missed.
+"""
+
+import json
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+PatientKey = Tuple[str, str]            # (patient_id, organization_id)
+DecisionKey = Tuple[str, Tuple[str, ...]]  # (purpose, sorted scope)
+
+
+class ConsentDecisionCache:
+    """
+    Thread-safe decision cache with cross-process invalidation
+    redis_url=None keeps it process-local (invalidations are not shared)
+    """
+    
+    def __init__(
+        self,
+        ttl_seconds: float = 60.0,
+        negative_ttl_seconds: float = 10.0,
+        max_patients: int = 50000,
+        redis_url: Optional[str] = None,
+        channel: str = 'consent_invalidations'
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_patients = max_patients
+        self.channel = channel
+        self._entries: "OrderedDict[PatientKey, Dict[DecisionKey, Tuple[float, bool]]]" = OrderedDict()
+        # Bumped on every invalidation, so a decision loaded before it is not stored after it;
+        # _epoch does the same for clear(), including patients with nothing cached
+        self._generations: "OrderedDict[PatientKey, int]" = OrderedDict()
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self._origin = uuid.uuid4().hex
+        self.stats_counters = {
+            'hits': 0, 'misses': 0, 'bypassed': 0, 'stores': 0,
+            'invalidations': 0, 'remote_invalidations': 0, 'publish_errors': 0
+        }
+        self.users = 0
+        
+        self._redis = None
+        self._connected = False
+        self._stop = threading.Event()
+        self._listener = None
+        if redis_url:
+            if redis is None:
+                logger.warning("redis is not installed; consent cache invalidations stay in this process")
+            else:
+                self._redis = redis.Redis.from_url(redis_url, socket_connect_timeout=1, socket_timeout=2)
+                self._listener = threading.Thread(target=self._listen, name='consent-cache-invalidations', daemon=True)
+                self._listener.start()
+    
+    @property
+    def active(self) -> bool:
+        """False while invalidations from other processes could be missed"""
+        return self._redis is None or self._connected
+    
+    @staticmethod
+    def _decision_key(purpose: Optional[str], scope: List[str]) -> DecisionKey:
+        return purpose or '', tuple(sorted(set(scope)))
+    
+    def get(self, patient_id: str, organization_id: str, purpose: Optional[str], scope: List[str]) -> Optional[bool]:
+        """Cached decision, or None"""
+        if not self.active:
+            with self._lock:
+                self.stats_counters['bypassed'] += 1
+            return None
+        
+        patient = (patient_id, organization_id)
+        with self._lock:
+            entry = self._entries.get(patient, {}).get(self._decision_key(purpose, scope))
+            if entry is None or entry[0] <= time.time():
+                self.stats_counters['misses'] += 1
+                return None
+            self._entries.move_to_end(patient)
+            self.stats_counters['hits'] += 1
+            return entry[1]
+    
+    def generation(self, patient_id: str, organization_id: str) -> Tuple[int, int]:
+        """Token to pass to put() for a decision about to be loaded"""
+        with self._lock:
+            return self._epoch, self._generations.get((patient_id, organization_id), 0)
+    
+    def put(
+        self,
+        patient_id: str,
+        organization_id: str,
+        purpose: Optional[str],
+        scope: List[str],
+        allowed: bool,
+        expiry_date: Optional[datetime],
+        generation: Tuple[int, int]
+    ):
+        """Store a decision unless the patient's consents changed since generation()"""
+        if not self.active:
+            return
+        
+        expires = time.time() + (self.ttl_seconds if allowed else self.negative_ttl_seconds)
+        if allowed and expiry_date is not None:
+            expires = min(expires, expiry_date.timestamp())
+        
+        patient = (patient_id, organization_id)
+        with self._lock:
+            if (self._epoch, self._generations.get(patient, 0)) != generation:
+                return
+            self._entries.setdefault(patient, {})[self._decision_key(purpose, scope)] = (expires, allowed)
+            self._entries.move_to_end(patient)
+            while len(self._entries) > self.max_patients:
+                self._entries.popitem(last=False)
+            self.stats_counters['stores'] += 1
+    
+    def invalidate(self, patient_id: str, organization_id: str, broadcast: bool = True):
+        """Drop all decisions for a patient/organization (and tell the other processes)"""
+        self._drop((patient_id, organization_id))
+        with self._lock:
+            self.stats_counters['invalidations'] += 1
+        
+        if broadcast and self._redis is not None:
+            message = json.dumps({
+                'patient_id': patient_id,
+                'organization_id': organization_id,
+                'origin': self._origin
+            })
+            try:
+                self._redis.publish(self.channel, message)
+            except Exception as e:
+                with self._lock:
+                    self.stats_counters['publish_errors'] += 1
+                logger.warning(f"Consent invalidation broadcast failed: {e}")
+    
+    def _drop(self, patient: PatientKey):
+        with self._lock:
+            self._entries.pop(patient, None)
+            self._generations[patient] = self._generations.get(patient, 0) + 1
+            self._generations.move_to_end(patient)
+            while len(self._generations) > self.max_patients:
+                self._generations.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+    
+    def _listen(self):
+        """Apply invalidations published by other processes; reconnect with backoff"""
+        backoff = 1.0
+        while not self._stop.is_set():
+            pubsub = None
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # Decisions cached while disconnected may have missed invalidations
+                self.clear()
+                self._connected = True
+                backoff = 1.0
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get('type') == 'message':
+                        self._on_message(message['data'])
+            except Exception as e:
+                if self._connected:
+                    logger.warning(f"Consent invalidation channel lost, bypassing consent cache: {e}")
+                self._connected = False
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+        self._connected = False
+    
+    def _on_message(self, data):
+        try:
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            return
+        if message.get('origin') == self._origin:
+            return
+        self._drop((message['patient_id'], message['organization_id']))
+        with self._lock:
+            self.stats_counters['remote_invalidations'] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats_counters)
+            stats['cached_patients'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['broadcast'] = 'disabled' if self._redis is None else ('connected' if self._connected else 'disconnected')
+        return stats
+    
+    def close(self):
+        self._stop.set()
+        if self._listener is not None:
+            self._listener.join(timeout=5)
+        if self._redis is not None:
+            self._redis.close()
+
+
+# One cache per process, shared by every PrivacyManager
+_cache: Optional[ConsentDecisionCache] = None
+_cache_lock = threading.Lock()
+
+
+def acquire_consent_cache(config: Dict[str, Any]) -> ConsentDecisionCache:
+    """
+    Process-wide cache (consent_cache_ttl_seconds, consent_cache_negative_ttl_seconds,
+    consent_cache_redis_url); pair with release_consent_cache
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ConsentDecisionCache(
+                ttl_seconds=config.get('consent_cache_ttl_seconds', 60.0),
+                negative_ttl_seconds=config.get('consent_cache_negative_ttl_seconds', 10.0),
+                redis_url=config.get('consent_cache_redis_url', 'redis://localhost:6379/0')
+            )
+        _cache.users += 1
+        return _cache
+
+
+def release_consent_cache(cache: ConsentDecisionCache):
+    """Drop one user of the shared cache; the last one closes it"""
+    global _cache
+    with _cache_lock:
+        cache.users -= 1
+        if cache.users > 0:
+            return
+        if _cache is cache:
+            _cache = None
+    cache.close()
+
+
+def consent_cache_stats() -> Dict[str, Any]:
+    """Hit ratio and invalidation counters of this process's cache"""
+    with _cache_lock:
+        cache = _cache
+    return cache.stats() if cache is not None else {}
@@ -0,0 +1,319 @@
+"""
+Pooled PostgreSQL Access for the Privacy Layer
+One connection pool per process and database, shared by every
+PrivacyManager. Each call borrows a connection for one transaction and
+returns it, instead of all threads sharing a single connection. The hot
+statements (consent lookup, audit insert) are prepared once per
+connection. AsyncPostgresPool (asyncpg) serves callers on an event loop.
+"""
+
+import re
+import time
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+ASYNC_DRIVER_AVAILABLE = asyncpg is not None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# name -> (parameter types, SQL with $n placeholders)
+PREPARED_STATEMENTS = {
+    'get_consent': ('text, text, text', """
+        SELECT * FROM consents
+        WHERE patient_id = $1
+        AND organization_id = $2
+        AND ($3::text IS NULL OR purpose = $3)
+        AND status = 'active'
+        ORDER BY granted_date DESC
+        LIMIT 1
+    """),
+    'create_audit_log': ('text, timestamp, text, text, text, text, text, text, text, boolean, jsonb', """
+        INSERT INTO audit_logs (
+            log_id, timestamp, user_id, action, resource_type,
+            resource_id, patient_id, access_level, ip_address,
+            success, details
+        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
+    """),
+}
+
+_PLACEHOLDER = re.compile(r'\$\d+')
+
+
+def connection_params(config: Dict[str, Any]) -> Dict[str, Any]:
+    """psycopg2/asyncpg connection arguments from a privacy config"""
+    return {
+        'host': config.get('db_host', 'localhost'),
+        'port': config.get('db_port', 5432),
+        'database': config.get('db_name', 'payerhub'),
+        'user': config.get('db_user'),
+        'password': config.get('db_password')
+    }
+
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """psycopg2 connection remembering whether PREPARED_STATEMENTS are prepared on it"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = False
+
+
+class PostgresPool:
+    """
+    Thread-safe psycopg2 pool
+    Callers wait up to acquire_timeout for a free connection (psycopg2's
+    own pool raises as soon as it is exhausted)
+    """
+    
+    def __init__(
+        self,
+        params: Dict[str, Any],
+        min_connections: int = 1,
+        max_connections: int = 10,
+        acquire_timeout: float = 10.0,
+        prepare_statements: bool = True
+    ):
+        self.max_connections = max_connections
+        self.acquire_timeout = acquire_timeout
+        # Off behind poolers that don't keep sessions (e.g. PgBouncer in transaction mode)
+        self.prepare_statements = prepare_statements
+        self._pool = ThreadedConnectionPool(
+            min_connections, max_connections, connection_factory=PreparingConnection, **params
+        )
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+        self._users = 0
+        self._stats = {
+            'acquired': 0, 'waited': 0, 'wait_seconds': 0.0, 'timeouts': 0,
+            'in_use': 0, 'errors': 0, 'discarded': 0
+        }
+    
+    def _prepare(self, conn: PreparingConnection):
+        """PREPARE the hot statements once per connection (session-scoped, so committed right away)"""
+        with conn.cursor() as cursor:
+            for name, (types, sql) in PREPARED_STATEMENTS.items():
+                cursor.execute(f"PREPARE {name} ({types}) AS {sql}")
+        conn.commit()
+        conn.prepared = True
+    
+    @contextmanager
+    def transaction(self, cursor_factory=None):
+        """Cursor on a pooled connection; commits on success, rolls back on error"""
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise PoolError(f"No database connection free within {self.acquire_timeout}s")
+        
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._stats['acquired'] += 1
+            self._stats['in_use'] += 1
+            if waited > 0.001:
+                self._stats['waited'] += 1
+                self._stats['wait_seconds'] += waited
+        
+        conn = None
+        discard = False
+        try:
+            conn = self._pool.getconn()
+            if self.prepare_statements and not conn.prepared:
+                self._prepare(conn)
+            with conn.cursor(cursor_factory=cursor_factory) as cursor:
+                yield cursor
+            conn.commit()
+        except Exception as e:
+            with self._lock:
+                self._stats['errors'] += 1
+            if conn is not None:
+                # A broken connection is dropped from the pool instead of being reused
+                discard = bool(conn.closed) or isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+                if not conn.closed:
+                    try:
+                        conn.rollback()
+                    except psycopg2.Error:
+                        discard = True
+            raise
+        finally:
+            if conn is not None:
+                if discard:
+                    with self._lock:
+                        self._stats['discarded'] += 1
+                self._pool.putconn(conn, close=discard)
+            with self._lock:
+                self._stats['in_use'] -= 1
+            self._slots.release()
+    
+    def execute(self, cursor, name: str, params: Tuple):
+        """Run a PREPARED_STATEMENTS entry (EXECUTE when prepared, plain SQL otherwise)"""
+        if self.prepare_statements:
+            placeholders = ', '.join(['%s'] * len(params))
+            cursor.execute(f"EXECUTE {name} ({placeholders})", params)
+        else:
+            cursor.execute(_PLACEHOLDER.sub('%s', PREPARED_STATEMENTS[name][1]), params)
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['wait_seconds'] = round(stats['wait_seconds'], 3)
+        stats['max_connections'] = self.max_connections
+        stats['open_connections'] = len(self._pool._pool) + len(self._pool._used)
+        return stats
+    
+    def close(self):
+        self._pool.closeall()
+
+
+class AsyncPostgresPool:
+    """
+    asyncpg pool for callers on an event loop
+    asyncpg prepares and caches each statement per connection itself, so
+    PREPARED_STATEMENTS run as prepared statements here too
+    """
+    
+    def __init__(self, pool, loop: asyncio.AbstractEventLoop):
+        self._pool = pool
+        self.loop = loop
+        self._stats = {'acquired': 0, 'waited': 0, 'wait_seconds': 0.0, 'errors': 0}
+    
+    @classmethod
+    async def create(
+        cls,
+        params: Dict[str, Any],
+        min_connections: int = 1,
+        max_connections: int = 10
+    ) -> 'AsyncPostgresPool':
+        if asyncpg is None:
+            raise ImportError("asyncpg is not installed")
+        pool = await asyncpg.create_pool(min_size=min_connections, max_size=max_connections, **params)
+        return cls(pool, asyncio.get_running_loop())
+    
+    async def _run(self, method: str, name: str, params: Tuple):
+        start = time.perf_counter()
+        async with self._pool.acquire() as conn:
+            waited = time.perf_counter() - start
+            self._stats['acquired'] += 1
+            if waited > 0.001:
+                self._stats['waited'] += 1
+                self._stats['wait_seconds'] += waited
+            try:
+                return await getattr(conn, method)(PREPARED_STATEMENTS[name][1], *params)
+            except Exception:
+                self._stats['errors'] += 1
+                raise
+    
+    async def fetchrow(self, name: str, params: Tuple) -> Optional[Dict[str, Any]]:
+        row = await self._run('fetchrow', name, params)
+        return dict(row) if row is not None else None
+    
+    async def execute(self, name: str, params: Tuple):
+        await self._run('execute', name, params)
+    
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats['wait_seconds'] = round(stats['wait_seconds'], 3)
+        stats['max_connections'] = self._pool.get_max_size()
+        stats['open_connections'] = self._pool.get_size()
+        stats['idle_connections'] = self._pool.get_idle_size()
+        return stats
+    
+    def terminate(self):
+        """Close all connections now (from any thread)"""
+        if self.loop.is_closed():
+            return
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self._pool.terminate)
+        else:
+            self._pool.terminate()
+
+
+# Process-wide pools, keyed by connection parameters
+_pools: Dict[Tuple, PostgresPool] = {}
+_async_pools: Dict[Tuple, AsyncPostgresPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_key(params: Dict[str, Any]) -> Tuple:
+    return tuple(sorted((k, str(v)) for k, v in params.items()))
+
+
+def acquire_pool(config: Dict[str, Any]) -> PostgresPool:
+    """Shared pool for config's database (db_pool_min/max/timeout, db_prepare_statements); pair with release_pool"""
+    params = connection_params(config)
+    key = _pool_key(params)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = PostgresPool(
+                params,
+                min_connections=config.get('db_pool_min', 1),
+                max_connections=config.get('db_pool_max', 10),
+                acquire_timeout=config.get('db_pool_timeout', 10.0),
+                prepare_statements=config.get('db_prepare_statements', True)
+            )
+            logger.info(f"Database pool opened for {params['host']}:{params['port']}/{params['database']}")
+        pool._users += 1
+        return pool
+
+
+def release_pool(pool: PostgresPool):
+    """Drop one user of a shared pool; the last one closes it"""
+    with _pools_lock:
+        pool._users -= 1
+        if pool._users > 0:
+            return
+        for key, candidate in list(_pools.items()):
+            if candidate is pool:
+                del _pools[key]
+                # asyncpg pools for the same database go with it
+                for async_key in [k for k in _async_pools if k[0] == key]:
+                    _async_pools.pop(async_key).terminate()
+    pool.close()
+
+
+async def get_async_pool(config: Dict[str, Any]) -> AsyncPostgresPool:
+    """Shared asyncpg pool for config's database on the running event loop"""
+    params = connection_params(config)
+    loop = asyncio.get_running_loop()
+    key = (_pool_key(params), id(loop))
+    pool = _async_pools.get(key)
+    if pool is None or pool.loop is not loop:
+        pool = await AsyncPostgresPool.create(
+            params,
+            min_connections=config.get('db_pool_min', 1),
+            max_connections=config.get('db_pool_max', 10)
+        )
+        # Another coroutine may have created one meanwhile
+        if _async_pools.get(key) is not None and _async_pools[key].loop is loop:
+            pool.terminate()
+            return _async_pools[key]
+        _async_pools[key] = pool
+    return pool
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Metrics of every pool open in this process"""
+    with _pools_lock:
+        pools = list(_pools.items())
+    stats = {}
+    for key, pool in pools:
+        params = dict(key)
+        stats[f"{params['host']}:{params['port']}/{params['database']}"] = pool.stats()
+    for (key, _), pool in list(_async_pools.items()):
+        params = dict(key)
+        stats[f"{params['host']}:{params['port']}/{params['database']} (async)"] = pool.stats()
+    return stats
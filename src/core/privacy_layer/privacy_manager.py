@@ -3,17 +3,22 @@ Privacy and Consent Management Layer
 HIPAA-compliant data privacy, consent verification, and audit logging
 """
 
+import asyncio
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
 from dataclasses import dataclass
 import hashlib
 import json
 from enum import Enum
 
-import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from src.core.privacy_layer.db import (
+    ASYNC_DRIVER_AVAILABLE, acquire_pool, release_pool, get_async_pool
+)
+from src.core.privacy_layer.consent_cache import acquire_consent_cache, release_consent_cache
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -80,14 +85,13 @@ class PrivacyManager:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         
-        # Database connection
-        self.db_conn = psycopg2.connect(
-            host=config.get('db_host', 'localhost'),
-            port=config.get('db_port', 5432),
-            database=config.get('db_name', 'payerhub'),
-            user=config.get('db_user'),
-            password=config.get('db_password')
-        )
+        # Pooled database access, shared by every PrivacyManager in the process;
+        # async callers use the asyncpg pool when asyncpg is installed
+        self.db = acquire_pool(config)
+        self.use_async_driver = ASYNC_DRIVER_AVAILABLE and config.get('db_async_driver', True)
+        
+        # check_consent decisions, shared by the process and invalidated across processes
+        self.consent_cache = acquire_consent_cache(config) if config.get('consent_cache', True) else None
         
         # PHI field definitions
         self.phi_fields = self._define_phi_fields()
@@ -158,6 +162,7 @@ class PrivacyManager:
             
             # Store in database
             self._store_consent(consent)
+            self._invalidate_consents(patient_id, organization_id)
             
             logger.info(f"Created consent {consent_id} for patient {patient_id}")
             return consent
@@ -175,7 +180,7 @@ class PrivacyManager:
     def _store_consent(self, consent: ConsentRecord):
         """Store consent in database"""
         try:
-            with self.db_conn.cursor() as cursor:
+            with self.db.transaction() as cursor:
                 cursor.execute("""
                     INSERT INTO consents (
                         consent_id, patient_id, organization_id, purpose,
@@ -195,9 +200,7 @@ class PrivacyManager:
                     json.dumps(consent.scope),
                     json.dumps(consent.metadata)
                 ))
-                self.db_conn.commit()
         except Exception as e:
-            self.db_conn.rollback()
             logger.error(f"Failed to store consent: {e}")
             raise
     
@@ -211,70 +214,96 @@ class PrivacyManager:
         Retrieve consent record
         """
         try:
-            with self.db_conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                if purpose:
-                    cursor.execute("""
-                        SELECT * FROM consents
-                        WHERE patient_id = %s 
-                        AND organization_id = %s
-                        AND purpose = %s
-                        AND status = 'active'
-                        ORDER BY granted_date DESC
-                        LIMIT 1
-                    """, (patient_id, organization_id, purpose))
-                else:
-                    cursor.execute("""
-                        SELECT * FROM consents
-                        WHERE patient_id = %s 
-                        AND organization_id = %s
-                        AND status = 'active'
-                        ORDER BY granted_date DESC
-                        LIMIT 1
-                    """, (patient_id, organization_id))
-                
-                row = cursor.fetchone()
-                
-                if row:
-                    return ConsentRecord(
-                        consent_id=row['consent_id'],
-                        patient_id=row['patient_id'],
-                        organization_id=row['organization_id'],
-                        purpose=row['purpose'],
-                        status=ConsentStatus(row['status']),
-                        granted_date=row['granted_date'],
-                        expiry_date=row['expiry_date'],
-                        scope=json.loads(row['scope']),
-                        metadata=json.loads(row['metadata'])
-                    )
-                
-                return None
-                
+            return self._fetch_consent(patient_id, organization_id, purpose)
+        except Exception as e:
+            logger.error(f"Failed to retrieve consent: {e}")
+            return None
+    
+    def _fetch_consent(
+        self,
+        patient_id: str,
+        organization_id: str,
+        purpose: Optional[str]
+    ) -> Optional[ConsentRecord]:
+        """get_consent without swallowing database errors"""
+        with self.db.transaction(cursor_factory=RealDictCursor) as cursor:
+            self.db.execute(cursor, 'get_consent', (patient_id, organization_id, purpose or None))
+            row = cursor.fetchone()
+        
+        return self._consent_from_row(row) if row else None
+    
+    async def get_consent_async(
+        self,
+        patient_id: str,
+        organization_id: str,
+        purpose: Optional[str] = None
+    ) -> Optional[ConsentRecord]:
+        """
+        get_consent on the asyncpg pool (in a worker thread without asyncpg)
+        """
+        try:
+            return await self._fetch_consent_async(patient_id, organization_id, purpose)
         except Exception as e:
             logger.error(f"Failed to retrieve consent: {e}")
             return None
     
+    async def _fetch_consent_async(
+        self,
+        patient_id: str,
+        organization_id: str,
+        purpose: Optional[str]
+    ) -> Optional[ConsentRecord]:
+        if not self.use_async_driver:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self._fetch_consent, patient_id, organization_id, purpose
+            )
+        
+        pool = await get_async_pool(self.config)
+        row = await pool.fetchrow('get_consent', (patient_id, organization_id, purpose or None))
+        return self._consent_from_row(row) if row else None
+    
+    @staticmethod
+    def _consent_from_row(row: Dict[str, Any]) -> ConsentRecord:
+        # JSONB arrives decoded from psycopg2 and as text from asyncpg
+        def _json(value):
+            return json.loads(value) if isinstance(value, str) else value
+        
+        return ConsentRecord(
+            consent_id=row['consent_id'],
+            patient_id=row['patient_id'],
+            organization_id=row['organization_id'],
+            purpose=row['purpose'],
+            status=ConsentStatus(row['status']),
+            granted_date=row['granted_date'],
+            expiry_date=row['expiry_date'],
+            scope=_json(row['scope']),
+            metadata=_json(row['metadata']) or {}
+        )
+    
     def revoke_consent(self, consent_id: str) -> bool:
         """
         Revoke a consent
         """
         try:
-            with self.db_conn.cursor() as cursor:
+            with self.db.transaction() as cursor:
                 cursor.execute("""
                     UPDATE consents
                     SET status = %s, metadata = metadata || %s
                     WHERE consent_id = %s
+                    RETURNING patient_id, organization_id
                 """, (
                     ConsentStatus.REVOKED.value,
                     json.dumps({'revoked_at': datetime.now().isoformat()}),
                     consent_id
                 ))
-                self.db_conn.commit()
-                
-                logger.info(f"Revoked consent {consent_id}")
-                return True
+                row = cursor.fetchone()
+            
+            if row:
+                self._invalidate_consents(*row)
+            logger.info(f"Revoked consent {consent_id}")
+            return True
                 
         except Exception as e:
-            self.db_conn.rollback()
             logger.error(f"Failed to revoke consent: {e}")
             return False
     
@@ -288,32 +317,125 @@ class PrivacyManager:
         """
         Check if consent exists and covers requested scope
         """
-        consent = self.get_consent(patient_id, organization_id, purpose)
+        allowed = self._cached_decision(patient_id, organization_id, purpose, requested_scope)
+        if allowed is not None:
+            return allowed
+        generation = self._decision_generation(patient_id, organization_id)
         
-        if not consent:
+        try:
+            consent = self._fetch_consent(patient_id, organization_id, purpose)
+        except Exception as e:
+            # Denied, but not cached: the database error says nothing about the consent
+            logger.error(f"Failed to retrieve consent: {e}")
             return False
         
+        if not consent:
+            allowed = False
         # Check expiry
-        if consent.expiry_date and datetime.now() > consent.expiry_date:
+        elif self._consent_expired(consent):
             self._update_consent_status(consent.consent_id, ConsentStatus.EXPIRED)
-            return False
-        
+            allowed = False
         # Check scope
-        if not all(item in consent.scope for item in requested_scope):
+        else:
+            allowed = self._consent_covers(consent, requested_scope)
+        
+        self._cache_decision(patient_id, organization_id, purpose, requested_scope, allowed, consent, generation)
+        return allowed
+    
+    async def check_consent_async(
+        self,
+        patient_id: str,
+        organization_id: str,
+        purpose: str,
+        requested_scope: List[str]
+    ) -> bool:
+        """
+        check_consent for callers on an event loop
+        """
+        allowed = self._cached_decision(patient_id, organization_id, purpose, requested_scope)
+        if allowed is not None:
+            return allowed
+        generation = self._decision_generation(patient_id, organization_id)
+        
+        try:
+            consent = await self._fetch_consent_async(patient_id, organization_id, purpose)
+        except Exception as e:
+            logger.error(f"Failed to retrieve consent: {e}")
             return False
         
-        return True
+        if not consent:
+            allowed = False
+        elif self._consent_expired(consent):
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._update_consent_status, consent.consent_id, ConsentStatus.EXPIRED
+            )
+            allowed = False
+        else:
+            allowed = self._consent_covers(consent, requested_scope)
+        
+        self._cache_decision(patient_id, organization_id, purpose, requested_scope, allowed, consent, generation)
+        return allowed
+    
+    def _cached_decision(
+        self,
+        patient_id: str,
+        organization_id: str,
+        purpose: str,
+        requested_scope: List[str]
+    ) -> Optional[bool]:
+        if self.consent_cache is None:
+            return None
+        return self.consent_cache.get(patient_id, organization_id, purpose, requested_scope)
+    
+    def _decision_generation(self, patient_id: str, organization_id: str) -> Tuple[int, int]:
+        if self.consent_cache is None:
+            return 0, 0
+        return self.consent_cache.generation(patient_id, organization_id)
+    
+    def _cache_decision(
+        self,
+        patient_id: str,
+        organization_id: str,
+        purpose: str,
+        requested_scope: List[str],
+        allowed: bool,
+        consent: Optional[ConsentRecord],
+        generation: Tuple[int, int]
+    ):
+        """Cache a decision, never past the consent's expiry_date"""
+        if self.consent_cache is None:
+            return
+        self.consent_cache.put(
+            patient_id, organization_id, purpose, requested_scope, allowed,
+            consent.expiry_date if consent else None, generation
+        )
+    
+    def _invalidate_consents(self, patient_id: str, organization_id: str):
+        """Drop cached decisions after a consent of this patient/organization changed"""
+        if self.consent_cache is not None:
+            self.consent_cache.invalidate(patient_id, organization_id)
+    
+    @staticmethod
+    def _consent_expired(consent: ConsentRecord) -> bool:
+        return bool(consent.expiry_date and datetime.now() > consent.expiry_date)
+    
+    @staticmethod
+    def _consent_covers(consent: ConsentRecord, requested_scope: List[str]) -> bool:
+        return all(item in consent.scope for item in requested_scope)
     
     def _update_consent_status(self, consent_id: str, status: ConsentStatus):
         """Update consent status"""
         try:
-            with self.db_conn.cursor() as cursor:
+            with self.db.transaction() as cursor:
                 cursor.execute("""
                     UPDATE consents SET status = %s WHERE consent_id = %s
+                    RETURNING patient_id, organization_id
                 """, (status.value, consent_id))
-                self.db_conn.commit()
+                row = cursor.fetchone()
+            
+            if row:
+                self._invalidate_consents(*row)
         except Exception as e:
-            self.db_conn.rollback()
             logger.error(f"Failed to update consent status: {e}")
     
     def mask_phi_data(
@@ -365,39 +487,87 @@ class PrivacyManager:
         Create audit log entry
         """
         try:
-            log_id = hashlib.sha256(
-                f"{user_id}:{action}:{resource_id}:{datetime.now().isoformat()}".encode()
-            ).hexdigest()[:16].upper()
+            log_id, params = self._audit_log_params(
+                user_id, action, resource_type, resource_id, patient_id,
+                access_level, success, ip_address, details
+            )
             
-            with self.db_conn.cursor() as cursor:
-                cursor.execute("""
-                    INSERT INTO audit_logs (
-                        log_id, timestamp, user_id, action, resource_type,
-                        resource_id, patient_id, access_level, ip_address,
-                        success, details
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    log_id,
-                    datetime.now(),
-                    user_id,
-                    action,
-                    resource_type,
-                    resource_id,
-                    patient_id,
-                    access_level,
-                    ip_address,
-                    success,
-                    json.dumps(details or {})
-                ))
-                self.db_conn.commit()
+            with self.db.transaction() as cursor:
+                self.db.execute(cursor, 'create_audit_log', params)
             
             return log_id
             
         except Exception as e:
-            self.db_conn.rollback()
             logger.error(f"Failed to create audit log: {e}")
             raise
     
+    async def create_audit_log_async(
+        self,
+        user_id: str,
+        action: str,
+        resource_type: str,
+        resource_id: str,
+        patient_id: str,
+        access_level: str,
+        success: bool,
+        ip_address: Optional[str] = None,
+        details: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        create_audit_log on the asyncpg pool (in a worker thread without asyncpg)
+        """
+        if not self.use_async_driver:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, lambda: self.create_audit_log(
+                    user_id, action, resource_type, resource_id, patient_id,
+                    access_level, success, ip_address, details
+                )
+            )
+        
+        try:
+            log_id, params = self._audit_log_params(
+                user_id, action, resource_type, resource_id, patient_id,
+                access_level, success, ip_address, details
+            )
+            pool = await get_async_pool(self.config)
+            await pool.execute('create_audit_log', params)
+            return log_id
+            
+        except Exception as e:
+            logger.error(f"Failed to create audit log: {e}")
+            raise
+    
+    @staticmethod
+    def _audit_log_params(
+        user_id: str,
+        action: str,
+        resource_type: str,
+        resource_id: str,
+        patient_id: str,
+        access_level: str,
+        success: bool,
+        ip_address: Optional[str],
+        details: Optional[Dict[str, Any]]
+    ) -> Tuple[str, Tuple]:
+        """Log id and create_audit_log statement parameters"""
+        log_id = hashlib.sha256(
+            f"{user_id}:{action}:{resource_id}:{datetime.now().isoformat()}".encode()
+        ).hexdigest()[:16].upper()
+        
+        return log_id, (
+            log_id,
+            datetime.now(),
+            user_id,
+            action,
+            resource_type,
+            resource_id,
+            patient_id,
+            access_level,
+            ip_address,
+            success,
+            json.dumps(details or {})
+        )
+    
     def check_access(
         self,
         user_id: str,
@@ -418,28 +588,73 @@ class PrivacyManager:
             requested_scope
         )
         
+        result, audit = self._access_outcome(has_consent, purpose, requested_scope)
+        result.audit_log_id = self.create_audit_log(
+            user_id=user_id,
+            resource_type='PATIENT_DATA',
+            resource_id=patient_id,
+            patient_id=patient_id,
+            ip_address=ip_address,
+            **audit
+        )
+        return result
+    
+    async def check_access_async(
+        self,
+        user_id: str,
+        patient_id: str,
+        organization_id: str,
+        purpose: str,
+        requested_scope: List[str],
+        ip_address: Optional[str] = None,
+        has_consent: Optional[bool] = None
+    ) -> PrivacyCheckResult:
+        """
+        check_access for callers on an event loop
+        has_consent: result of an earlier check_consent_async with the same
+        arguments (the read-only part, which may run ahead of the access)
+        """
+        if has_consent is None:
+            has_consent = await self.check_consent_async(
+                patient_id,
+                organization_id,
+                purpose,
+                requested_scope
+            )
+        
+        result, audit = self._access_outcome(has_consent, purpose, requested_scope)
+        result.audit_log_id = await self.create_audit_log_async(
+            user_id=user_id,
+            resource_type='PATIENT_DATA',
+            resource_id=patient_id,
+            patient_id=patient_id,
+            ip_address=ip_address,
+            **audit
+        )
+        return result
+    
+    def _access_outcome(
+        self,
+        has_consent: bool,
+        purpose: str,
+        requested_scope: List[str]
+    ) -> Tuple[PrivacyCheckResult, Dict[str, Any]]:
+        """Access decision (audit_log_id still empty) and the fields of its audit log entry"""
         if not has_consent:
             # Log denied access
-            audit_log_id = self.create_audit_log(
-                user_id=user_id,
-                action='ACCESS_DENIED',
-                resource_type='PATIENT_DATA',
-                resource_id=patient_id,
-                patient_id=patient_id,
-                access_level='NONE',
-                success=False,
-                ip_address=ip_address,
-                details={'reason': 'No valid consent'}
-            )
-            
             return PrivacyCheckResult(
                 allowed=False,
                 access_level=DataAccessLevel.NONE,
                 consent_status=ConsentStatus.REVOKED,
                 reason='No valid consent found',
                 masked_fields=[],
-                audit_log_id=audit_log_id
-            )
+                audit_log_id=''
+            ), {
+                'action': 'ACCESS_DENIED',
+                'access_level': 'NONE',
+                'success': False,
+                'details': {'reason': 'No valid consent'}
+            }
         
         # Determine access level based on consent scope
         if 'full_access' in requested_scope:
@@ -458,26 +673,28 @@ class PrivacyManager:
             masked_fields = all_phi
         
         # Log successful access
-        audit_log_id = self.create_audit_log(
-            user_id=user_id,
-            action='ACCESS_GRANTED',
-            resource_type='PATIENT_DATA',
-            resource_id=patient_id,
-            patient_id=patient_id,
-            access_level=access_level.value,
-            success=True,
-            ip_address=ip_address,
-            details={'purpose': purpose, 'scope': requested_scope}
-        )
-        
         return PrivacyCheckResult(
             allowed=True,
             access_level=access_level,
             consent_status=ConsentStatus.ACTIVE,
             reason='Valid consent found',
             masked_fields=masked_fields if access_level != DataAccessLevel.FULL else [],
-            audit_log_id=audit_log_id
-        )
+            audit_log_id=''
+        ), {
+            'action': 'ACCESS_GRANTED',
+            'access_level': access_level.value,
+            'success': True,
+            'details': {'purpose': purpose, 'scope': requested_scope}
+        }
+    
+    def close(self):
+        """Release this manager's use of the shared database pool and consent cache"""
+        if self.db is not None:
+            release_pool(self.db)
+            self.db = None
+        if self.consent_cache is not None:
+            release_consent_cache(self.consent_cache)
+            self.consent_cache = None
 
 
 # Database schema initialization
@@ -496,11 +713,15 @@ def init_database(db_conn):
                 expiry_date TIMESTAMP,
                 scope JSONB NOT NULL,
                 metadata JSONB,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                INDEX idx_patient_org (patient_id, organization_id),
-                INDEX idx_status (status)
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
+        # get_consent: newest active consent of a patient/organization
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_consents_patient_org
+            ON consents (patient_id, organization_id, granted_date DESC)
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_consents_status ON consents (status)")
         
         # Audit logs table
         cursor.execute("""
@@ -515,12 +736,12 @@ def init_database(db_conn):
                 access_level VARCHAR(20) NOT NULL,
                 ip_address VARCHAR(45),
                 success BOOLEAN NOT NULL,
-                details JSONB,
-                INDEX idx_patient (patient_id),
-                INDEX idx_timestamp (timestamp),
-                INDEX idx_user (user_id)
+                details JSONB
             )
         """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_logs_patient ON audit_logs (patient_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_logs_timestamp ON audit_logs (timestamp)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_logs_user ON audit_logs (user_id)")
         
         db_conn.commit()
 
@@ -0,0 +1,328 @@
+"""
+Parallel Kafka Consumer Runtime
+Partition-aware worker pool with per-key ordering, manual offset commits
+after successful handling (or an acknowledged dead letter), batch dispatch
+and throughput/lag metrics
+"""
+
+import functools
+import logging
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from kafka import ConsumerRebalanceListener, TopicPartition
+from kafka.structs import OffsetAndMetadata
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class PartitionOffsetTracker:
+    """
+    Tracks in-flight offsets of one partition
+    The safe commit point is the lowest offset still being processed, so a
+    crash never skips a message that was not handled
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        self._next_offset: Optional[int] = None
+        self.committed: Optional[int] = None
+    
+    def started(self, offset: int):
+        with self._lock:
+            self._in_flight.add(offset)
+            if self._next_offset is None or offset >= self._next_offset:
+                self._next_offset = offset + 1
+    
+    def finished(self, offset: int):
+        with self._lock:
+            self._in_flight.discard(offset)
+    
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+    
+    def commit_offset(self) -> Optional[int]:
+        """Offset to commit (next message to read after a restart)"""
+        with self._lock:
+            if self._in_flight:
+                return min(self._in_flight)
+            return self._next_offset
+
+
+class ConsumerRuntime:
+    """
+    Consume events with a worker pool per topic partition
+    
+    Each assigned partition gets `workers_per_partition` ordered lanes
+    (single-thread executors). Records are routed to a lane by partition
+    key, so events with the same key are handled in order while different
+    keys proceed in parallel. Offsets are committed manually, only up to
+    the lowest record that has not finished handling. A record finishes when
+    its handlers succeed or its dead letter is acknowledged. When dispatch or
+    a dead letter fails, the lane retries it with capped exponential backoff,
+    holding the records behind it so per-key order is kept; only a revoked
+    partition or a stop abandons the retry, leaving the record unfinished so
+    it is redelivered from the committed offset.
+    """
+    
+    def __init__(
+        self,
+        kafka_handler,
+        topics: List[str],
+        group_id: str,
+        workers_per_partition: int = 4,
+        max_poll_records: int = 500,
+        poll_timeout_ms: int = 1000,
+        commit_interval: float = 5.0,
+        max_in_flight: int = 5000,
+        retry_backoff: float = 0.5,
+        max_retry_backoff: float = 30.0
+    ):
+        self.kafka = kafka_handler
+        self.topics = topics
+        self.group_id = group_id
+        self.workers_per_partition = max(1, workers_per_partition)
+        self.max_poll_records = max_poll_records
+        self.poll_timeout_ms = poll_timeout_ms
+        self.commit_interval = commit_interval
+        self.max_in_flight = max_in_flight
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        
+        self.consumer = None
+        self._lanes: Dict[TopicPartition, List[ThreadPoolExecutor]] = {}
+        self._trackers: Dict[TopicPartition, PartitionOffsetTracker] = {}
+        self._round_robin: Dict[TopicPartition, int] = {}
+        # Set when a partition is revoked or the runtime stops: lanes stop retrying
+        self._released: Dict[TopicPartition, threading.Event] = {}
+        self._stop = threading.Event()
+        self._paused = False
+        
+        self._metrics_lock = threading.Lock()
+        self._counters = {'polled': 0, 'processed': 0, 'dead_lettered': 0, 'failed': 0, 'commits': 0}
+        self._started_at: Optional[float] = None
+    
+    def run(self, max_messages: Optional[int] = None):
+        """Poll and dispatch until stopped (or max_messages have been handled)"""
+        # Raw bytes: records are decoded on the lanes, where a bad one can be dead-lettered
+        self.consumer = self.kafka._create_consumer(
+            [], self.group_id, max_poll_records=self.max_poll_records, deserialize=False
+        )
+        self.consumer.subscribe(self.topics, listener=_RebalanceListener(self))
+        self._started_at = time.monotonic()
+        last_commit = time.monotonic()
+        
+        try:
+            while not self._stop.is_set():
+                batches = self.consumer.poll(timeout_ms=self.poll_timeout_ms)
+                
+                for tp, records in batches.items():
+                    self._dispatch_partition(tp, records)
+                
+                self._apply_backpressure()
+                
+                if time.monotonic() - last_commit >= self.commit_interval:
+                    self.commit()
+                    last_commit = time.monotonic()
+                
+                if max_messages and self._counters['polled'] >= max_messages:
+                    break
+        
+        except KeyboardInterrupt:
+            logger.info("Consumer interrupted")
+        finally:
+            for release in list(self._released.values()):
+                release.set()
+            self._shutdown_lanes(list(self._lanes))
+            self.commit()
+            self.consumer.close(autocommit=False)
+            logger.info(f"Consumer runtime stopped: {self.metrics()}")
+    
+    def stop(self):
+        """Ask the poll loop to exit after the current iteration"""
+        self._stop.set()
+    
+    def _dispatch_partition(self, tp: TopicPartition, records: List[Any]):
+        """Route a partition's records to its ordered lanes"""
+        lanes = self._lanes.get(tp)
+        if lanes is None:
+            lanes = [
+                ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{tp.topic}-{tp.partition}-{i}")
+                for i in range(self.workers_per_partition)
+            ]
+            self._lanes[tp] = lanes
+            self._trackers.setdefault(tp, PartitionOffsetTracker())
+            self._released[tp] = threading.Event()
+        tracker = self._trackers[tp]
+        
+        by_lane: Dict[int, List[Any]] = {}
+        for record in records:
+            tracker.started(record.offset)
+            by_lane.setdefault(self._lane_for(tp, record), []).append(record)
+        
+        with self._metrics_lock:
+            self._counters['polled'] += len(records)
+        
+        for lane, lane_records in by_lane.items():
+            lanes[lane].submit(self._process_records, tp, lane_records)
+    
+    def _lane_for(self, tp: TopicPartition, record) -> int:
+        """Same key -> same lane; keyless records are spread round-robin"""
+        if record.key is not None:
+            key = record.key.encode('utf-8') if isinstance(record.key, str) else record.key
+            return zlib.crc32(key) % self.workers_per_partition
+        self._round_robin[tp] = (self._round_robin.get(tp, -1) + 1) % self.workers_per_partition
+        return self._round_robin[tp]
+    
+    def _process_records(self, tp: TopicPartition, records: List[Any]):
+        """Handle a lane's records in order, then release their offsets"""
+        tracker = self._trackers[tp]
+        parsed: List[Tuple[Any, Any]] = []
+        
+        try:
+            for record in records:
+                try:
+                    parsed.append((record, self.kafka._event_from_dict(self.kafka.codec.decode(record.value))))
+                except Exception as e:
+                    logger.error(
+                        f"Failed to parse message at {tp.topic}[{tp.partition}]@{record.offset}: {e}"
+                    )
+                    self._retry(
+                        tp, f"Dead letter for {tp.topic}[{tp.partition}]@{record.offset}",
+                        functools.partial(self._dead_letter_record, record, str(e))
+                    )
+                    self._count('dead_lettered')
+                    tracker.finished(record.offset)
+            
+            # Consecutive events of the same type form one batch, preserving order
+            for event_type, run in groupby(parsed, key=lambda item: item[1].event_type):
+                run = list(run)
+                dead_lettered = self._retry(
+                    tp, f"Dispatch of {len(run)} records on {tp.topic}[{tp.partition}]",
+                    functools.partial(self.kafka._dispatch_events, event_type, [event for _, event in run])
+                )
+                self._count('processed', len(run))
+                self._count('dead_lettered', dead_lettered)
+                for record, _ in run:
+                    tracker.finished(record.offset)
+        except _PartitionReleased:
+            logger.info(f"{tp.topic}[{tp.partition}] released while retrying; unfinished records will be redelivered")
+    
+    def _dead_letter_record(self, record, error: str):
+        """Dead-letter an undecodable record and wait for the broker's acknowledgement"""
+        self.kafka._send_record_to_dead_letter_queue(record, error).get(timeout=self.kafka.dlq_timeout)
+    
+    def _retry(self, tp: TopicPartition, action: str, attempt: Callable[[], Any]) -> Any:
+        """Call attempt until it succeeds; raises _PartitionReleased if the partition is released first"""
+        release = self._released.setdefault(tp, threading.Event())
+        delay = self.retry_backoff
+        while True:
+            try:
+                return attempt()
+            except Exception as e:
+                self._count('failed')
+                logger.error(f"{action} failed, retrying in {delay:.1f}s: {e}")
+            if release.wait(delay):
+                raise _PartitionReleased()
+            delay = min(delay * 2, self.max_retry_backoff)
+    
+    def _apply_backpressure(self):
+        """Pause fetching while too many records are in flight"""
+        in_flight = sum(t.in_flight for t in self._trackers.values())
+        
+        if not self._paused and in_flight >= self.max_in_flight:
+            self.consumer.pause(*self.consumer.assignment())
+            self._paused = True
+            logger.info(f"Paused consumption ({in_flight} records in flight)")
+        elif self._paused and in_flight < self.max_in_flight // 2:
+            self.consumer.resume(*self.consumer.paused())
+            self._paused = False
+            logger.info("Resumed consumption")
+    
+    def commit(self, partitions: Optional[List[TopicPartition]] = None):
+        """Commit the safe offset of each partition that advanced"""
+        offsets = {}
+        for tp in partitions or list(self._trackers):
+            tracker = self._trackers.get(tp)
+            offset = tracker.commit_offset() if tracker else None
+            if offset is not None and offset != tracker.committed:
+                offsets[tp] = OffsetAndMetadata(offset, None)
+        
+        if not offsets:
+            return
+        
+        try:
+            self.consumer.commit(offsets)
+            for tp, meta in offsets.items():
+                self._trackers[tp].committed = meta.offset
+            self._count('commits')
+        except Exception as e:
+            logger.error(f"Offset commit failed: {e}")
+    
+    def _shutdown_lanes(self, partitions: List[TopicPartition]):
+        """Wait for a partition's lanes to drain and release them"""
+        for tp in partitions:
+            for lane in self._lanes.pop(tp, []):
+                lane.shutdown(wait=True)
+    
+    def _on_revoked(self, partitions: List[TopicPartition]):
+        """Finish and commit revoked partitions before another member takes them"""
+        revoked = [tp for tp in partitions if tp in self._lanes]
+        for tp in revoked:
+            self._released[tp].set()
+        self._shutdown_lanes(revoked)
+        self.commit(revoked)
+        for tp in revoked:
+            self._trackers.pop(tp, None)
+            self._round_robin.pop(tp, None)
+            self._released.pop(tp, None)
+    
+    def _count(self, counter: str, amount: int = 1):
+        with self._metrics_lock:
+            self._counters[counter] += amount
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Throughput, in-flight and per-partition lag"""
+        with self._metrics_lock:
+            counters = dict(self._counters)
+        
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        lag = {}
+        for tp, tracker in list(self._trackers.items()):
+            highwater = self.consumer.highwater(tp) if self.consumer else None
+            position = tracker.commit_offset()
+            if highwater is not None and position is not None:
+                lag[f"{tp.topic}[{tp.partition}]"] = max(0, highwater - position)
+        
+        return {
+            **counters,
+            'in_flight': sum(t.in_flight for t in self._trackers.values()),
+            'throughput_per_sec': counters['processed'] / elapsed if elapsed else 0.0,
+            'lag': lag,
+            'total_lag': sum(lag.values()),
+            'paused': self._paused
+        }
+
+
+class _PartitionReleased(Exception):
+    """The partition was revoked or the runtime stopped during a retry"""
+
+
+class _RebalanceListener(ConsumerRebalanceListener):
+    """Drains and commits partitions before they are reassigned"""
+    
+    def __init__(self, runtime: ConsumerRuntime):
+        self.runtime = runtime
+    
+    def on_partitions_revoked(self, revoked):
+        self.runtime._on_revoked(list(revoked))
+    
+    def on_partitions_assigned(self, assigned):
+        logger.info(f"Assigned partitions: {[f'{tp.topic}[{tp.partition}]' for tp in assigned]}")
@@ -0,0 +1,369 @@
+"""
+Event Serialization for Kafka
+Pluggable wire formats (JSON, Avro, MessagePack) with a local schema registry
+stand-in and schema-id framing so consumers can pick the right decoder
+"""
+
+import io
+import json
+import logging
+import hashlib
+import struct
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+import avro.schema
+from avro.io import DatumWriter, DatumReader, BinaryEncoder, BinaryDecoder
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Wire frame: magic byte + 4-byte big-endian schema id + payload.
+# Un-framed payloads are treated as legacy JSON.
+MAGIC_BYTE = 0
+FRAME_HEADER = struct.Struct('>bI')
+
+# Typed payload fields per event type for the Avro backend.
+# Types: string, long, double, boolean, json (nested values, stored as JSON text).
+# Keys not listed here travel in the record's `extra` map.
+EVENT_DATA_FIELDS: Dict[str, Dict[str, str]] = {
+    'document.received': {
+        'document_id': 'string', 'file_path': 'string',
+        'document_path': 'string', 'document_type': 'string'
+    },
+    'ocr.completed': {
+        'document_id': 'string', 'text': 'string', 'confidence': 'double',
+        'document_type': 'string', 'processing_time': 'double'
+    },
+    'entity.extracted': {
+        'document_id': 'string', 'entities_count': 'long', 'patient_info': 'json',
+        'insurance_info': 'json', 'clinical_info': 'json',
+        'extracted_text': 'string', 'confidence': 'double'
+    },
+    'anomaly.detected': {
+        'document_id': 'string', 'is_anomaly': 'boolean', 'anomaly_type': 'string',
+        'anomaly_score': 'double', 'issues': 'json'
+    },
+    'fhir.converted': {
+        'document_id': 'string', 'resource_type': 'string',
+        'resource_id': 'string', 'validation_status': 'string'
+    },
+    'privacy.checked': {
+        'document_id': 'string', 'patient_id': 'string', 'access_allowed': 'boolean',
+        'access_level': 'string', 'audit_log_id': 'string'
+    },
+    'hub.updated': {
+        'record_id': 'string', 'fhir_resource_id': 'string', 'updated_at': 'string'
+    },
+    'error.occurred': {
+        'document_id': 'string', 'error': 'string', 'step': 'string'
+    }
+}
+
+
+class SchemaRegistry:
+    """
+    Local file-backed stand-in for a schema registry
+    Schema ids are derived from the schema fingerprint, so independent
+    producers agree on ids without coordination; the file lets consumers
+    resolve ids they have not seen yet.
+    """
+    
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._schemas: Dict[int, Dict[str, str]] = {}
+        self._load()
+    
+    def _load(self):
+        """Load registered schemas from disk"""
+        if self.path.exists():
+            try:
+                entries = json.loads(self.path.read_text())
+                self._schemas.update({int(k): v for k, v in entries.items()})
+            except Exception as e:
+                logger.error(f"Failed to load schema registry {self.path}: {e}")
+    
+    def _save(self):
+        """Persist registered schemas atomically"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps({str(k): v for k, v in self._schemas.items()}, indent=2))
+        tmp_path.replace(self.path)
+    
+    @staticmethod
+    def schema_id(format_name: str, schema: str) -> int:
+        """Id of a schema, derived from its fingerprint"""
+        digest = hashlib.sha256(f"{format_name}:{schema}".encode('utf-8')).digest()
+        return int.from_bytes(digest[:4], 'big') & 0x7FFFFFFF
+    
+    def register(self, subject: str, format_name: str, schema: str) -> int:
+        """Register a schema and return its id"""
+        schema_id = self.schema_id(format_name, schema)
+        
+        with self._lock:
+            if schema_id not in self._schemas:
+                self._load()
+                self._schemas[schema_id] = {'subject': subject, 'format': format_name, 'schema': schema}
+                self._save()
+                logger.info(f"Registered {format_name} schema {schema_id} for {subject}")
+        
+        return schema_id
+    
+    def get(self, schema_id: int) -> Dict[str, str]:
+        """Look up a schema by id, re-reading the registry file on a miss"""
+        entry = self._schemas.get(schema_id)
+        if entry is None:
+            with self._lock:
+                self._load()
+            entry = self._schemas.get(schema_id)
+        if entry is None:
+            raise KeyError(f"Unknown schema id {schema_id}")
+        return entry
+
+
+class EventSerializer:
+    """Base class for event payload serializers"""
+    
+    format_name = ''
+    
+    def supports(self, event_type: Optional[str]) -> bool:
+        """Whether this serializer has a schema for the event type"""
+        return True
+    
+    def schema_for(self, event_type: Optional[str]) -> str:
+        """Schema text registered for the event type"""
+        return f"payerhub.event.{self.format_name}.v1"
+    
+    def encode(self, value: Dict[str, Any], schema: str) -> bytes:
+        raise NotImplementedError
+    
+    def decode(self, payload: bytes, schema: str) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class JsonEventSerializer(EventSerializer):
+    """Plain JSON (the original wire format)"""
+    
+    format_name = 'json'
+    
+    def encode(self, value: Dict[str, Any], schema: str) -> bytes:
+        return json.dumps(value).encode('utf-8')
+    
+    def decode(self, payload: bytes, schema: str) -> Dict[str, Any]:
+        return json.loads(payload.decode('utf-8'))
+
+
+class MessagePackEventSerializer(EventSerializer):
+    """Schemaless binary encoding via MessagePack"""
+    
+    format_name = 'msgpack'
+    
+    def __init__(self):
+        if msgpack is None:
+            raise ImportError("msgpack is required for MessagePack event serialization")
+    
+    def encode(self, value: Dict[str, Any], schema: str) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+    
+    def decode(self, payload: bytes, schema: str) -> Dict[str, Any]:
+        return msgpack.unpackb(payload, raw=False)
+
+
+class AvroEventSerializer(EventSerializer):
+    """
+    Avro binary encoding with one record schema per event type
+    Event types without a schema (e.g. dead letter records) are not supported
+    and fall back to JSON in the codec
+    """
+    
+    format_name = 'avro'
+    
+    def __init__(self):
+        self._schema_text: Dict[str, str] = {}
+        self._parsed: Dict[str, Any] = {}
+    
+    def supports(self, event_type: Optional[str]) -> bool:
+        return event_type in EVENT_DATA_FIELDS
+    
+    def schema_for(self, event_type: Optional[str]) -> str:
+        if event_type not in self._schema_text:
+            self._schema_text[event_type] = json.dumps(self._build_schema(event_type), sort_keys=True)
+        return self._schema_text[event_type]
+    
+    def _build_schema(self, event_type: str) -> Dict[str, Any]:
+        """Build the envelope record schema for an event type"""
+        name = ''.join(part.capitalize() for part in event_type.split('.'))
+        data_fields = [
+            {'name': key, 'type': ['null', 'string' if kind == 'json' else kind], 'default': None}
+            for key, kind in EVENT_DATA_FIELDS[event_type].items()
+        ]
+        data_fields.append({'name': 'extra', 'type': {'type': 'map', 'values': 'string'}, 'default': {}})
+        
+        return {
+            'type': 'record',
+            'name': f"{name}Event",
+            'namespace': 'payerhub.events',
+            'fields': [
+                {'name': 'event_id', 'type': 'string'},
+                {'name': 'event_type', 'type': 'string'},
+                {'name': 'timestamp', 'type': 'string'},
+                {'name': 'source', 'type': 'string'},
+                {'name': 'correlation_id', 'type': ['null', 'string'], 'default': None},
+                {'name': 'metadata', 'type': {'type': 'map', 'values': 'string'}},
+                {'name': 'data', 'type': {'type': 'record', 'name': f"{name}Data", 'fields': data_fields}}
+            ]
+        }
+    
+    def _parse(self, schema: str):
+        if schema not in self._parsed:
+            self._parsed[schema] = avro.schema.Parse(schema)
+        return self._parsed[schema]
+    
+    def _coerce(self, value: Any, kind: str) -> Any:
+        """Convert a payload value to its declared Avro type"""
+        if value is None:
+            return None
+        if kind == 'json':
+            return json.dumps(value)
+        if kind == 'string':
+            if not isinstance(value, str):
+                raise TypeError(f"expected string, got {type(value).__name__}")
+            return value
+        if kind == 'long':
+            if isinstance(value, bool) or not isinstance(value, int):
+                raise TypeError(f"expected int, got {type(value).__name__}")
+            return value
+        if kind == 'double':
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise TypeError(f"expected number, got {type(value).__name__}")
+            return float(value)
+        if kind == 'boolean':
+            if not isinstance(value, bool):
+                raise TypeError(f"expected bool, got {type(value).__name__}")
+            return value
+        raise TypeError(f"unknown field type {kind}")
+    
+    def encode(self, value: Dict[str, Any], schema: str) -> bytes:
+        fields = EVENT_DATA_FIELDS[value['event_type']]
+        data, extra = {}, {}
+        
+        for key, item in (value.get('data') or {}).items():
+            if key in fields:
+                try:
+                    data[key] = self._coerce(item, fields[key])
+                    continue
+                except TypeError:
+                    pass
+            extra[key] = json.dumps(item)
+        
+        for key in fields:
+            data.setdefault(key, None)
+        data['extra'] = extra
+        
+        record = {
+            'event_id': value['event_id'],
+            'event_type': value['event_type'],
+            'timestamp': value['timestamp'],
+            'source': value['source'],
+            'correlation_id': value.get('correlation_id'),
+            'metadata': {k: str(v) for k, v in (value.get('metadata') or {}).items()},
+            'data': data
+        }
+        
+        buffer = io.BytesIO()
+        DatumWriter(self._parse(schema)).write(record, BinaryEncoder(buffer))
+        return buffer.getvalue()
+    
+    def decode(self, payload: bytes, schema: str) -> Dict[str, Any]:
+        parsed = self._parse(schema)
+        record = DatumReader(parsed, parsed).read(BinaryDecoder(io.BytesIO(payload)))
+        
+        fields = EVENT_DATA_FIELDS.get(record['event_type'], {})
+        raw_data = record['data']
+        data = {}
+        for key, kind in fields.items():
+            if raw_data.get(key) is not None:
+                data[key] = json.loads(raw_data[key]) if kind == 'json' else raw_data[key]
+        for key, item in (raw_data.get('extra') or {}).items():
+            data[key] = json.loads(item)
+        
+        record['data'] = data
+        return record
+
+
+SERIALIZERS = {
+    'json': JsonEventSerializer,
+    'avro': AvroEventSerializer,
+    'msgpack': MessagePackEventSerializer,
+}
+
+
+class EventCodec:
+    """
+    Frames serialized events with their schema id and decodes any framed
+    payload by its schema id. Schemas this code builds (EVENT_DATA_FIELDS)
+    resolve without the registry file, so a consumer that never encoded an
+    event can still decode it; only foreign schemas need the registry
+    """
+    
+    def __init__(self, serializer: str, registry: SchemaRegistry):
+        if serializer not in SERIALIZERS:
+            raise ValueError(f"Unknown event serializer: {serializer}")
+        
+        self.registry = registry
+        self._serializers: Dict[str, EventSerializer] = {}
+        self.serializer = self._get_serializer(serializer)
+        self.fallback = self._get_serializer('json')
+        self._schema_ids: Dict[Any, int] = {}
+        self._known_schemas = self._derive_schemas()
+    
+    def _get_serializer(self, format_name: str) -> EventSerializer:
+        if format_name not in self._serializers:
+            self._serializers[format_name] = SERIALIZERS[format_name]()
+        return self._serializers[format_name]
+    
+    def _derive_schemas(self) -> Dict[int, Dict[str, str]]:
+        """Every schema the available serializers build, by schema id"""
+        schemas = {}
+        for format_name in SERIALIZERS:
+            try:
+                serializer = self._get_serializer(format_name)
+            except ImportError:
+                continue
+            for event_type in [None, *EVENT_DATA_FIELDS]:
+                if serializer.supports(event_type):
+                    schema = serializer.schema_for(event_type)
+                    schema_id = SchemaRegistry.schema_id(format_name, schema)
+                    schemas[schema_id] = {'format': format_name, 'schema': schema}
+        return schemas
+    
+    def encode(self, value: Dict[str, Any]) -> bytes:
+        """Serialize an event dict into a framed payload"""
+        event_type = value.get('event_type')
+        serializer = self.serializer if self.serializer.supports(event_type) else self.fallback
+        
+        cache_key = (serializer.format_name, event_type)
+        schema = serializer.schema_for(event_type)
+        if cache_key not in self._schema_ids:
+            subject = f"payerhub.{event_type or 'generic'}"
+            self._schema_ids[cache_key] = self.registry.register(subject, serializer.format_name, schema)
+        
+        return FRAME_HEADER.pack(MAGIC_BYTE, self._schema_ids[cache_key]) + serializer.encode(value, schema)
+    
+    def decode(self, payload: bytes) -> Dict[str, Any]:
+        """Deserialize a framed (or legacy JSON) payload"""
+        if len(payload) < FRAME_HEADER.size or payload[0] != MAGIC_BYTE:
+            return json.loads(payload.decode('utf-8'))
+        
+        _, schema_id = FRAME_HEADER.unpack_from(payload)
+        entry = self._known_schemas.get(schema_id) or self.registry.get(schema_id)
+        serializer = self._get_serializer(entry['format'])
+        return serializer.decode(payload[FRAME_HEADER.size:], entry['schema'])
@@ -3,18 +3,19 @@ Kafka Event Middleware Handler
 Real-time event streaming for payer data integration
 """
 
+import base64
 import logging
-from typing import Dict, Any, List, Optional, Callable
+from typing import Dict, Any, List, Optional, Callable, Tuple
 from datetime import datetime
-import json
+from concurrent.futures import Future
+import threading
 from dataclasses import dataclass, asdict
 from enum import Enum
 
 from kafka import KafkaProducer, KafkaConsumer
 from kafka.errors import KafkaError
-import avro.schema
-from avro.io import DatumWriter, BinaryEncoder
-import io
+
+from src.infrastructure.event_serialization import EventCodec, SchemaRegistry
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -65,11 +66,28 @@ class KafkaEventHandler:
             'dead_letter': 'payerhub.dead_letter'
         }
         
+        # Wire format: 'json', 'avro' or 'msgpack', framed with a schema id
+        self.codec = EventCodec(
+            config.get('serializer', 'json'),
+            SchemaRegistry(config.get('schema_registry_path', 'config/schema_registry.json'))
+        )
+        
         # Initialize producer
         self.producer = self._create_producer()
         
+        # Bounded outbox for non-blocking publishes: each in-flight event holds
+        # a slot until the broker acknowledges it (or delivery fails)
+        self.max_outbox_size = config.get('max_outbox_size', 10000)
+        self.outbox_timeout = config.get('outbox_timeout', 5.0)
+        self._outbox = threading.BoundedSemaphore(self.max_outbox_size)
+        self._stats_lock = threading.Lock()
+        self.delivery_stats = {'pending': 0, 'delivered': 0, 'failed': 0, 'outbox_full': 0}
+        # How long a consumer waits for a dead letter to be acknowledged
+        self.dlq_timeout = config.get('dlq_timeout', 30.0)
+        
         # Event handlers registry
         self.event_handlers: Dict[EventType, List[Callable]] = {}
+        self.batch_event_handlers: Dict[EventType, List[Callable]] = {}
         
         logger.info("Kafka Event Handler initialized")
     
@@ -77,31 +95,37 @@ class KafkaEventHandler:
         """Create Kafka producer with serialization"""
         return KafkaProducer(
             bootstrap_servers=self.bootstrap_servers,
-            value_serializer=lambda v: json.dumps(v).encode('utf-8'),
+            value_serializer=self.codec.encode,
             key_serializer=lambda k: k.encode('utf-8') if k else None,
-            acks='all',
+            acks=self.config.get('acks', 'all'),
             retries=3,
-            max_in_flight_requests_per_connection=1,
-            compression_type='gzip',
-            batch_size=16384,
-            linger_ms=10
+            max_in_flight_requests_per_connection=self.config.get('max_in_flight_requests', 1),
+            compression_type=self.config.get('compression_type', 'gzip'),
+            batch_size=self.config.get('batch_size', 16384),
+            linger_ms=self.config.get('linger_ms', 10)
         )
     
     def _create_consumer(
         self,
         topics: List[str],
-        group_id: str
+        group_id: str,
+        max_poll_records: int = 100,
+        deserialize: bool = True
     ) -> KafkaConsumer:
-        """Create Kafka consumer"""
+        """
+        Create Kafka consumer (offsets are committed manually after handling)
+        deserialize=False returns raw bytes, so the caller can dead-letter
+        records that fail to decode instead of failing inside poll()
+        """
         return KafkaConsumer(
             *topics,
             bootstrap_servers=self.bootstrap_servers,
             group_id=group_id,
-            value_deserializer=lambda m: json.loads(m.decode('utf-8')),
-            key_deserializer=lambda k: k.decode('utf-8') if k else None,
+            value_deserializer=self.codec.decode if deserialize else None,
+            key_deserializer=(lambda k: k.decode('utf-8') if k else None) if deserialize else None,
             auto_offset_reset='earliest',
-            enable_auto_commit=True,
-            max_poll_records=100,
+            enable_auto_commit=False,
+            max_poll_records=max_poll_records,
             session_timeout_ms=30000
         )
     
@@ -114,48 +138,15 @@ class KafkaEventHandler:
         partition_key: Optional[str] = None
     ) -> bool:
         """
-        Publish event to Kafka
+        Publish event to Kafka and wait for the broker acknowledgment
         """
         try:
-            # Generate event ID
-            event_id = self._generate_event_id()
-            
-            # Create event
-            event = Event(
-                event_id=event_id,
-                event_type=event_type,
-                timestamp=datetime.now().isoformat(),
-                source=source,
-                data=data,
-                metadata={
-                    'version': '1.0',
-                    'schema': 'payerhub.event.v1'
-                },
-                correlation_id=correlation_id
-            )
-            
-            # Determine topic
-            topic = self._get_topic_for_event(event_type)
-            
-            # Convert to dict
-            event_dict = asdict(event)
-            event_dict['event_type'] = event.event_type.value
-            
-            # Publish to Kafka
-            future = self.producer.send(
-                topic,
-                key=partition_key,
-                value=event_dict
+            future = self.publish_event_async(
+                event_type, data, source, correlation_id, partition_key
             )
             
             # Wait for acknowledgment
-            record_metadata = future.get(timeout=10)
-            
-            logger.info(
-                f"Published event {event_id} to {topic} "
-                f"(partition: {record_metadata.partition}, offset: {record_metadata.offset})"
-            )
-            
+            future.result(timeout=10)
             return True
             
         except KafkaError as e:
@@ -165,6 +156,116 @@ class KafkaEventHandler:
             logger.error(f"Unexpected error publishing event: {e}")
             return False
     
+    def publish_event_async(
+        self,
+        event_type: EventType,
+        data: Dict[str, Any],
+        source: str,
+        correlation_id: Optional[str] = None,
+        partition_key: Optional[str] = None,
+        on_delivery: Optional[Callable[[Event, Optional[Exception]], None]] = None,
+        timeout: Optional[float] = None
+    ) -> Future:
+        """
+        Publish event to Kafka without waiting for the acknowledgment
+        
+        Returns a concurrent.futures.Future that settles with the record
+        metadata (use asyncio.wrap_future to await it). on_delivery is called
+        with (event, error) from the producer thread once delivery settles.
+        If the outbox is full, waits up to `timeout` seconds (default
+        outbox_timeout) for a slot, then fails the future with BufferError.
+        """
+        result: Future = Future()
+        
+        if not self._outbox.acquire(timeout=self.outbox_timeout if timeout is None else timeout):
+            with self._stats_lock:
+                self.delivery_stats['outbox_full'] += 1
+            result.set_exception(BufferError(
+                f"Kafka outbox full ({self.max_outbox_size} events in flight)"
+            ))
+            return result
+        
+        try:
+            event, topic, event_dict = self._build_event(event_type, data, source, correlation_id)
+            kafka_future = self.producer.send(topic, key=partition_key, value=event_dict)
+        except Exception as e:
+            self._outbox.release()
+            result.set_exception(e)
+            return result
+        
+        with self._stats_lock:
+            self.delivery_stats['pending'] += 1
+        
+        def settle(record_metadata=None, error: Optional[Exception] = None):
+            self._outbox.release()
+            with self._stats_lock:
+                self.delivery_stats['pending'] -= 1
+                self.delivery_stats['failed' if error else 'delivered'] += 1
+            
+            if error:
+                logger.error(f"Failed to publish event {event.event_id} to {topic}: {error}")
+            else:
+                logger.debug(
+                    f"Published event {event.event_id} to {topic} "
+                    f"(partition: {record_metadata.partition}, offset: {record_metadata.offset})"
+                )
+            # The caller may have cancelled the future; on_delivery still runs
+            if not result.done():
+                if error:
+                    result.set_exception(error)
+                else:
+                    result.set_result(record_metadata)
+            
+            if on_delivery:
+                try:
+                    on_delivery(event, error)
+                except Exception as e:
+                    logger.error(f"Delivery callback failed for event {event.event_id}: {e}")
+        
+        kafka_future.add_callback(lambda record_metadata: settle(record_metadata))
+        kafka_future.add_errback(lambda error: settle(error=error))
+        
+        return result
+    
+    def flush(self, timeout: Optional[float] = None) -> int:
+        """
+        Push out all buffered events and wait for their delivery
+        Call at pipeline checkpoints; returns the number of events still pending
+        """
+        self.producer.flush(timeout=timeout)
+        with self._stats_lock:
+            return self.delivery_stats['pending']
+    
+    def _build_event(
+        self,
+        event_type: EventType,
+        data: Dict[str, Any],
+        source: str,
+        correlation_id: Optional[str]
+    ) -> Tuple[Event, str, Dict[str, Any]]:
+        """Create an event and resolve its topic and wire dict"""
+        event = Event(
+            event_id=self._generate_event_id(),
+            event_type=event_type,
+            timestamp=datetime.now().isoformat(),
+            source=source,
+            data=data,
+            metadata={
+                'version': '1.0',
+                'schema': 'payerhub.event.v1'
+            },
+            correlation_id=correlation_id
+        )
+        
+        # Determine topic
+        topic = self._get_topic_for_event(event_type)
+        
+        # Convert to dict
+        event_dict = asdict(event)
+        event_dict['event_type'] = event.event_type.value
+        
+        return event, topic, event_dict
+    
     def _generate_event_id(self) -> str:
         """Generate unique event ID"""
         import uuid
@@ -199,83 +300,136 @@ class KafkaEventHandler:
         self.event_handlers[event_type].append(handler)
         logger.info(f"Registered handler for {event_type.value}")
     
+    def register_batch_handler(
+        self,
+        event_type: EventType,
+        handler: Callable[[List[Event]], None]
+    ):
+        """
+        Register a batch-aware handler that receives lists of events
+        """
+        if event_type not in self.batch_event_handlers:
+            self.batch_event_handlers[event_type] = []
+        
+        self.batch_event_handlers[event_type].append(handler)
+        logger.info(f"Registered batch handler for {event_type.value}")
+    
     def consume_events(
         self,
         topics: List[str],
         group_id: str,
-        max_messages: Optional[int] = None
+        max_messages: Optional[int] = None,
+        workers_per_partition: Optional[int] = None
     ):
         """
         Consume events from Kafka topics
+        Handlers run on a per-partition worker pool that keeps order per
+        partition key; offsets are committed only after handling finishes
         """
-        consumer = self._create_consumer(topics, group_id)
+        from src.infrastructure.consumer_runtime import ConsumerRuntime
         
-        try:
-            message_count = 0
-            
-            for message in consumer:
+        runtime = ConsumerRuntime(
+            self,
+            topics,
+            group_id,
+            workers_per_partition=workers_per_partition or self.config.get('workers_per_partition', 4),
+            max_poll_records=self.config.get('max_poll_records', 500),
+            commit_interval=self.config.get('commit_interval', 5.0),
+            max_in_flight=self.config.get('max_in_flight_records', 5000),
+            retry_backoff=self.config.get('retry_backoff', 0.5)
+        )
+        runtime.run(max_messages)
+        return runtime.metrics()
+    
+    def _event_from_dict(self, event_dict: Dict[str, Any]) -> Event:
+        """Rebuild an Event from its wire dict"""
+        return Event(
+            event_id=event_dict['event_id'],
+            event_type=EventType(event_dict['event_type']),
+            timestamp=event_dict['timestamp'],
+            source=event_dict['source'],
+            data=event_dict['data'],
+            metadata=event_dict['metadata'],
+            correlation_id=event_dict.get('correlation_id')
+        )
+    
+    def _dispatch_events(self, event_type: EventType, events: List[Event]) -> int:
+        """
+        Call registered handlers for a run of same-type events
+        Failed events go to the dead letter queue, once each with all their
+        errors; events a batch handler failed on skip the per-event handlers.
+        Returns the number of dead letters once the broker has acknowledged
+        all of them; raises if one could not be delivered, so the caller must
+        not commit these events
+        """
+        errors: Dict[int, List[str]] = {}
+        for handler in self.batch_event_handlers.get(event_type, []):
+            try:
+                handler(events)
+            except Exception as e:
+                logger.error(f"Batch handler failed for {len(events)} {event_type.value} events: {e}")
+                for i in range(len(events)):
+                    errors.setdefault(i, []).append(str(e))
+        
+        for i, event in enumerate(events):
+            if i in errors:
+                continue
+            logger.debug(f"Dispatching event {event.event_id} of type {event_type.value}")
+            for handler in self.event_handlers.get(event_type, []):
                 try:
-                    # Parse event
-                    event_dict = message.value
-                    event_type = EventType(event_dict['event_type'])
-                    
-                    event = Event(
-                        event_id=event_dict['event_id'],
-                        event_type=event_type,
-                        timestamp=event_dict['timestamp'],
-                        source=event_dict['source'],
-                        data=event_dict['data'],
-                        metadata=event_dict['metadata'],
-                        correlation_id=event_dict.get('correlation_id')
-                    )
-                    
-                    logger.info(
-                        f"Received event {event.event_id} of type {event_type.value} "
-                        f"from topic {message.topic} (partition: {message.partition}, offset: {message.offset})"
-                    )
-                    
-                    # Call registered handlers
-                    if event_type in self.event_handlers:
-                        for handler in self.event_handlers[event_type]:
-                            try:
-                                handler(event)
-                            except Exception as e:
-                                logger.error(f"Handler failed for event {event.event_id}: {e}")
-                                self._send_to_dead_letter_queue(event, str(e))
-                    
-                    message_count += 1
-                    
-                    if max_messages and message_count >= max_messages:
-                        break
-                        
+                    handler(event)
                 except Exception as e:
-                    logger.error(f"Failed to process message: {e}")
-                    continue
-                    
-        except KeyboardInterrupt:
-            logger.info("Consumer interrupted")
-        finally:
-            consumer.close()
-            logger.info(f"Consumed {message_count} messages")
+                    logger.error(f"Handler failed for event {event.event_id}: {e}")
+                    errors.setdefault(i, []).append(str(e))
+        
+        dead_letters = [
+            self._send_to_dead_letter_queue(events[i], '; '.join(event_errors))
+            for i, event_errors in sorted(errors.items())
+        ]
+        for future in dead_letters:
+            future.get(timeout=self.dlq_timeout)
+        return len(dead_letters)
     
     def _send_to_dead_letter_queue(self, event: Event, error: str):
-        """Send failed event to dead letter queue"""
-        try:
-            dlq_event = {
-                'original_event': asdict(event),
-                'error': error,
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            self.producer.send(
-                self.topics['dead_letter'],
-                value=dlq_event
-            )
-            
-            logger.info(f"Sent event {event.event_id} to dead letter queue")
-            
-        except Exception as e:
-            logger.error(f"Failed to send to DLQ: {e}")
+        """Send failed event to dead letter queue; returns the send future"""
+        original_event = asdict(event)
+        original_event['event_type'] = event.event_type.value
+        
+        dlq_event = {
+            'original_event': original_event,
+            'error': error,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        future = self.producer.send(
+            self.topics['dead_letter'],
+            value=dlq_event
+        )
+        
+        logger.info(f"Sent event {event.event_id} to dead letter queue")
+        return future
+    
+    def _send_record_to_dead_letter_queue(self, record, error: str):
+        """Send a consumed record that could not be decoded to the dead letter queue"""
+        dlq_event = {
+            'original_record': {
+                'topic': record.topic,
+                'partition': record.partition,
+                'offset': record.offset,
+                'key': base64.b64encode(record.key).decode('ascii') if record.key else None,
+                'value': base64.b64encode(record.value).decode('ascii') if record.value else None
+            },
+            'error': error,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        future = self.producer.send(
+            self.topics['dead_letter'],
+            value=dlq_event
+        )
+        
+        logger.info(f"Sent undecodable record {record.topic}[{record.partition}]@{record.offset} to dead letter queue")
+        return future
     
     def create_topics(self):
         """Create Kafka topics if they don't exist"""
@@ -4,40 +4,98 @@ Main orchestration engine that coordinates the entire pipeline
 """
 
 import logging
-from typing import Dict, Any, Optional
+import os
+from typing import Dict, Any, Optional, List, Callable, Iterable, AsyncIterator
 from datetime import datetime
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+import functools
 import asyncio
 import uuid
 
-from src.ai_pipeline.ocr_processor import OCRProcessor
-from src.ai_pipeline.entity_extractor import EntityExtractor
-from src.anomaly_detection.detector import DataQualityDetector
-from src.fhir_mapper.mapper import FHIRMapper
-from src.privacy_layer.privacy_manager import PrivacyManager
-from src.event_middleware.kafka_handler import KafkaEventHandler, EventType
+from src.core.ai_pipeline.ocr_processor import OCRProcessor, shutdown_page_pool
+from src.core.ai_pipeline.entity_extractor import EntityExtractor
+from src.core.anomaly_detection.detector import DataQualityDetector
+from src.core.fhir_mapper.mapper import FHIRMapper
+from src.core.privacy_layer.privacy_manager import PrivacyManager
+from src.infrastructure.kafka_handler import KafkaEventHandler, EventType
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Access the pipeline checks consent for and audits at step 5
+PRIVACY_PURPOSE = 'treatment'
+PRIVACY_SCOPE = ('full_access',)
+
+
+# Pipeline components owned by a CPU worker process. Each worker builds its
+# own copy on first use so models are loaded once per process, not per call.
+_worker_config: Dict[str, Any] = {}
+_worker_components: Dict[str, Any] = {}
+
+_STAGE_COMPONENTS = {
+    'ocr': (OCRProcessor, 'ocr'),
+    'entity_extraction': (EntityExtractor, 'nlp'),
+    'anomaly_detection': (DataQualityDetector, 'anomaly'),
+}
+
+
+def _init_stage_worker(config: Dict[str, Any]):
+    """Process pool initializer: remember pipeline config for lazy component setup"""
+    _worker_config.update(config)
+
+
+def _run_stage_in_worker(stage: str, method: str, *args):
+    """Run a CPU-bound stage method inside a worker process"""
+    component = _worker_components.get(stage)
+    if component is None:
+        component_class, config_key = _STAGE_COMPONENTS[stage]
+        component = component_class(_worker_config.get(config_key, {}))
+        _worker_components[stage] = component
+    return getattr(component, method)(*args)
+
+
 class PayerHubOrchestrator:
     """
     Main orchestrator for PayerHub integration pipeline
     Coordinates: OCR → NLP → Anomaly Detection → FHIR → Privacy → Hub CRM
     """
     
-    def __init__(self, config: Optional[Dict[str, Any]] = None):
+    def __init__(self, config: Optional[Dict[str, Any]] = None, redis_client=None):
         self.config = config or self._load_default_config()
         
-        # Initialize all components
-        self.ocr_processor = OCRProcessor(self.config.get('ocr', {}))
+        # Initialize all components (redis_client backs a 'redis' OCR cache tier)
+        self.ocr_processor = OCRProcessor(self.config.get('ocr', {}), redis_client=redis_client)
         self.entity_extractor = EntityExtractor(self.config.get('nlp', {}))
         self.anomaly_detector = DataQualityDetector(self.config.get('anomaly', {}))
         self.fhir_mapper = FHIRMapper(self.config.get('fhir', {}))
         self.privacy_manager = PrivacyManager(self.config.get('privacy', {}))
         self.kafka_handler = KafkaEventHandler(self.config.get('kafka', {}))
         
+        # Execution pools: CPU-bound stages go to worker processes, blocking
+        # I/O (Kafka, Postgres) and in-process model calls go to threads
+        execution = self.config.get('execution', {})
+        cpu_workers = execution.get('cpu_workers', 0)
+        self.process_stages = set(execution.get('process_stages', ['ocr']))
+        self.cpu_pool = ProcessPoolExecutor(
+            max_workers=cpu_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_stage_worker,
+            initargs=(self.config,)
+        ) if cpu_workers > 0 else None
+        self.io_pool = ThreadPoolExecutor(
+            max_workers=execution.get('io_workers', 16),
+            thread_name_prefix='payerhub-io'
+        )
+        # producer.send() serializes the event and can block on metadata or a
+        # full buffer; one thread keeps it off the loop and events in order
+        self.publish_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='payerhub-kafka-send')
+        self.max_concurrent_documents = execution.get('max_concurrent_documents', 32)
+        self._document_slots: Optional[asyncio.Semaphore] = None
+        self._pending_events: Dict[str, List[asyncio.Future]] = {}
+        
         logger.info("PayerHub Orchestrator initialized")
     
     def _load_default_config(self) -> Dict[str, Any]:
@@ -45,12 +103,26 @@ class PayerHubOrchestrator:
         return {
             'ocr': {
                 'layoutlm_model': 'microsoft/layoutlmv3-base',
+                'layoutlm_backend': 'pytorch',
+                'layoutlm_artifact': 'models/layoutlmv3.onnx',
                 'use_gpu': True,
                 'use_s3': False,
-                's3_bucket': 'payerhub-documents'
+                's3_bucket': 'payerhub-documents',
+                'page_workers': 0,
+                'ocr_engine': 'auto',
+                'pdf_text_layer': True,
+                'cache': {
+                    'enabled': True,
+                    'backend': 'disk',
+                    'disk_dir': '/tmp/payerhub/ocr_cache',
+                    'ttl_seconds': 7 * 24 * 3600,
+                    'memory_entries': 256
+                }
             },
             'nlp': {
                 'biobert_model': 'dmis-lab/biobert-base-cased-v1.1',
+                'biobert_backend': 'pytorch',
+                'biobert_artifact': 'models/biobert.onnx',
                 'use_gpu': True
             },
             'anomaly': {
@@ -68,13 +140,60 @@ class PayerHubOrchestrator:
                 'db_name': 'payerhub',
                 'db_user': 'payerhub_user',
                 'db_password': 'secure_password',
-                'consent_duration_days': 365
+                'consent_duration_days': 365,
+                'consent_cache_redis_url': os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
+                'consent_cache_ttl_seconds': float(os.getenv('CONSENT_CACHE_TTL_SECONDS', '60'))
             },
             'kafka': {
                 'bootstrap_servers': ['localhost:9092']
+            },
+            'execution': {
+                'cpu_workers': min(4, os.cpu_count() or 1),
+                'process_stages': ['ocr'],
+                'io_workers': 16,
+                'max_concurrent_documents': 32,
+                'batch_window': 64
             }
         }
     
+    async def _run_cpu(self, stage: str, component: Any, method: str, *args):
+        """Run a CPU-bound stage in the process pool (or a thread if not delegated)"""
+        loop = asyncio.get_running_loop()
+        if self.cpu_pool and stage in self.process_stages:
+            return await loop.run_in_executor(
+                self.cpu_pool, _run_stage_in_worker, stage, method, *args
+            )
+        return await loop.run_in_executor(self.io_pool, getattr(component, method), *args)
+    
+    async def _run_io(self, func: Callable, *args, **kwargs):
+        """Run a blocking I/O call in the thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.io_pool, functools.partial(func, *args, **kwargs))
+    
+    def _publish_in_background(self, **event):
+        """
+        Publish an event without holding up the next stage
+        Delivery is settled by producer callbacks; pending deliveries are
+        awaited when the document finishes
+        """
+        pending = asyncio.ensure_future(self._publish(event))
+        self._pending_events.setdefault(event.get('correlation_id'), []).append(pending)
+    
+    async def _publish(self, event: Dict[str, Any]):
+        """Hand the event to the producer on publish_pool, then await its delivery"""
+        loop = asyncio.get_running_loop()
+        # A full outbox blocks the send thread until a slot frees up (backpressure)
+        delivery = await loop.run_in_executor(
+            self.publish_pool, functools.partial(self.kafka_handler.publish_event_async, **event)
+        )
+        return await asyncio.wrap_future(delivery)
+    
+    async def _drain_events(self, correlation_id: str):
+        """Wait for all pending event publishes of a document"""
+        pending = self._pending_events.pop(correlation_id, [])
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    
     async def process_document(
         self,
         file_path: str,
@@ -82,7 +201,8 @@ class PayerHubOrchestrator:
         patient_id: str,
         organization_id: str,
         user_id: str,
-        correlation_id: Optional[str] = None
+        correlation_id: Optional[str] = None,
+        document_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Process a document through the complete pipeline
@@ -98,31 +218,71 @@ class PayerHubOrchestrator:
         if not correlation_id:
             correlation_id = f"CORR-{uuid.uuid4()}"
         
+        if self._document_slots is None:
+            self._document_slots = asyncio.Semaphore(self.max_concurrent_documents)
+        
+        async with self._document_slots:
+            try:
+                return await self._process_document(
+                    file_path, document_type, patient_id,
+                    organization_id, user_id, correlation_id,
+                    document_id=document_id
+                )
+            finally:
+                await self._drain_events(correlation_id)
+    
+    async def _process_document(
+        self,
+        file_path: str,
+        document_type: str,
+        patient_id: str,
+        organization_id: str,
+        user_id: str,
+        correlation_id: str,
+        ocr_result=None,
+        entity_result=None,
+        document_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Run the pipeline for one document
+        The consent lookup does not depend on extracted data, so it runs
+        concurrently with entity extraction, anomaly detection and FHIR conversion;
+        the access itself is audited only when the document reaches step 5.
+        OCR and entity results computed ahead of time (batch mode) are reused.
+        """
         logger.info(f"Starting document processing pipeline (correlation_id: {correlation_id})")
         
         result = {
             'correlation_id': correlation_id,
-            'document_id': self._generate_document_id(),
+            'document_id': document_id or self._generate_document_id(),
             'status': 'processing',
             'steps': {}
         }
         
+        consent_task = None
+        
         try:
             # Step 1: OCR Processing
             logger.info("Step 1: OCR Processing")
-            ocr_result = await self._step_ocr_processing(
-                file_path, document_type, correlation_id
-            )
+            if ocr_result is None:
+                ocr_result = await self._step_ocr_processing(
+                    file_path, document_type, correlation_id
+                )
             result['steps']['ocr'] = {
                 'status': 'completed',
                 'confidence': ocr_result.confidence,
                 'document_type': ocr_result.document_type
             }
             
+            # Step 5 (started early): read-only consent lookup
+            consent_task = asyncio.ensure_future(self.privacy_manager.check_consent_async(
+                patient_id, organization_id, PRIVACY_PURPOSE, list(PRIVACY_SCOPE)
+            ))
+            
             # Step 2: Entity Extraction
             logger.info("Step 2: Entity Extraction")
             entity_result = await self._step_entity_extraction(
-                ocr_result.text, correlation_id
+                ocr_result.text, correlation_id, entity_result
             )
             result['steps']['entity_extraction'] = {
                 'status': 'completed',
@@ -165,7 +325,8 @@ class PayerHubOrchestrator:
             # Step 5: Privacy/Consent Check
             logger.info("Step 5: Privacy Check")
             privacy_result = await self._step_privacy_check(
-                patient_id, organization_id, user_id, correlation_id
+                patient_id, organization_id, user_id, correlation_id,
+                has_consent=await consent_task
             )
             result['steps']['privacy_check'] = {
                 'status': 'completed',
@@ -201,7 +362,7 @@ class PayerHubOrchestrator:
             result['error'] = str(e)
             
             # Publish error event
-            self.kafka_handler.publish_event(
+            self._publish_in_background(
                 event_type=EventType.ERROR_OCCURRED,
                 data={
                     'document_id': result['document_id'],
@@ -211,18 +372,178 @@ class PayerHubOrchestrator:
                 source='orchestrator',
                 correlation_id=correlation_id
             )
+        finally:
+            if consent_task is not None and not consent_task.done():
+                # Early exit (anomaly or failure): the lookup is no longer needed
+                consent_task.cancel()
+                consent_task.add_done_callback(
+                    lambda t: t.cancelled() or t.exception()
+                )
         
         return result
     
+    async def process_batch(
+        self,
+        documents: Iterable[Dict[str, Any]]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process many documents with cross-document model batching
+        
+        Each document is a dict with file_path, document_type, patient_id,
+        organization_id, user_id and optionally correlation_id. Documents are
+        taken in windows of `execution.batch_window`: OCR runs per document,
+        then LayoutLM pages and BioBERT texts from the whole window run as
+        length-sorted padded batches, and the remaining stages run per document.
+        Results are yielded as soon as each document completes, with the
+        window's batch utilisation under result['batch'].
+        """
+        window_size = self.config.get('execution', {}).get('batch_window', 64)
+        window: List[Dict[str, Any]] = []
+        window_index = 0
+        
+        for document in documents:
+            window.append(document)
+            if len(window) >= window_size:
+                async for result in self._process_window(window, window_index):
+                    yield result
+                window = []
+                window_index += 1
+        
+        if window:
+            async for result in self._process_window(window, window_index):
+                yield result
+    
+    async def _process_window(
+        self,
+        documents: List[Dict[str, Any]],
+        window_index: int
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run one batch window and yield per-document results as they finish
+        A failing batched model call falls back to per-document processing,
+        so one bad document cannot end the batch
+        """
+        # Copies: the caller's dicts are left as they were
+        documents = [
+            {**doc, 'correlation_id': doc.get('correlation_id') or f"CORR-{uuid.uuid4()}"}
+            for doc in documents
+        ]
+        
+        # Step 1: OCR per document, LayoutLM deferred for batching
+        ocr_results = await asyncio.gather(*[
+            self._step_ocr_processing(
+                doc['file_path'], doc['document_type'], doc['correlation_id'], defer_layout=True
+            )
+            for doc in documents
+        ], return_exceptions=True)
+        
+        ready = [i for i, r in enumerate(ocr_results) if not isinstance(r, BaseException)]
+        
+        # LayoutLM across all pages of the window
+        pages, owners = [], []
+        for i in ready:
+            for page in ocr_results[i].layout_inputs or []:
+                pages.append(page)
+                owners.append(i)
+        layout_stats = {}
+        if pages:
+            try:
+                page_fields, layout_stats = await self._run_io(
+                    self.ocr_processor.extract_structured_fields_layoutlm_batch, pages
+                )
+                for owner, fields in zip(owners, page_fields):
+                    ocr_results[owner].structured_fields.update(fields)
+            except Exception as e:
+                logger.error(f"Batched LayoutLM failed in window {window_index}, running per document: {e}")
+                layout_stats = {'fallback': str(e)}
+                for i in sorted(set(owners)):
+                    try:
+                        page_fields, _ = await self._run_io(
+                            self.ocr_processor.extract_structured_fields_layoutlm_batch,
+                            ocr_results[i].layout_inputs
+                        )
+                        for fields in page_fields:
+                            ocr_results[i].structured_fields.update(fields)
+                    except Exception as doc_error:
+                        ocr_results[i] = doc_error
+        ready = [i for i in ready if not isinstance(ocr_results[i], BaseException)]
+        for i in ready:
+            if ocr_results[i].layout_inputs is not None:
+                ocr_results[i].layout_inputs = None
+                self.ocr_processor.cache_result(ocr_results[i])
+        
+        # BioBERT/spaCy across all texts of the window; without it, each
+        # document extracts its own entities in _process_document
+        entity_by_doc, ner_stats = {}, {}
+        if ready:
+            try:
+                entity_results, ner_stats = await self._run_io(
+                    self.entity_extractor.extract_all_batch, [ocr_results[i].text for i in ready]
+                )
+                entity_by_doc = dict(zip(ready, entity_results))
+            except Exception as e:
+                logger.error(f"Batched entity extraction failed in window {window_index}, running per document: {e}")
+                ner_stats = {'fallback': str(e)}
+        
+        batch_info = {'window': window_index, 'documents': len(documents), 'layoutlm': layout_stats, 'ner': ner_stats}
+        logger.info(f"Batch window {window_index} utilisation: {batch_info}")
+        
+        async def finish(i: int) -> Dict[str, Any]:
+            doc = documents[i]
+            try:
+                if isinstance(ocr_results[i], BaseException):
+                    result = self._failed_result(doc['correlation_id'], ocr_results[i], 'ocr')
+                else:
+                    result = await self._process_document(
+                        doc['file_path'], doc['document_type'], doc['patient_id'],
+                        doc['organization_id'], doc['user_id'], doc['correlation_id'],
+                        ocr_result=ocr_results[i], entity_result=entity_by_doc.get(i)
+                    )
+            except Exception as e:
+                result = self._failed_result(doc['correlation_id'], e, 'pipeline')
+            finally:
+                await self._drain_events(doc['correlation_id'])
+            result['batch'] = batch_info
+            return result
+        
+        for next_done in asyncio.as_completed([finish(i) for i in range(len(documents))]):
+            yield await next_done
+        
+        # Checkpoint: make sure the window's events are on the broker
+        await self._run_io(self.kafka_handler.flush)
+    
+    def _failed_result(self, correlation_id: str, error: BaseException, step: str) -> Dict[str, Any]:
+        """Result of a document that failed before its pipeline ran, with its error event"""
+        logger.error(f"Pipeline failed at {step}: {error}")
+        result = {
+            'correlation_id': correlation_id,
+            'document_id': self._generate_document_id(),
+            'status': 'failed',
+            'error': str(error),
+            'steps': {}
+        }
+        self._publish_in_background(
+            event_type=EventType.ERROR_OCCURRED,
+            data={
+                'document_id': result['document_id'],
+                'error': str(error),
+                'step': step
+            },
+            source='orchestrator',
+            correlation_id=correlation_id
+        )
+        return result
+    
     async def _step_ocr_processing(
         self,
         file_path: str,
         document_type: str,
-        correlation_id: str
+        correlation_id: str,
+        defer_layout: bool = False
     ):
         """Step 1: OCR Processing"""
         # Publish event
-        self.kafka_handler.publish_event(
+        self._publish_in_background(
             event_type=EventType.DOCUMENT_RECEIVED,
             data={
                 'file_path': file_path,
@@ -236,14 +557,22 @@ class PayerHubOrchestrator:
         file_ext = Path(file_path).suffix.lower()
         
         if file_ext == '.pdf':
-            ocr_result = self.ocr_processor.process_pdf(file_path)
+            ocr_result = await self._run_cpu(
+                'ocr', self.ocr_processor, 'process_pdf', file_path, defer_layout, document_type
+            )
         elif file_ext in ['.jpg', '.jpeg', '.png', '.tiff']:
-            ocr_result = self.ocr_processor.process_image(file_path)
+            ocr_result = await self._run_cpu(
+                'ocr', self.ocr_processor, 'process_image', file_path, defer_layout, document_type
+            )
+        elif file_ext == '.txt':
+            ocr_result = await self._run_io(
+                self.ocr_processor.process_text_file, file_path
+            )
         else:
             raise ValueError(f"Unsupported file type: {file_ext}")
         
         # Publish completion event
-        self.kafka_handler.publish_event(
+        self._publish_in_background(
             event_type=EventType.OCR_COMPLETED,
             data={
                 'text': ocr_result.text[:500],  # Truncate for event
@@ -260,14 +589,18 @@ class PayerHubOrchestrator:
     async def _step_entity_extraction(
         self,
         text: str,
-        correlation_id: str
+        correlation_id: str,
+        entity_result=None
     ):
         """Step 2: Entity Extraction"""
-        # Extract entities
-        entity_result = self.entity_extractor.extract_all(text)
+        # Extract entities (unless already extracted in a batch)
+        if entity_result is None:
+            entity_result = await self._run_cpu(
+                'entity_extraction', self.entity_extractor, 'extract_all', text
+            )
         
         # Publish event
-        self.kafka_handler.publish_event(
+        self._publish_in_background(
             event_type=EventType.ENTITY_EXTRACTED,
             data={
                 'entities_count': len(entity_result.entities),
@@ -301,10 +634,12 @@ class PayerHubOrchestrator:
         }
         
         # Detect anomalies
-        anomaly_result = self.anomaly_detector.detect(data)
+        anomaly_result = await self._run_cpu(
+            'anomaly_detection', self.anomaly_detector, 'detect', data
+        )
         
         # Publish event
-        self.kafka_handler.publish_event(
+        self._publish_in_background(
             event_type=EventType.ANOMALY_DETECTED,
             data={
                 'is_anomaly': anomaly_result.is_anomaly,
@@ -335,10 +670,10 @@ class PayerHubOrchestrator:
         }
         
         # Convert to FHIR
-        fhir_result = self.fhir_mapper.convert_to_fhir(extracted_data)
+        fhir_result = await self._run_io(self.fhir_mapper.convert_to_fhir, extracted_data)
         
         # Publish event
-        self.kafka_handler.publish_event(
+        self._publish_in_background(
             event_type=EventType.FHIR_CONVERTED,
             data={
                 'resource_type': fhir_result.resource_type,
@@ -356,20 +691,22 @@ class PayerHubOrchestrator:
         patient_id: str,
         organization_id: str,
         user_id: str,
-        correlation_id: str
+        correlation_id: str,
+        has_consent: Optional[bool] = None
     ):
-        """Step 5: Privacy/Consent Check"""
+        """Step 5: Privacy/Consent Check (audits the access)"""
         # Check access
-        privacy_result = self.privacy_manager.check_access(
+        privacy_result = await self.privacy_manager.check_access_async(
             user_id=user_id,
             patient_id=patient_id,
             organization_id=organization_id,
-            purpose='treatment',
-            requested_scope=['full_access']
+            purpose=PRIVACY_PURPOSE,
+            requested_scope=list(PRIVACY_SCOPE),
+            has_consent=has_consent
         )
         
         # Publish event
-        self.kafka_handler.publish_event(
+        self._publish_in_background(
             event_type=EventType.PRIVACY_CHECKED,
             data={
                 'patient_id': patient_id,
@@ -400,7 +737,7 @@ class PayerHubOrchestrator:
         }
         
         # Publish event
-        self.kafka_handler.publish_event(
+        self._publish_in_background(
             event_type=EventType.HUB_UPDATED,
             data=hub_result,
             source='hub_integration',
@@ -430,8 +767,13 @@ class PayerHubOrchestrator:
     
     def close(self):
         """Close all connections"""
+        if self.cpu_pool:
+            self.cpu_pool.shutdown(wait=True)
+        self.io_pool.shutdown(wait=True)
+        self.publish_pool.shutdown(wait=True)
+        shutdown_page_pool()
         self.kafka_handler.close()
-        self.privacy_manager.db_conn.close()
+        self.privacy_manager.close()
         logger.info("Orchestrator closed")
 
 
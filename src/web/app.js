@@ -173,13 +173,16 @@ async function uploadDocument() {
 
         const result = await response.json();
 
-        if (response.ok && result.success) {
-            displayResults(result.data);
-            saveToRecentUploads(result.data);
-        } else {
-            throw new Error(result.error || 'Upload failed');
+        if (!response.ok || !result.success) {
+            throw new Error(result.error || result.detail || 'Upload failed');
         }
 
+        // Upload is accepted (202); the pipeline runs in the background
+        uploadButtonText.textContent = 'Processing...';
+        const status = await pollDocumentStatus(result.data.document_id, token);
+        displayResults(status);
+        saveToRecentUploads(status);
+
     } catch (error) {
         console.error('Upload error:', error);
         displayError(error.message);
@@ -189,6 +192,27 @@ async function uploadDocument() {
     }
 }
 
+// Poll job status until the pipeline finishes
+async function pollDocumentStatus(documentId, token, intervalMs = 2000, timeoutMs = 10 * 60 * 1000) {
+    const deadline = Date.now() + timeoutMs;
+
+    while (Date.now() < deadline) {
+        const response = await fetch(`${API_BASE_URL}/api/v1/documents/${documentId}/status`, {
+            headers: {
+                'Authorization': `Bearer ${token}`
+            }
+        });
+        const result = await response.json();
+
+        if (response.ok && result.success && !['queued', 'processing'].includes(result.data.status)) {
+            return result.data;
+        }
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+
+    throw new Error('Timed out waiting for document processing');
+}
+
 // Animate progress bar
 function animateProgress() {
     const progressFill = document.getElementById('progressFill');
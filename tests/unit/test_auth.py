@@ -0,0 +1,87 @@
+"""
+JWT verification: HS256, RS256 against a JWKS file, and the verified-token cache
+"""
+
+import json
+import time
+from datetime import timedelta
+
+import pytest
+
+jwt = pytest.importorskip('jwt')
+pytest.importorskip('fastapi')
+pytest.importorskip('cryptography')
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+
+from src.api.auth import AuthManager, VerifiedTokenCache
+
+SECRET = 'test-secret-of-at-least-32-bytes!'
+
+
+def rsa_key_pair(tmp_path, kid='key-1'):
+    """PEM private key, and a JWKS file with the public key under kid"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(key.public_key()))
+    jwk.update(kid=kid, alg='RS256', use='sig')
+    jwks_path = tmp_path / 'jwks.json'
+    jwks_path.write_text(json.dumps({'keys': [jwk]}))
+    return private_pem, str(jwks_path)
+
+
+def test_hs256_round_trip_is_cached():
+    auth = AuthManager(secret_key=SECRET)
+    token = auth.create_token('user-1', 'ORG1')
+    assert auth.verify_token(token)['org_id'] == 'ORG1'
+    assert auth.verify_token(token)['sub'] == 'user-1'
+    assert auth.cache.stats == {'hits': 1, 'misses': 1, 'evictions': 0}
+
+
+def test_expired_and_forged_tokens_are_rejected():
+    auth = AuthManager(secret_key=SECRET)
+    expired = auth.create_token('user-1', 'ORG1', expires_delta=timedelta(seconds=-1))
+    forged = AuthManager(secret_key=SECRET[::-1]).create_token('user-1', 'ORG1')
+    for token, detail in ((expired, 'Token expired'), (forged, 'Invalid token')):
+        with pytest.raises(HTTPException) as excinfo:
+            auth.verify_token(token)
+        assert excinfo.value.status_code == 401
+        assert excinfo.value.detail == detail
+
+
+def test_rs256_verified_against_jwks(tmp_path):
+    private_pem, jwks_path = rsa_key_pair(tmp_path)
+    issuer = AuthManager(algorithm='RS256', private_key=private_pem, key_id='key-1')
+    gateway = AuthManager(algorithm='RS256', jwks_path=jwks_path)
+    assert gateway.verify_token(issuer.create_token('user-1', 'ORG1'))['org_id'] == 'ORG1'
+    
+    unknown_kid = AuthManager(algorithm='RS256', private_key=private_pem, key_id='key-2')
+    with pytest.raises(HTTPException):
+        gateway.verify_token(unknown_kid.create_token('user-1', 'ORG1'))
+
+
+def test_hs256_token_refused_without_a_secret(tmp_path):
+    # Only algorithms with a configured key are accepted, whatever the header says
+    _, jwks_path = rsa_key_pair(tmp_path)
+    gateway = AuthManager(algorithm='RS256', jwks_path=jwks_path)
+    token = jwt.encode({'sub': 'user-1', 'org_id': 'ORG1'}, SECRET, algorithm='HS256')
+    with pytest.raises(HTTPException):
+        gateway.verify_token(token)
+
+
+def test_cache_entries_end_at_token_expiry_and_evict_lru():
+    cache = VerifiedTokenCache(max_entries=2)
+    cache.put('expired', {'exp': time.time() - 1})
+    assert cache.get('expired') is None
+    
+    cache.put('a', {'sub': 'a'})
+    cache.put('b', {'sub': 'b'})
+    cache.get('a')
+    cache.put('c', {'sub': 'c'})
+    assert cache.get('b') is None
+    assert cache.get('a') == {'sub': 'a'}
+    assert cache.stats['evictions'] == 1
@@ -0,0 +1,126 @@
+"""
+Batch windows: one failing document or batched model call must not end the window
+"""
+
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+orchestrator = pytest.importorskip('src.orchestrator')
+
+from src.infrastructure.kafka_handler import EventType
+
+
+class FakeOCR:
+    def __init__(self, fail_batch=False, bad_pages=()):
+        self.fail_batch = fail_batch
+        self.bad_pages = set(bad_pages)
+        self.cached = []
+    
+    def extract_structured_fields_layoutlm_batch(self, pages):
+        if self.fail_batch and len(pages) > 1 or self.bad_pages & set(pages):
+            raise RuntimeError('layoutlm failed')
+        return [{page: True} for page in pages], {'pages': len(pages)}
+    
+    def cache_result(self, result):
+        self.cached.append(result)
+
+
+class FakeNER:
+    def __init__(self, fail=False):
+        self.fail = fail
+    
+    def extract_all_batch(self, texts):
+        if self.fail:
+            raise RuntimeError('ner failed')
+        return [f"entities:{text}" for text in texts], {'texts': len(texts)}
+
+
+class FakeKafka:
+    def __init__(self):
+        self.events = []
+    
+    def publish_event_async(self, **event):
+        self.events.append(event)
+        delivered = Future()
+        delivered.set_result(None)
+        return delivered
+    
+    def flush(self):
+        pass
+
+
+def make_orchestrator(ocr, ner, failing_files=()):
+    orch = orchestrator.PayerHubOrchestrator.__new__(orchestrator.PayerHubOrchestrator)
+    orch.config = {'execution': {'batch_window': 8}}
+    orch.ocr_processor = ocr
+    orch.entity_extractor = ner
+    orch.kafka_handler = FakeKafka()
+    orch.io_pool = ThreadPoolExecutor(max_workers=2)
+    orch.publish_pool = ThreadPoolExecutor(max_workers=1)
+    orch._pending_events = {}
+    orch.seen = {}
+    
+    async def step_ocr(file_path, document_type, correlation_id, defer_layout=False):
+        if file_path in failing_files:
+            raise IOError(f"cannot read {file_path}")
+        return SimpleNamespace(text=file_path, layout_inputs=[f"{file_path}#p1"], structured_fields={})
+    
+    async def process_document(file_path, document_type, patient_id, organization_id, user_id,
+                               correlation_id, ocr_result=None, entity_result=None):
+        orch.seen[file_path] = (ocr_result.structured_fields, entity_result)
+        return {'correlation_id': correlation_id, 'status': 'completed'}
+    
+    orch._step_ocr_processing = step_ocr
+    orch._process_document = process_document
+    return orch
+
+
+def run_batch(orch, documents):
+    async def collect():
+        return [result async for result in orch.process_batch(documents)]
+    try:
+        return asyncio.run(collect())
+    finally:
+        orch.io_pool.shutdown()
+        orch.publish_pool.shutdown()
+
+
+def documents(*files):
+    return [
+        {'file_path': f, 'document_type': 'claim', 'patient_id': 'PAT1', 'organization_id': 'ORG1', 'user_id': 'u'}
+        for f in files
+    ]
+
+
+def test_unreadable_document_fails_alone():
+    orch = make_orchestrator(FakeOCR(), FakeNER(), failing_files={'b'})
+    docs = documents('a', 'b', 'c')
+    results = run_batch(orch, docs)
+    
+    by_status = sorted(result['status'] for result in results)
+    assert by_status == ['completed', 'completed', 'failed']
+    assert orch.seen['a'] == ({'a#p1': True}, 'entities:a')
+    errors = [e for e in orch.kafka_handler.events if e['event_type'] == EventType.ERROR_OCCURRED]
+    assert len(errors) == 1 and errors[0]['data']['step'] == 'ocr'
+    # The caller's documents are not modified
+    assert all('correlation_id' not in doc for doc in docs)
+
+
+def test_failed_layout_batch_falls_back_per_document():
+    orch = make_orchestrator(FakeOCR(fail_batch=True, bad_pages={'b#p1'}), FakeNER())
+    results = run_batch(orch, documents('a', 'b', 'c'))
+    
+    assert sorted(result['status'] for result in results) == ['completed', 'completed', 'failed']
+    assert orch.seen['c'][0] == {'c#p1': True}
+    assert 'fallback' in results[0]['batch']['layoutlm']
+
+
+def test_failed_entity_batch_leaves_extraction_to_each_document():
+    orch = make_orchestrator(FakeOCR(), FakeNER(fail=True))
+    results = run_batch(orch, documents('a', 'b'))
+    
+    assert [result['status'] for result in results] == ['completed', 'completed']
+    assert orch.seen['a'][1] is None and orch.seen['b'][1] is None
@@ -0,0 +1,63 @@
+"""
+ConsentDecisionCache (process-local, no Redis)
+"""
+
+import time
+from datetime import datetime, timedelta
+
+from src.core.privacy_layer.consent_cache import ConsentDecisionCache
+
+
+def store(cache, allowed=True, expiry_date=None, scope=('read', 'write'), patient='PAT1'):
+    generation = cache.generation(patient, 'ORG1')
+    cache.put(patient, 'ORG1', 'treatment', list(scope), allowed, expiry_date, generation)
+
+
+def test_hit_ignores_scope_order():
+    cache = ConsentDecisionCache()
+    store(cache)
+    assert cache.get('PAT1', 'ORG1', 'treatment', ['write', 'read']) is True
+    assert cache.get('PAT1', 'ORG1', 'treatment', ['read']) is None
+    assert cache.stats()['hit_ratio'] == 0.5
+
+
+def test_entry_never_outlives_consent_expiry():
+    cache = ConsentDecisionCache(ttl_seconds=60)
+    store(cache, expiry_date=datetime.now() + timedelta(seconds=0.05))
+    assert cache.get('PAT1', 'ORG1', 'treatment', ['read', 'write']) is True
+    time.sleep(0.1)
+    assert cache.get('PAT1', 'ORG1', 'treatment', ['read', 'write']) is None
+
+
+def test_invalidate_drops_patient_decisions():
+    cache = ConsentDecisionCache()
+    store(cache)
+    store(cache, patient='PAT2')
+    cache.invalidate('PAT1', 'ORG1')
+    assert cache.get('PAT1', 'ORG1', 'treatment', ['read', 'write']) is None
+    assert cache.get('PAT2', 'ORG1', 'treatment', ['read', 'write']) is True
+
+
+def test_decision_loaded_before_invalidation_is_not_stored():
+    cache = ConsentDecisionCache()
+    generation = cache.generation('PAT1', 'ORG1')
+    cache.invalidate('PAT1', 'ORG1')
+    cache.put('PAT1', 'ORG1', 'treatment', ['read'], True, None, generation)
+    assert cache.get('PAT1', 'ORG1', 'treatment', ['read']) is None
+
+
+def test_decision_loaded_before_clear_is_not_stored():
+    cache = ConsentDecisionCache()
+    # Nothing cached for PAT1 yet, so only the epoch can catch this
+    generation = cache.generation('PAT1', 'ORG1')
+    cache.clear()
+    cache.put('PAT1', 'ORG1', 'treatment', ['read'], True, None, generation)
+    assert cache.get('PAT1', 'ORG1', 'treatment', ['read']) is None
+
+
+def test_cache_bypassed_while_broadcast_channel_is_down():
+    cache = ConsentDecisionCache()
+    cache._redis = object()  # configured for broadcast but not subscribed
+    store(cache)
+    assert cache.get('PAT1', 'ORG1', 'treatment', ['read', 'write']) is None
+    assert cache.stats()['bypassed'] == 1
@@ -0,0 +1,181 @@
+"""
+ConsumerRuntime offset handling (no broker: fake producer, lanes called directly)
+"""
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('kafka')
+pytest.importorskip('avro')
+
+from kafka import TopicPartition
+
+from src.infrastructure.consumer_runtime import ConsumerRuntime, PartitionOffsetTracker
+from src.infrastructure.event_serialization import EventCodec, SchemaRegistry
+from src.infrastructure.kafka_handler import KafkaEventHandler, EventType
+
+TP = TopicPartition('payerhub.ocr.processing', 0)
+
+
+class FakeSend:
+    def __init__(self, error=None):
+        self.error = error
+    
+    def get(self, timeout=None):
+        if self.error:
+            raise self.error
+        return SimpleNamespace(partition=0, offset=0)
+
+
+class FakeProducer:
+    """Sends fail until `failures` sends have failed (forever with None)"""
+    
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sent = []
+    
+    def send(self, topic, value=None, key=None):
+        self.sent.append((topic, value))
+        if self.failures is None or self.failures > 0:
+            if self.failures:
+                self.failures -= 1
+            return FakeSend(TimeoutError("broker unavailable"))
+        return FakeSend()
+
+
+def make_handler(tmp_path, dlq_failures=0):
+    handler = KafkaEventHandler.__new__(KafkaEventHandler)
+    handler.codec = EventCodec('json', SchemaRegistry(str(tmp_path / 'registry.json')))
+    handler.producer = FakeProducer(failures=dlq_failures)
+    handler.topics = {'dead_letter': 'payerhub.dead_letter'}
+    handler.event_handlers = {}
+    handler.batch_event_handlers = {}
+    handler.dlq_timeout = 1.0
+    return handler
+
+
+def make_record(handler, offset, value=None):
+    if value is None:
+        value = handler.codec.encode({
+            'event_id': f"EVT-{offset}", 'event_type': EventType.OCR_COMPLETED.value,
+            'timestamp': '2024-01-01T00:00:00', 'source': 'test', 'correlation_id': None,
+            'metadata': {}, 'data': {'document_id': f"DOC-{offset}"}
+        })
+    return SimpleNamespace(topic=TP.topic, partition=TP.partition, offset=offset, key=None, value=value)
+
+
+def process(handler, records, release_after=None):
+    runtime = ConsumerRuntime(handler, [TP.topic], 'test-group', retry_backoff=0.01, max_retry_backoff=0.02)
+    tracker = runtime._trackers[TP] = PartitionOffsetTracker()
+    release = runtime._released[TP] = threading.Event()
+    for record in records:
+        tracker.started(record.offset)
+    if release_after is not None:
+        threading.Timer(release_after, release.set).start()
+    runtime._process_records(TP, records)
+    return runtime, tracker
+
+
+def test_tracker_commits_below_lowest_in_flight():
+    tracker = PartitionOffsetTracker()
+    for offset in (10, 11, 12):
+        tracker.started(offset)
+    tracker.finished(10)
+    tracker.finished(12)
+    assert tracker.commit_offset() == 11
+    tracker.finished(11)
+    assert tracker.commit_offset() == 13
+
+
+def test_handled_records_are_committable(tmp_path):
+    handler = make_handler(tmp_path)
+    seen = []
+    handler.event_handlers[EventType.OCR_COMPLETED] = [lambda event: seen.append(event.event_id)]
+    runtime, tracker = process(handler, [make_record(handler, 0), make_record(handler, 1)])
+    assert seen == ['EVT-0', 'EVT-1']
+    assert tracker.commit_offset() == 2
+    assert runtime._counters['processed'] == 2
+
+
+def test_failed_handler_is_committed_after_dead_letter_ack(tmp_path):
+    handler = make_handler(tmp_path)
+    handler.event_handlers[EventType.OCR_COMPLETED] = [lambda event: 1 / 0]
+    runtime, tracker = process(handler, [make_record(handler, 0)])
+    assert tracker.commit_offset() == 1
+    assert runtime._counters['dead_lettered'] == 1
+    assert handler.producer.sent[0][0] == 'payerhub.dead_letter'
+
+
+def test_failed_dead_letter_is_retried_until_acknowledged(tmp_path):
+    handler = make_handler(tmp_path, dlq_failures=3)
+    handler.event_handlers[EventType.OCR_COMPLETED] = [lambda event: 1 / 0]
+    runtime, tracker = process(handler, [make_record(handler, 0), make_record(handler, 1)])
+    assert tracker.commit_offset() == 2
+    assert tracker.in_flight == 0
+    assert runtime._counters['failed'] == 2  # two dispatch attempts had an unacknowledged dead letter
+    assert runtime._counters['dead_lettered'] == 2
+
+
+def test_records_released_while_retrying_are_not_committed(tmp_path):
+    handler = make_handler(tmp_path, dlq_failures=None)
+    handler.event_handlers[EventType.OCR_COMPLETED] = [lambda event: 1 / 0]
+    runtime, tracker = process(handler, [make_record(handler, 0), make_record(handler, 1)], release_after=0.1)
+    assert tracker.commit_offset() == 0
+    assert runtime._counters['processed'] == 0
+
+
+def test_undecodable_record_is_dead_lettered(tmp_path):
+    handler = make_handler(tmp_path)
+    runtime, tracker = process(handler, [make_record(handler, 0, value=b'\x00garbage'), make_record(handler, 1)])
+    assert tracker.commit_offset() == 2
+    assert 'original_record' in handler.producer.sent[0][1]
+    assert runtime._counters['dead_lettered'] == 1
+
+
+def test_undecodable_record_released_while_retrying_is_not_committed(tmp_path):
+    handler = make_handler(tmp_path, dlq_failures=None)
+    runtime, tracker = process(
+        handler, [make_record(handler, 0, value=b'not json'), make_record(handler, 1)], release_after=0.1
+    )
+    assert tracker.commit_offset() == 0
+
+
+def test_failing_records_stop_holding_backpressure_once_retried(tmp_path):
+    handler = make_handler(tmp_path, dlq_failures=2)
+    runtime = ConsumerRuntime(handler, [TP.topic], 'test-group', max_in_flight=2, retry_backoff=0.01)
+    runtime.consumer = SimpleNamespace(
+        assignment=lambda: {TP}, paused=lambda: {TP},
+        pause=lambda *tps: None, resume=lambda *tps: None
+    )
+    runtime._dispatch_partition(TP, [make_record(handler, 0, value=b'not json'), make_record(handler, 1, value=b'bad')])
+    runtime._apply_backpressure()
+    assert runtime._paused
+    runtime._shutdown_lanes([TP])  # waits for the lane to finish its retries
+    runtime._apply_backpressure()
+    assert not runtime._paused
+    assert runtime._trackers[TP].commit_offset() == 2
+
+
+def test_batch_failure_dead_letters_each_event_once(tmp_path):
+    handler = make_handler(tmp_path)
+    seen = []
+    
+    def failing_batch(events):
+        raise RuntimeError('batch failed')
+    
+    handler.batch_event_handlers[EventType.OCR_COMPLETED] = [failing_batch]
+    handler.event_handlers[EventType.OCR_COMPLETED] = [lambda event: seen.append(event.event_id), lambda event: 1 / 0]
+    runtime, tracker = process(handler, [make_record(handler, 0), make_record(handler, 1)])
+    assert seen == []
+    assert [value['original_event']['event_id'] for _, value in handler.producer.sent] == ['EVT-0', 'EVT-1']
+    assert runtime._counters['dead_lettered'] == 2
+
+
+def test_event_failing_several_handlers_is_dead_lettered_once(tmp_path):
+    handler = make_handler(tmp_path)
+    handler.event_handlers[EventType.OCR_COMPLETED] = [lambda event: 1 / 0, lambda event: {}['missing']]
+    process(handler, [make_record(handler, 0)])
+    [(_, dead_letter)] = handler.producer.sent
+    assert 'division by zero' in dead_letter['error'] and 'missing' in dead_letter['error']
@@ -0,0 +1,87 @@
+"""
+Single-pass field extraction against a pattern-by-pattern re.search reference
+"""
+
+import re
+
+import pytest
+
+from src.core.ai_pipeline import field_extraction
+from src.core.ai_pipeline.field_extraction import FIELD_RULES, FieldExtractor, FieldRule, extract_document_fields
+
+
+SAMPLE = """Patient Name: John Smith
+Member ID: ABC-12345
+DOB: 01/02/1980
+Phone: (555) 123-4567
+Insurance Company: Blue Cross
+Policy Number: POL-9
+Group: GRP42
+Diagnosis: Type two diabetes
+CPT Code: 99213
+Physician: Dr. Jane Doe
+"""
+
+
+def reference(text, rules=FIELD_RULES):
+    """First pattern (in priority order) that matches anywhere, like re.search per pattern"""
+    results = {}
+    for rule in rules:
+        results.setdefault(rule.group, {})
+        for pattern in rule.patterns:
+            match = re.search(pattern, text, re.IGNORECASE)
+            if match:
+                value = match.group(1).strip()
+                if rule.clean:
+                    value = re.sub(r'\s+', ' ', re.sub(r'\s*\n.*$', '', value))
+                results[rule.group][rule.name] = value
+                break
+    return results
+
+
+def test_matches_reference_on_sample():
+    fields = extract_document_fields(SAMPLE)
+    assert fields == reference(SAMPLE)
+    assert fields['patient']['patient_name'] == 'John Smith'
+    assert fields['clinical']['cpt_code'] == '99213'
+
+
+def test_lower_priority_pattern_earlier_in_text_loses():
+    text = "Name: Early Bird\nlater on\nPatient Name: Right Person\n"
+    assert extract_document_fields(text)['patient']['patient_name'] == 'Right Person'
+    assert extract_document_fields(text) == reference(text)
+
+
+def test_non_ascii_text_matches_reference():
+    text = "Notes: café visit\n" + SAMPLE
+    assert extract_document_fields(text) == reference(text)
+
+
+def test_keyword_straddling_chunk_boundary(monkeypatch):
+    monkeypatch.setattr(field_extraction, 'SCAN_CHUNK_CHARS', 16)
+    text = 'x' * 13 + SAMPLE
+    assert FieldExtractor(FIELD_RULES).extract(text) == reference(text)
+
+
+def test_requested_groups_only():
+    fields = field_extraction.field_extractor.extract(SAMPLE, groups=['insurance'])
+    assert list(fields) == ['insurance']
+    assert fields['insurance']['policy_number'] == 'POL-9'
+
+
+def test_pattern_without_leading_keyword_is_rejected():
+    with pytest.raises(ValueError):
+        FieldExtractor([FieldRule('patient', 'anything', [r'(\d+)'])])
+
+
+def test_entity_extractor_adds_labelled_fields():
+    entity_extractor = pytest.importorskip('src.core.ai_pipeline.entity_extractor')
+    extractor = entity_extractor.EntityExtractor.__new__(entity_extractor.EntityExtractor)
+    extractor.patterns = extractor._compile_patterns()
+    result = extractor._build_result(SAMPLE, [])
+    assert result.patient_info['patient_name'] == 'John Smith'
+    assert result.patient_info['date_of_birth'] == '01/02/1980'
+    assert result.insurance_info['group_number'] == 'GRP42'
+    assert result.clinical_info['provider_name'] == 'Dr. Jane Doe'
+    # Values found by the generic patterns are kept
+    assert result.insurance_info['member_id'] == 'ABC-12345'
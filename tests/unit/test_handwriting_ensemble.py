@@ -0,0 +1,48 @@
+"""
+Adaptive handwriting ensemble: early exit does not wait for running candidates
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+handwriting_ocr = pytest.importorskip('src.core.ai_pipeline.handwriting_ocr')
+
+
+def test_early_exit_returns_without_waiting_for_running_candidates(tmp_path, monkeypatch):
+    monkeypatch.setattr(handwriting_ocr, 'PREPROCESSING_TECHNIQUES', {'plain': lambda gray: gray, 'inverted': lambda gray: gray})
+    monkeypatch.setattr(handwriting_ocr, 'ENSEMBLE_PSM_CONFIGS', ['--psm 6', '--psm 4'])
+    monkeypatch.setattr(handwriting_ocr, 'Image', SimpleNamespace(Image=object, fromarray=lambda array: array))
+    
+    ocr = handwriting_ocr.HandwritingOCRProcessor.__new__(handwriting_ocr.HandwritingOCRProcessor)
+    ocr.early_exit_confidence = 80
+    ocr.sequential_candidates = 0
+    ocr.win_stats = handwriting_ocr.EnsembleWinStats(str(tmp_path / 'stats.json'))
+    ocr.executor = ThreadPoolExecutor(max_workers=4)
+    ocr._to_gray = lambda image: image
+    
+    slow_done = threading.Event()
+    
+    def ocr_candidate(image, technique, config):
+        if (technique, config) == ('plain', '--psm 6'):
+            return 'text', 95.0, technique, config, None
+        slow_done.wait(5)
+        return 'slow', 50.0, technique, config, None
+    
+    ocr._ocr_candidate = ocr_candidate
+    
+    start = time.monotonic()
+    text, confidence, winner, _ = ocr.extract_text_adaptive('image')
+    elapsed = time.monotonic() - start
+    slow_done.set()
+    ocr.executor.shutdown(wait=True)
+    
+    assert (text, confidence, winner) == ('text', 0.95, ['plain_--psm 6'])
+    assert elapsed < 2
+    # The stragglers' trials are still counted once they finish
+    trials = {key: entry['trials'] for key, entry in ocr.win_stats._stats.items()}
+    assert sum(trials.values()) == 4
+    assert ocr.win_stats._stats['plain|--psm 6']['wins'] == 1
@@ -0,0 +1,43 @@
+"""
+ModelRegistry loading, sharing and unloading
+"""
+
+import threading
+import time
+
+from src.core.ai_pipeline.model_registry import ModelRegistry
+
+
+def test_loaded_once_and_shared():
+    registry = ModelRegistry()
+    loads = []
+    registry.register('model:cpu', lambda: loads.append(1) or object())
+    assert registry.get('model:cpu') is registry.get('model:cpu')
+    assert len(loads) == 1
+    
+    assert registry.unload('model:cpu')
+    assert not registry.is_loaded('model:cpu')
+    registry.get('model:cpu')
+    assert len(loads) == 2
+
+
+def test_get_never_returns_none_while_unloading():
+    registry = ModelRegistry()
+    registry.register('model:cpu', object)
+    stop = threading.Event()
+    
+    def unload_repeatedly():
+        while not stop.is_set():
+            registry.unload('model:cpu')
+    
+    unloader = threading.Thread(target=unload_repeatedly)
+    unloader.start()
+    try:
+        deadline = time.monotonic() + 0.5
+        misses = 0
+        while time.monotonic() < deadline:
+            misses += registry.get('model:cpu') is None
+    finally:
+        stop.set()
+        unloader.join()
+    assert misses == 0
@@ -0,0 +1,86 @@
+"""
+OCR result cache: TTLs across tiers and the config that forms the key
+"""
+
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.core.ai_pipeline.ocr_cache import OCRResultCache
+
+TTL = 3600
+
+
+def disk_cache(tmp_path, **config):
+    return OCRResultCache({'backend': 'disk', 'disk_dir': str(tmp_path / 'cache'), 'ttl_seconds': TTL, **config})
+
+
+def memory_expiry(cache, key):
+    return cache._memory[key][0]
+
+
+def test_disk_hit_keeps_its_remaining_ttl_in_memory(tmp_path):
+    writer = disk_cache(tmp_path)
+    writer.put('k', {'text': 'hello'})
+    path = writer._disk_path('k')
+    written = time.time() - (TTL - 60)
+    os.utime(path, (written, written))
+    
+    reader = disk_cache(tmp_path)
+    assert reader.get('k') == {'text': 'hello'}
+    assert memory_expiry(reader, 'k') == pytest.approx(written + TTL, abs=1)
+    # Reading does not move the write time, so the entry still expires on schedule
+    assert path.stat().st_mtime == pytest.approx(written, abs=1)
+
+
+def test_expired_disk_entry_is_a_miss(tmp_path):
+    cache = disk_cache(tmp_path)
+    cache.put('k', {'text': 'hello'})
+    written = time.time() - TTL - 1
+    os.utime(cache._disk_path('k'), (written, written))
+    assert disk_cache(tmp_path).get('k') is None
+
+
+def test_prune_drops_least_recently_read_first(tmp_path):
+    cache = disk_cache(tmp_path, disk_max_bytes=50)
+    now = time.time()
+    for i, key in enumerate(('old', 'read', 'new')):
+        cache.put(key, {'text': 'x' * 20})
+        os.utime(cache._disk_path(key), (now - 300 + i, now - 300 + i))
+    disk_cache(tmp_path).get('old')
+    cache.prune_disk()
+    assert cache._disk_path('old').exists()
+    assert not cache._disk_path('read').exists()
+
+
+def test_redis_hit_keeps_its_remaining_ttl_in_memory():
+    fakeredis = pytest.importorskip('fakeredis')
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    writer = OCRResultCache({'backend': 'redis', 'ttl_seconds': TTL}, redis_client=client)
+    writer.put('k', {'text': 'hello'})
+    client.expire('ocr_cache:k', 60)
+    
+    reader = OCRResultCache({'backend': 'redis', 'ttl_seconds': TTL}, redis_client=client)
+    assert reader.get('k') == {'text': 'hello'}
+    assert memory_expiry(reader, 'k') == pytest.approx(time.time() + 60, abs=2)
+
+
+def test_tuning_knobs_do_not_change_the_cache_key(tmp_path):
+    ocr_processor = pytest.importorskip('src.core.ai_pipeline.ocr_processor')
+    document = tmp_path / 'doc.png'
+    document.write_bytes(b'image bytes')
+    
+    def key_for(config):
+        processor = ocr_processor.OCRProcessor.__new__(ocr_processor.OCRProcessor)
+        processor.config = config
+        processor.cache = disk_cache(tmp_path)
+        processor.model_version = 'layoutlm@main'
+        processor.preprocessor = SimpleNamespace(chain_for=lambda document_type: ['deskew'], options={'block_size': 31})
+        return processor._cache_lookup(str(document), None)[0]
+    
+    base = key_for({'pdf_dpi': 300})
+    assert key_for({'pdf_dpi': 300, 'page_workers': 8, 'page_max_in_flight': 4, 'cache': {'ttl_seconds': 60}}) == base
+    assert key_for({'pdf_dpi': 200}) != base
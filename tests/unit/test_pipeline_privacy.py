@@ -0,0 +1,99 @@
+"""
+Consent lookup overlaps the pipeline; the access is audited only at step 5
+"""
+
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+orchestrator = pytest.importorskip('src.orchestrator')
+
+from src.infrastructure.kafka_handler import EventType
+
+
+class FakePrivacyManager:
+    def __init__(self):
+        self.lookup_started = asyncio.Event()
+        self.audited = []
+    
+    async def check_consent_async(self, patient_id, organization_id, purpose, requested_scope):
+        self.lookup_started.set()
+        return True
+    
+    async def check_access_async(self, has_consent=None, **access):
+        self.audited.append(dict(access, has_consent=has_consent))
+        return SimpleNamespace(
+            allowed=has_consent, access_level=SimpleNamespace(value='full'),
+            audit_log_id='AUDIT-1', reason=''
+        )
+
+
+class FakeKafka:
+    def __init__(self):
+        self.events = []
+    
+    def publish_event_async(self, **event):
+        self.events.append(event)
+        delivered = Future()
+        delivered.set_result(None)
+        return delivered
+
+
+def run_pipeline(is_anomaly):
+    orch = orchestrator.PayerHubOrchestrator.__new__(orchestrator.PayerHubOrchestrator)
+    orch.kafka_handler = FakeKafka()
+    orch.publish_pool = ThreadPoolExecutor(max_workers=1)
+    orch._pending_events = {}
+    
+    async def step_ocr(file_path, document_type, correlation_id):
+        return SimpleNamespace(text='text', confidence=0.9, document_type=document_type)
+    
+    async def step_entities(text, correlation_id, entity_result=None):
+        # Only completes if the consent lookup runs alongside it
+        await asyncio.wait_for(orch.privacy_manager.lookup_started.wait(), timeout=5)
+        return SimpleNamespace(entities=[], patient_info={}, insurance_info={})
+    
+    async def step_anomaly(ocr_result, entity_result, document_type, correlation_id):
+        return SimpleNamespace(is_anomaly=is_anomaly, anomaly_type='missing_fields', issues=[])
+    
+    async def step_fhir(entity_result, document_type, correlation_id):
+        return SimpleNamespace(resource_type='Claim', resource_id='C1', validation_status='valid')
+    
+    async def step_hub(fhir_result, privacy_result, correlation_id):
+        return {'record_id': 'HUB-1'}
+    
+    orch._step_ocr_processing = step_ocr
+    orch._step_entity_extraction = step_entities
+    orch._step_anomaly_detection = step_anomaly
+    orch._step_fhir_conversion = step_fhir
+    orch._step_hub_update = step_hub
+    
+    async def scenario():
+        orch.privacy_manager = FakePrivacyManager()
+        result = await orch._process_document('doc.pdf', 'claim', 'PAT1', 'ORG1', 'user-1', 'CORR-1')
+        await orch._drain_events('CORR-1')
+        return result
+    
+    try:
+        return orch, asyncio.run(scenario())
+    finally:
+        orch.publish_pool.shutdown()
+
+
+def test_document_stopped_by_anomaly_is_not_audited():
+    orch, result = run_pipeline(is_anomaly=True)
+    assert result['status'] == 'manual_review_required'
+    assert orch.privacy_manager.audited == []
+    assert all(e['event_type'] != EventType.PRIVACY_CHECKED for e in orch.kafka_handler.events)
+
+
+def test_access_audited_once_with_the_early_consent_decision():
+    orch, result = run_pipeline(is_anomaly=False)
+    assert result['status'] == 'completed'
+    assert result['steps']['privacy_check']['audit_log_id'] == 'AUDIT-1'
+    [audit] = orch.privacy_manager.audited
+    assert audit['has_consent'] is True and audit['patient_id'] == 'PAT1'
+    checked = [e for e in orch.kafka_handler.events if e['event_type'] == EventType.PRIVACY_CHECKED]
+    assert len(checked) == 1
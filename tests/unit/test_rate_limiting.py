@@ -0,0 +1,87 @@
+"""
+Token bucket limiter: limit parsing, local buckets and the Redis Lua script
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip('fastapi')
+
+from fastapi import HTTPException
+
+from src.api.rate_limiting import RateLimit, LocalTokenBucket, TokenBucketLimiter
+
+
+def test_parse_limits():
+    assert RateLimit.parse('10/minute') == RateLimit(10, 60.0)
+    assert RateLimit.parse(' 100 / hours ') == RateLimit(100, 3600.0)
+    assert RateLimit.parse('5/second').rate == 5.0
+    for spec in ('0/minute', 'ten/minute', '10/fortnight', '10'):
+        with pytest.raises(ValueError):
+            RateLimit.parse(spec)
+
+
+def test_local_bucket_refills_over_time():
+    bucket = LocalTokenBucket(RateLimit(2, 2.0))
+    start = bucket.updated
+    for _ in range(2):
+        assert bucket.wait_time(start) == 0.0
+        bucket.take()
+    assert bucket.wait_time(start) == pytest.approx(1.0)
+    assert bucket.wait_time(start + 1.0) == 0.0
+
+
+def test_local_fallback_is_all_or_nothing():
+    limiter = TokenBucketLimiter()
+    per_route, per_user = RateLimit(5, 60), RateLimit(1, 60)
+    
+    async def scenario():
+        first = await limiter.acquire([('route:a', per_route), ('user:u', per_user)])
+        second = await limiter.acquire([('route:a', per_route), ('user:u', per_user)])
+        return first, second
+    
+    first, second = asyncio.run(scenario())
+    assert first.allowed and first.source == 'local'
+    assert not second.allowed and second.retry_after > 0
+    # The refused request took nothing from the route bucket
+    assert limiter._local['route:a'].tokens == pytest.approx(4, abs=0.01)
+
+
+def test_check_raises_429_with_retry_after():
+    limiter = TokenBucketLimiter()
+    limit = RateLimit(1, 60)
+    
+    async def scenario():
+        await limiter.check([('k', limit)])
+        await limiter.check([('k', limit)])
+    
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(scenario())
+    assert excinfo.value.status_code == 429
+    assert int(excinfo.value.headers['Retry-After']) >= 1
+
+
+def test_disabled_limiter_allows_everything():
+    limiter = TokenBucketLimiter(enabled=False)
+    decision = asyncio.run(limiter.acquire([('k', RateLimit(1, 60))] * 3))
+    assert decision.allowed
+
+
+def test_redis_script_never_over_admits():
+    fakeredis = pytest.importorskip('fakeredis')
+    pytest.importorskip('lupa')
+    
+    async def scenario():
+        # Two processes sharing one bucket of 50
+        limiters = [TokenBucketLimiter(lease_fraction=0.2, max_lease=10) for _ in range(2)]
+        server = fakeredis.FakeServer()
+        for limiter in limiters:
+            limiter.bind_redis(fakeredis.FakeAsyncRedis(server=server))
+        limit = RateLimit(50, 3600)
+        decisions = [await limiters[i % 2].acquire([('shared', limit)]) for i in range(80)]
+        return decisions
+    
+    decisions = asyncio.run(scenario())
+    assert sum(d.allowed for d in decisions) == 50
+    assert all(d.source in ('redis', 'lease') for d in decisions)
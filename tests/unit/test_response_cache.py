@@ -0,0 +1,67 @@
+"""
+ResponseCache on its process-local tier
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip('redis')
+
+from src.api.cache import CacheFamily, ResponseCache
+
+FAMILIES = {'items': CacheFamily('items', ttl_seconds=60, negative_ttl_seconds=60, shared=False)}
+
+
+def test_concurrent_misses_share_one_load():
+    cache = ResponseCache(families=FAMILIES)
+    loads = []
+    
+    async def loader():
+        loads.append(1)
+        await asyncio.sleep(0.01)
+        return {'value': 1}
+    
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_load('items', 'a', loader) for _ in range(5)))
+    
+    assert asyncio.run(scenario()) == [{'value': 1}] * 5
+    assert len(loads) == 1
+    assert cache.stats()['items']['coalesced'] == 4
+
+
+def test_negative_result_is_cached():
+    cache = ResponseCache(families=FAMILIES)
+    loads = []
+    
+    async def loader():
+        loads.append(1)
+        return None
+    
+    async def scenario():
+        await cache.get_or_load('items', 'missing', loader)
+        return await cache.get_or_load('items', 'missing', loader)
+    
+    assert asyncio.run(scenario()) is None
+    assert len(loads) == 1
+    assert cache.stats()['items']['negative_hits'] == 1
+
+
+def test_invalidation_during_load_is_not_overwritten():
+    cache = ResponseCache(families=FAMILIES)
+    version = {'current': 'old'}
+    
+    async def loader():
+        value = version['current']
+        await asyncio.sleep(0.01)
+        return value
+    
+    async def scenario():
+        load = asyncio.ensure_future(cache.get_or_load('items', 'a', loader))
+        await asyncio.sleep(0)
+        version['current'] = 'new'
+        await cache.invalidate('items', 'a')
+        assert await load == 'old'
+        return await cache.get_or_load('items', 'a', loader)
+    
+    assert asyncio.run(scenario()) == 'new'
@@ -0,0 +1,129 @@
+"""
+Upload limits, MIME sniffing, streamed storage and the body size middleware
+"""
+
+import asyncio
+import hashlib
+import io
+
+import pytest
+
+pytest.importorskip('fastapi')
+
+from fastapi import HTTPException, UploadFile
+
+from src.api.uploads import UploadLimits, UploadSizeLimitMiddleware, sniff_mime_type, store_upload
+
+MB = 1024 * 1024
+PDF = b'%PDF-1.7\n' + b'x' * 100
+
+
+def test_tenant_limits_override_default():
+    limits = UploadLimits(default_mb=50, tenant_limits_mb=' ORG1=200, ORG2=0.5 ,')
+    assert limits.for_tenant('ORG1') == 200 * MB
+    assert limits.for_tenant('ORG2') == MB // 2
+    assert limits.for_tenant('OTHER') == 50 * MB
+    assert limits.for_tenant(None) == 50 * MB
+
+
+def test_limits_read_from_environment(monkeypatch):
+    monkeypatch.setenv('MAX_UPLOAD_SIZE_MB', '10')
+    monkeypatch.setenv('TENANT_UPLOAD_LIMITS_MB', 'ORG1=1')
+    limits = UploadLimits()
+    assert limits.default_bytes == 10 * MB
+    assert limits.for_tenant('ORG1') == MB
+
+
+def test_sniff_mime_type():
+    assert sniff_mime_type(b'%PDF-1.7\n') == 'application/pdf'
+    assert sniff_mime_type(b'\x89PNG\r\n\x1a\n....') == 'image/png'
+    assert sniff_mime_type(b'MM\x00*rest') == 'image/tiff'
+    assert sniff_mime_type(b'Patient Name: John Smith\n') == 'text/plain'
+    # A multi-byte character cut off by the sample boundary is still text
+    assert sniff_mime_type('Café'.encode('utf-8')[:-1]) == 'text/plain'
+    assert sniff_mime_type(b'\xff\xfe\x00binary') == 'application/octet-stream'
+
+
+def store(data, destination, max_bytes=MB):
+    upload = UploadFile(file=io.BytesIO(data), filename=destination.name)
+    return asyncio.run(store_upload(upload, destination, max_bytes, chunk_size=16))
+
+
+def test_store_upload_hashes_and_sniffs(tmp_path):
+    stored = store(PDF, tmp_path / 'doc' / 'claim.pdf')
+    assert (tmp_path / 'doc' / 'claim.pdf').read_bytes() == PDF
+    assert stored.size_bytes == len(PDF)
+    assert stored.sha256 == hashlib.sha256(PDF).hexdigest()
+    assert stored.mime_type == 'application/pdf'
+
+
+@pytest.mark.parametrize('data, name, max_bytes, status', [
+    (PDF, 'claim.pdf', 64, 413),             # over the limit part-way through
+    (PDF, 'claim.exe', MB, 415),             # extension not accepted
+    (b'\x89PNG\r\n\x1a\n' + b'x' * 20, 'claim.pdf', MB, 415),  # content does not match
+    (b'', 'claim.pdf', MB, 400),             # empty file
+])
+def test_rejected_upload_leaves_nothing_on_disk(tmp_path, data, name, max_bytes, status):
+    with pytest.raises(HTTPException) as excinfo:
+        store(data, tmp_path / name, max_bytes)
+    assert excinfo.value.status_code == status
+    assert list(tmp_path.iterdir()) == []
+
+
+def call_middleware(tenant_limits, headers, body_chunks):
+    """Run an upload request through the middleware; (status, app body length read)"""
+    read = []
+    sent = []
+    
+    async def app(scope, receive, send):
+        while True:
+            message = await receive()
+            read.append(len(message.get('body', b'')))
+            if not message.get('more_body'):
+                break
+        await send({'type': 'http.response.start', 'status': 202, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+    
+    middleware = UploadSizeLimitMiddleware(
+        app,
+        limits=UploadLimits(default_mb=1, tenant_limits_mb=tenant_limits),
+        tenant_of={'token-small': 'SMALL', 'token-big': 'BIG'}.get,
+        overhead_bytes=0
+    )
+    messages = [
+        {'type': 'http.request', 'body': chunk, 'more_body': i < len(body_chunks) - 1}
+        for i, chunk in enumerate(body_chunks)
+    ]
+    
+    async def receive():
+        return messages.pop(0)
+    
+    async def send(message):
+        sent.append(message)
+    
+    scope = {'type': 'http', 'path': '/api/v1/documents/upload', 'headers': headers}
+    asyncio.run(middleware(scope, receive, send))
+    return sent[0]['status'], sum(read)
+
+
+def test_middleware_refuses_declared_length_over_tenant_limit():
+    headers = [(b'authorization', b'Bearer token-small'), (b'content-length', str(MB).encode())]
+    status, read = call_middleware('SMALL=0.5,BIG=2', headers, [b'x' * MB])
+    assert status == 413 and read == 0
+
+
+def test_middleware_cuts_off_streamed_body_at_tenant_limit():
+    headers = [(b'authorization', b'Bearer token-small')]
+    with pytest.raises(HTTPException) as excinfo:
+        call_middleware('SMALL=0.5', headers, [b'x' * (MB // 4)] * 3)
+    assert excinfo.value.status_code == 413
+
+
+def test_middleware_applies_each_tenant_its_own_limit():
+    body = [b'x' * (MB // 2)] * 3
+    status, read = call_middleware('BIG=2', [(b'authorization', b'Bearer token-big')], body)
+    assert status == 202 and read == 3 * (MB // 2)
+    # Unknown or missing tokens get the default limit
+    for headers in ([(b'authorization', b'Bearer forged')], []):
+        with pytest.raises(HTTPException):
+            call_middleware('BIG=2', headers, body)